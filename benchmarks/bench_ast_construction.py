@@ -0,0 +1,87 @@
+"""
+Measures AST construction throughput for expressions that are rebuilt over and over (so that nearly every
+construction is a hash-cons cache hit), in the default mode and in hash-first mode. Expressions are built both through
+the operations (which run the simplifiers) and directly through the node constructor. Finally, expressions that are
+dropped after every round (so that only the strong tier of the hash-cons cache can keep them alive) are rebuilt with
+and without that tier.
+
+Usage: python benchmarks/bench_ast_construction.py [number of rounds]
+"""
+
+import sys
+import time
+
+import claripy
+from claripy.ast.base import set_hash_cons_cache_size, set_hash_first
+
+
+def build(regs, consts):
+    out = []
+    for i, (a, b) in enumerate(zip(regs, regs[1:] + regs[:1])):
+        c = consts[i]
+        e = claripy.Concat(claripy.Extract(31, 0, (a + c) ^ b), claripy.Extract(63, 32, a & b))
+        out.append(claripy.If(e == c, e, a - b))
+    return out
+
+
+def build_raw(regs, consts):
+    BV = type(regs[0])
+    Bool = type(claripy.true)
+    out = []
+    for i, (a, b) in enumerate(zip(regs, regs[1:] + regs[:1])):
+        c = consts[i]
+        e = BV("__xor__", (BV("__add__", (a, c), length=64), b), length=64)
+        e = BV("Concat", (BV("Extract", (31, 0, e), length=32), BV("__and__", (a, b), length=64)), length=96)
+        out.append(BV("If", (Bool("__eq__", (a, c)), e, e), length=96))
+    return out
+
+
+def run(rounds, builder):
+    regs = [claripy.BVS("r%d" % i, 64) for i in range(16)]
+    consts = [claripy.BVV(0x1000 + i, 64) for i in range(16)]
+    alive = builder(regs, consts)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        rebuilt = builder(regs, consts)
+    elapsed = time.perf_counter() - start
+
+    assert all(a is b for a, b in zip(alive, rebuilt))
+    return rounds * len(alive) / elapsed
+
+
+def run_churn(rounds, builder):
+    regs = [claripy.BVS("r%d" % i, 64) for i in range(16)]
+    consts = [claripy.BVV(0x1000 + i, 64) for i in range(16)]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        builder(regs, consts)
+    return rounds * len(regs) / (time.perf_counter() - start)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    claripy.set_debug(False)
+
+    for name, builder in (("operations", build), ("constructor", build_raw)):
+        default = run(rounds, builder)
+        set_hash_first(True)
+        hash_first = run(rounds, builder)
+        set_hash_first(False)
+
+        print(f"{name}:")
+        print(f"  default:     {default:10.0f} expressions/s")
+        print(f"  hash-first:  {hash_first:10.0f} expressions/s ({hash_first / default:.2f}x)")
+
+    weak_only = run_churn(rounds, build)
+    set_hash_cons_cache_size(4096)
+    with_lru = run_churn(rounds, build)
+    set_hash_cons_cache_size(0)
+    print("rebuilt after being dropped:")
+    print(f"  weak cache only:   {weak_only:10.0f} expressions/s")
+    print(f"  with strong tier:  {with_lru:10.0f} expressions/s ({with_lru / weak_only:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures the throughput of the AST hash schemes, both for the hash function alone (over the (op, args, keywords)
+triples of a sample of expressions) and for expression construction end-to-end.
+
+Usage: python benchmarks/bench_ast_hash.py [number of rounds]
+"""
+
+import sys
+import time
+
+import claripy
+from claripy.ast.base import Base, set_hash_scheme
+
+
+def sample_nodes():
+    regs = [claripy.BVS("r%d" % i, 64) for i in range(16)]
+    nodes = []
+    for i, (a, b) in enumerate(zip(regs, regs[1:] + regs[:1])):
+        c = claripy.BVV(0x1000 + i, 64)
+        e = claripy.Concat(claripy.Extract(31, 0, (a + c) ^ b), claripy.Extract(63, 32, a & b))
+        nodes.append(claripy.If(e == c, e, a - b))
+        nodes.append(claripy.ZeroExt(32, a) * claripy.SignExt(32, b))
+
+    seen = set()
+    triples = []
+    for n in nodes:
+        for sub in n.children_asts():
+            if id(sub) in seen:
+                continue
+            seen.add(id(sub))
+            keywords = {
+                "length": sub.length,
+                "variables": sub.variables,
+                "symbolic": sub.symbolic,
+                "annotations": sub.annotations,
+            }
+            triples.append((sub.op, sub.args, keywords))
+    return triples
+
+
+def run_hash(rounds, hash_func, triples):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for op, args, keywords in triples:
+            hash_func(op, args, keywords)
+    return rounds * len(triples) / (time.perf_counter() - start)
+
+
+def run_construction(rounds):
+    regs = [claripy.BVS("s%d" % i, 64) for i in range(16)]
+    start = time.perf_counter()
+    for r in range(rounds):
+        # a fresh constant per round, so that every node above it is new
+        c = claripy.BVV(r, 64)
+        for a, b in zip(regs, regs[1:] + regs[:1]):
+            claripy.Concat(claripy.Extract(31, 0, (a + c) ^ b), claripy.Extract(63, 32, a & b))
+    return rounds * len(regs) / (time.perf_counter() - start)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    claripy.set_debug(False)
+
+    triples = sample_nodes()
+    md5 = run_hash(rounds, Base._md5_hash, triples)
+    fast = run_hash(rounds, Base._fast_hash, triples)
+    print(f"hash function ({len(triples)} nodes):")
+    print(f"  md5:   {md5:10.0f} hashes/s")
+    print(f"  fast:  {fast:10.0f} hashes/s ({fast / md5:.2f}x)")
+
+    md5 = run_construction(rounds)
+    set_hash_scheme("fast")
+    fast = run_construction(rounds)
+    set_hash_scheme("md5")
+    print("construction of new expressions:")
+    print(f"  md5:   {md5:10.0f} expressions/s")
+    print(f"  fast:  {fast:10.0f} expressions/s ({fast / md5:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Measures the memory that is used per AST node, both for regular (live) ASTs and for nodes that are stored in an
+ASTArena.
+
+Usage: python benchmarks/bench_ast_memory.py [number of expressions]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+import claripy
+from claripy.ast.arena import ASTArena
+
+
+def build_expressions(n):
+    regs = [claripy.BVS("r%d" % i, 64) for i in range(16)]
+    exprs = []
+    for i in range(n):
+        a = regs[i % 16]
+        b = regs[(i * 7 + 3) % 16]
+        e = (a + claripy.BVV(i, 64)) ^ (b << 3)
+        e = claripy.Concat(claripy.Extract(31, 0, e), claripy.Extract(63, 32, e * b))
+        exprs.append(claripy.If(e[7:0] == i & 0xFF, e, a - b))
+    return exprs
+
+
+def count_nodes(exprs):
+    seen = set()
+    for e in exprs:
+        seen.add(id(e))
+        seen.update(id(c) for c in e.children_asts())
+    return len(seen)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    claripy.set_debug(False)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    exprs = build_expressions(n)
+    gc.collect()
+    ast_bytes = tracemalloc.get_traced_memory()[0] - before
+    nodes = count_nodes(exprs)
+
+    before = tracemalloc.get_traced_memory()[0]
+    arena = ASTArena()
+    arena.extend(exprs)
+    arena_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{n} expressions, {nodes} unique AST nodes ({len(arena)} arena nodes)")
+    print(f"live ASTs:  {ast_bytes / nodes:8.1f} bytes/node")
+    print(f"ASTArena:   {arena_bytes / len(arena):8.1f} bytes/node (nbytes estimate: {arena.nbytes / len(arena):.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures how fast concrete-heavy instruction streams are evaluated with direct constant folding and with the eager
+backends. Every "instruction" of the stream updates a small concrete register file (arithmetic, logic, shifts, partial
+register accesses, flag computations and conditional moves), much like the lifted code of a concretely executed basic
+block does. The register file is not kept between rounds, so most results are new values.
+
+Usage: python benchmarks/bench_constant_folding.py [number of rounds]
+"""
+
+import random
+import sys
+import time
+
+import claripy
+from claripy.folding import set_constant_folding
+
+
+def make_stream(n):
+    rng = random.Random(0)
+    return [(rng.randrange(8), rng.randrange(8), rng.randrange(8), rng.getrandbits(64)) for _ in range(n)]
+
+
+def execute(stream, regs):
+    regs = list(regs)
+    for i, (dst, src0, src1, imm) in enumerate(stream):
+        a, b = regs[src0], regs[src1]
+        c = claripy.BVV(imm, 64)
+        kind = i % 6
+        if kind == 0:
+            r = (a + c) ^ b
+        elif kind == 1:
+            r = claripy.LShR(a, claripy.BVV(imm & 63, 64)) | (b << claripy.BVV(imm & 7, 64))
+        elif kind == 2:
+            r = claripy.Concat(claripy.Extract(63, 32, a), claripy.Extract(31, 0, b) * claripy.BVV(imm, 32))
+        elif kind == 3:
+            r = claripy.If(claripy.SLT(a, b), a - b, b & c)
+        elif kind == 4:
+            r = claripy.ZeroExt(32, claripy.Extract(31, 0, a) + claripy.Extract(31, 0, c))
+        else:
+            zf = a == b
+            r = claripy.If(claripy.Or(zf, claripy.ULT(a, c)), ~a, claripy.SignExt(56, claripy.Extract(7, 0, b)))
+        regs[dst] = r
+    return regs
+
+
+def run(rounds, stream):
+    regs = [claripy.BVV(0x1000 * (i + 1), 64) for i in range(8)]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        regs = execute(stream, regs)
+    elapsed = time.perf_counter() - start
+    return regs, rounds * len(stream) / elapsed
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    claripy.set_debug(False)
+    stream = make_stream(2000)
+
+    folded_regs, folded = run(rounds, stream)
+    set_constant_folding(False)
+    eager_regs, eager = run(rounds, stream)
+    set_constant_folding(True)
+
+    assert all(a is b for a, b in zip(folded_regs, eager_regs))
+    print(f"eager backends:     {eager:10.0f} instructions/s")
+    print(f"constant folding:   {folded:10.0f} instructions/s ({folded / eager:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
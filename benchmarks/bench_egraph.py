@@ -0,0 +1,45 @@
+"""
+Compares the e-graph simplifier (`claripy.egraph_simplify()`) with the simplification through Z3 (`claripy.simplify()`)
+on expressions like those of lifted code: values that are split into bytes and put back together, and arithmetic and
+bitwise operations that cancel each other out over several statements.
+
+Usage: python benchmarks/bench_egraph.py [number of statements]
+"""
+
+import sys
+import time
+
+import claripy
+
+
+def build(statements):
+    regs = [claripy.BVS("r%d" % i, 64) for i in range(4)]
+    for i in range(statements):
+        a, b = regs[i % 4], regs[(i + 1) % 4]
+        # a store and a load of the result, byte by byte
+        v = (a + b) ^ (i * 0x1111)
+        v = claripy.Concat(*reversed([v[8 * j + 7 : 8 * j] for j in range(8)]))
+        regs[i % 4] = (v ^ (i * 0x1111)) - b
+    return claripy.And(*[r != 0 for r in regs])
+
+
+def measure(func, e):
+    start = time.perf_counter()
+    r = func(e)
+    return r, time.perf_counter() - start
+
+
+def main():
+    statements = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    claripy.set_debug(False)
+
+    e = build(statements)
+    print(f"input:            {e.tree_size:10d} nodes in the tree, {e.dag_size():6d} unique")
+    r, elapsed = measure(claripy.egraph_simplify, e)
+    print(f"egraph_simplify: {r.tree_size:10d} nodes in the tree, {r.dag_size():6d} unique, {elapsed:.3f}s")
+    r, elapsed = measure(claripy.simplify, e)
+    print(f"simplify (Z3):   {r.tree_size:10d} nodes in the tree, {r.dag_size():6d} unique, {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Measures how much memory forked workers share with their parent. The parent builds a set of expressions and converts
+them into Z3 terms, and then forks a number of children, first without and then with `claripy.prepare_for_fork()`.
+Every child rebuilds some of the expressions (which finds them in the hash-cons cache), converts them again (which
+finds them in the object cache of the backend), runs a garbage collection, and reports its resident set size (RSS)
+and how much of it is private to the child (Private_Dirty, i.e., the pages that were copied on write).
+
+Linux only (the sizes are read from /proc/self/smaps_rollup).
+
+Usage: python benchmarks/bench_fork_rss.py [number of expressions] [number of children]
+"""
+
+import gc
+import os
+import sys
+
+import claripy
+
+
+def build(count):
+    xs = [claripy.BVS("x%d" % i, 64, explicit_name=True) for i in range(16)]
+    out = []
+    for i in range(count):
+        a, b = xs[i % 16], xs[(i * 7 + 3) % 16]
+        out.append(claripy.If(claripy.ULT(a, i), (a + i) ^ b, claripy.Concat(claripy.Extract(31, 0, b), a[31:0] * i)))
+    return out
+
+
+def memory():
+    sizes = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                sizes[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return sizes["Rss"], sizes["Private_Dirty"]
+
+
+def work(count):
+    z3 = claripy.backends.z3
+    for e in build(count // 4):
+        z3.convert(e)
+    gc.collect()
+    return memory()
+
+
+def fork_children(children, count):
+    results = []
+    for _ in range(children):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            rss, private = work(count)
+            os.write(w, b"%d %d" % (rss, private))
+            os._exit(0)
+        os.close(w)
+        with os.fdopen(r, "rb") as f:
+            rss, private = map(int, f.read().split())
+        os.waitpid(pid, 0)
+        results.append((rss, private))
+    return [sum(v) / len(results) for v in zip(*results)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    children = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    claripy.set_debug(False)
+
+    # the expressions that the parent keeps around, and that the children work on
+    exprs = build(count)
+    z3 = claripy.backends.z3
+    for e in exprs:
+        z3.convert(e)
+    gc.collect()
+    print(f"parent: {memory()[0] / 2**20:.1f} MiB RSS")
+
+    plain = fork_children(children, count)
+    print(f"plain fork:          {plain[0] / 2**20:7.1f} MiB RSS, {plain[1] / 2**20:7.1f} MiB private per child")
+
+    claripy.prepare_for_fork()
+    prepared = fork_children(children, count)
+    print(f"prepare_for_fork():  {prepared[0] / 2**20:7.1f} MiB RSS, {prepared[1] / 2**20:7.1f} MiB private per child")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Measures how long `import claripy` takes in a fresh interpreter, compared to importing z3 alone, as reported by
+`python -X importtime`. The best of a number of runs is reported, to be robust against a busy machine.
+
+Usage: python benchmarks/bench_import_time.py [number of runs]
+"""
+
+import subprocess
+import sys
+
+
+def import_times(module):
+    """
+    Imports `module` in a fresh interpreter, and returns a dict of all the modules that were imported to their
+    cumulative import times in microseconds.
+    """
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, check=True, text=True
+    ).stderr
+    times = {}
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    claripy_runs = [import_times("claripy") for _ in range(runs)]
+    claripy_time = min(times["claripy"] for times in claripy_runs)
+    z3_time = min(import_times("z3")["z3"] for _ in range(runs))
+    slowest = sorted(claripy_runs[0].items(), key=lambda kv: kv[1], reverse=True)[1:11]
+
+    print(f"import claripy: {claripy_time / 1000:.1f} ms (best of {runs})")
+    print(f"import z3 alone: {z3_time / 1000:.1f} ms")
+    print("slowest imports (cumulative):")
+    for name, t in slowest:
+        print(f"  {t / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Measures the throughput of common bitvector operations through the precompiled fast path of the operations (taken
+when all arguments already have the expected AST types) and through the generic path, which coerces and matches the
+argument types on every call.
+
+Usage: python benchmarks/bench_operations.py [number of rounds]
+"""
+
+import sys
+import time
+
+import claripy
+from claripy.ast.bv import BV
+
+
+def cases():
+    a = claripy.BVS("a", 64)
+    b = claripy.BVS("b", 64)
+    c = claripy.BVV(0x1234, 64)
+    return [
+        ("__add__", BV.__add__, (a, b)),
+        ("__sub__", BV.__sub__, (a, c)),
+        ("__and__", BV.__and__, (a, b)),
+        ("__xor__", BV.__xor__, (a, c)),
+        ("__lshift__", BV.__lshift__, (a, c)),
+        ("__eq__", BV.__eq__, (a, b)),
+        ("__lt__", BV.__lt__, (a, c)),
+        ("Concat", claripy.Concat, (a, b)),
+        ("Extract", claripy.Extract, (31, 0, a)),
+        ("ZeroExt", claripy.ZeroExt, (32, a)),
+    ]
+
+
+def run(rounds, func, args):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return rounds / (time.perf_counter() - start)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    claripy.set_debug(False)
+
+    print(f"{'operation':12} {'generic':>12} {'fast path':>12}")
+    for name, op, args in cases():
+        assert op(*args) is op.generic(*args)
+        generic = run(rounds, op.generic, args)
+        fast = run(rounds, op, args)
+        print(f"{name:12} {generic:10.0f}/s {fast:10.0f}/s ({fast / generic:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
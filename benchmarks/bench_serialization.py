@@ -0,0 +1,59 @@
+"""
+Compares pickle with the binary DAG format of claripy.ast.serialization on a set of constraints that share most of
+their subterms: the size of the dump, and the time it takes to write it and to load it back (with fresh hash-cons
+caches, with and without trusting the stored hashes).
+
+Usage: python benchmarks/bench_serialization.py [number of constraints]
+"""
+
+import gc
+import pickle
+import sys
+import time
+
+import claripy
+from claripy.ast import serialization
+
+
+def constraints(n):
+    regs = [claripy.BVS("r%d" % i, 64) for i in range(8)]
+    out = []
+    acc = regs[0]
+    for i in range(n):
+        acc = claripy.If(acc[3:0] == i % 16, acc + regs[i % 8], acc ^ (regs[(i + 3) % 8] << 3))
+        out.append(claripy.ULT(acc, claripy.BVV(0x1000 + i, 64)))
+    return out
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    claripy.set_debug(False)
+
+    exprs = constraints(n)
+    pickled, t_pickle_dump = timed(lambda: pickle.dumps(exprs, -1))
+    dag, t_dag_dump = timed(lambda: serialization.dumps(exprs))
+    del exprs
+    gc.collect()
+
+    _, t_pickle_load = timed(lambda: pickle.loads(pickled))
+    gc.collect()
+    _, t_dag_load = timed(lambda: serialization.loads(dag))
+    gc.collect()
+    _, t_dag_load_trusted = timed(lambda: serialization.loads(dag, trust_hashes=True))
+
+    print(f"{n} constraints")
+    print(f"  pickle:  {len(pickled):10d} bytes, dump {t_pickle_dump:.3f}s, load {t_pickle_load:.3f}s")
+    print(
+        f"  dag:     {len(dag):10d} bytes, dump {t_dag_dump:.3f}s, load {t_dag_load:.3f}s "
+        f"(trusted hashes: {t_dag_load_trusted:.3f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Measures how AST construction scales with the number of threads that build ASTs at the same time. Every thread builds
+its own expressions (over its own variables) through the node constructor, so that the threads only share the
+hash-cons caches. The total amount of work is the same for every thread count, so on a free-threaded build of Python
+the throughput should grow with the number of cores, while with the GIL it stays flat. Finally, all threads build the
+same expressions at the same time, to check that they all end up with the same objects.
+
+Usage: python benchmarks/bench_threaded_construction.py [expressions per thread count] [maximum number of threads]
+"""
+
+import os
+import sys
+import threading
+import time
+
+import claripy
+
+
+def build(tid, count):
+    BV = claripy.ast.BV
+    x = claripy.BVS("x%d" % tid, 64, explicit_name=True)
+    y = claripy.BVS("y%d" % tid, 64, explicit_name=True)
+    out = []
+    for i in range(count):
+        c = claripy.BVV(i, 64)
+        e = BV("__xor__", (BV("__add__", (x, c), length=64), y), length=64)
+        out.append(BV("Concat", (BV("Extract", (31, 0, e), length=32), BV("__and__", (x, c), length=64)), length=96))
+    return out
+
+
+def run(threads, total):
+    count = total // threads
+    barrier = threading.Barrier(threads + 1)
+    results = [None] * threads
+
+    def worker(tid):
+        barrier.wait()
+        results[tid] = build(tid, count)
+
+    workers = [threading.Thread(target=worker, args=(tid,)) for tid in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    return threads * count / (time.perf_counter() - start)
+
+
+def check_shared(threads, count):
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+
+    def worker(tid):
+        barrier.wait()
+        results[tid] = build(0, count)
+
+    workers = [threading.Thread(target=worker, args=(tid,)) for tid in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return all(a is b for r in results[1:] for a, b in zip(results[0], r))
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else max(4, 2 * (os.cpu_count() or 1))
+    claripy.set_debug(False)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"{os.cpu_count()} cores, GIL {'enabled' if gil else 'disabled'}")
+
+    thread_counts = [1]
+    while thread_counts[-1] * 2 <= max_threads:
+        thread_counts.append(thread_counts[-1] * 2)
+
+    base = None
+    for threads in thread_counts:
+        rate = run(threads, total)
+        base = base or rate
+        print(f"{threads:3d} threads: {rate:10.0f} expressions/s ({rate / base:.2f}x)")
+
+    print(f"shared expressions are identical: {check_shared(thread_counts[-1], total // thread_counts[-1])}")
+
+
+if __name__ == "__main__":
+    main()
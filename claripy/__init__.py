@@ -72,13 +72,19 @@ if not os.environ.get("WORKER", False) and os.environ.get("REMOTE", False):
         _backend_z3 = _backends_module.backendremote.BackendRemote()
     except OSError:
         raise ImportError("can't connect to backend")
+    _backend_manager.backends._register_backend(_backend_z3, "z3", False, False)
 else:
-    _backend_z3 = _backends_module.BackendZ3()
-
-_backend_manager.backends._register_backend(_backend_z3, "z3", False, False)
+    # z3 is only imported (and the backend constructed) when it is first used
+    _backend_manager.backends._register_lazy_backend(lambda: _backends_module.BackendZ3(), "z3")
 backends = _backend_manager.backends
 
 
+def __getattr__(name):
+    if name == "_backend_z3":
+        return backends.z3
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def downsize():
     """
     Clear all temporary data associated with any backend
@@ -106,8 +112,26 @@ def reset():
     """
     downsize()
     from .ast import bv  # pylint:disable=redefined-outer-name
+    from .ast.base import Base  # pylint:disable=redefined-outer-name
+    from .simplifications import simpleton
 
     bv._bvv_cache.clear()
-
-
+    simpleton.clear_memo()
+    Base._hash_cache.clear_strong()
+    Base._leaf_cache.clear_strong()
+
+
+from .cache_stats import stats, reset_stats
+from .memory_budget import set_memory_budget, memory_budget, memory_usage, enforce_memory_budget
+from .fork import prepare_for_fork
+from .egraph import egraph_simplify
+from .simplifications import (
+    set_simplification_cache_size,
+    simplifier_rules,
+    set_simplifier_profiling,
+    simplifier_stats,
+    reset_simplifier_stats,
+    disable_simplifier,
+    enable_simplifier,
+)
 from .debug import set_debug
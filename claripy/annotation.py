@@ -1,3 +1,5 @@
+import hashlib
+import pickle
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -55,6 +57,22 @@ class Annotation:
         """
         return self
 
+    def stable_hash(self) -> int:
+        """
+        Returns a hash of this annotation that is the same in every Python process. It is used in place of `hash()`
+        when ASTs are hashed in stable mode (see :func:`claripy.ast.base.set_stable_hashes`).
+
+        Annotations that are compared by identity (i.e., that do not override `__hash__`) have no identity that
+        carries over to other processes, so the default implementation just returns `hash(self)` for them. For
+        annotations that are compared by value, it hashes the pickled annotation. Annotations that cannot be pickled,
+        or whose pickled form is not deterministic (e.g., because they hold sets of strings), should override this.
+
+        :return: A 64-bit integer.
+        """
+        if type(self).__hash__ is object.__hash__:
+            return hash(self)
+        return int.from_bytes(hashlib.md5(pickle.dumps(self, 4)).digest()[:8], "little")
+
 
 #
 # Some built-in annotations
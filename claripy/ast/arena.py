@@ -0,0 +1,315 @@
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .base import Base
+
+# per-node flags
+FLAG_SYMBOLIC = 1
+FLAG_ANNOTATED = 2
+
+# the value stored in the length table for ASTs without a length (i.e., Bools)
+NO_LENGTH = -1
+
+
+class ArenaNode:
+    """
+    A thin view onto a node that is stored in an :class:`ASTArena`. It exposes the same basic read-only attributes as
+    an AST (op, args, length, depth, symbolic, variables, annotations), but all of them are read from the packed tables
+    of the arena.
+    """
+
+    __slots__ = ("arena", "index")
+
+    def __init__(self, arena: "ASTArena", index: int):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def op(self) -> str:
+        return operations.opcode_names[self.arena._op[self.index]]
+
+    @property
+    def depth(self) -> int:
+        return self.arena._depth[self.index]
+
+    @property
+    def length(self):
+        length = self.arena._length[self.index]
+        return None if length == NO_LENGTH else length
+
+    @property
+    def symbolic(self) -> bool:
+        return bool(self.arena._flags[self.index] & FLAG_SYMBOLIC)
+
+    @property
+    def annotations(self) -> Tuple:
+        return self.arena._annotations.get(self.index, ())
+
+    @property
+    def args(self) -> Tuple:
+        return tuple(self.arena._arg(ref) for ref in self.arena._child_refs(self.index))
+
+    @property
+    def variables(self) -> frozenset:
+        return self.arena.variables(self.index)
+
+    def to_ast(self) -> Base:
+        """
+        Materializes this node (and all nodes below it) as a regular AST.
+        """
+        return self.arena.to_ast(self.index)
+
+    def __eq__(self, other):
+        return type(other) is ArenaNode and other.arena is self.arena and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self):
+        return f"<ArenaNode {self.index} {self.op}>"
+
+
+class ASTArena:
+    """
+    A compact, arena-backed node table for AST DAGs.
+
+    Every unique node that is added to the arena is stored exactly once. Instead of keeping one Python object (with its
+    ~20 slots, cache key, errored set and variable set) per node, the metadata of a node - its opcode, depth,
+    length, flags and child references - is kept in packed arrays that are indexed by the node id. Arguments that are
+    not ASTs (integers, variable names, ...) are stored once in a shared constant table.
+
+    This is meant for holding on to large, long-lived expression DAGs (e.g., the constraints of many idle states).
+    Nodes are handed out as lightweight :class:`ArenaNode` views and can be turned back into regular ASTs with
+    :meth:`to_ast`.
+
+    Child references are encoded in a single signed integer: values >= 0 are node ids, and a negative value ``-(i+1)``
+    refers to the i-th entry of the constant table.
+    """
+
+    __slots__ = (
+        "_classes",
+        "_class_ids",
+        "_consts",
+        "_const_ids",
+        "_op",
+        "_class",
+        "_depth",
+        "_length",
+        "_flags",
+        "_child_offsets",
+        "_children",
+        "_annotations",
+        "_uneliminatable_annotations",
+        "_leaf_variables",
+        "_index_of",
+    )
+
+    def __init__(self):
+        self._classes: List[type] = []
+        self._class_ids: Dict[type, int] = {}
+        self._consts: List[Any] = []
+        self._const_ids: Dict[Tuple[type, Any], int] = {}
+
+        self._op = array("H")
+        self._class = array("B")
+        self._depth = array("I")
+        self._length = array("q")
+        self._flags = array("B")
+        self._child_offsets = array("Q", [0])
+        self._children = array("q")
+
+        # sparse tables: only a small fraction of the nodes carry annotations or introduce new variables
+        self._annotations: Dict[int, Tuple] = {}
+        # including those of the children, which cannot be derived from the annotations of a node alone
+        self._uneliminatable_annotations: Dict[int, frozenset] = {}
+        self._leaf_variables: Dict[int, frozenset] = {}
+
+        # AST hash -> node id, used to deduplicate nodes when they are added
+        self._index_of: Dict[Any, int] = {}
+
+    def __len__(self):
+        return len(self._op)
+
+    def __getitem__(self, index: int) -> ArenaNode:
+        if not 0 <= index < len(self._op):
+            raise IndexError(index)
+        return ArenaNode(self, index)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The approximate number of bytes used by the node table, including the sparse side tables and the constant
+        table.
+        """
+        size = sum(
+            a.itemsize * len(a)
+            for a in (
+                self._op,
+                self._class,
+                self._depth,
+                self._length,
+                self._flags,
+                self._child_offsets,
+                self._children,
+            )
+        )
+        size += sys.getsizeof(self._index_of) + sys.getsizeof(self._annotations) + sys.getsizeof(self._leaf_variables)
+        size += sys.getsizeof(self._uneliminatable_annotations)
+        size += sum(sys.getsizeof(c) for c in self._consts)
+        return size
+
+    #
+    # Adding nodes
+    #
+
+    def _intern_class(self, cls: type) -> int:
+        class_id = self._class_ids.get(cls, None)
+        if class_id is None:
+            class_id = self._class_ids[cls] = len(self._classes)
+            self._classes.append(cls)
+        return class_id
+
+    def _intern_const(self, value) -> int:
+        key = (type(value), value)
+        try:
+            const_id = self._const_ids.get(key, None)
+        except TypeError:
+            # unhashable constants are simply not deduplicated
+            self._consts.append(value)
+            return len(self._consts) - 1
+
+        if const_id is None:
+            const_id = self._const_ids[key] = len(self._consts)
+            self._consts.append(value)
+        return const_id
+
+    def add(self, ast: Base) -> int:
+        """
+        Adds an AST, and all the nodes below it, to the arena.
+
+        :param ast: The AST to add.
+        :return:    The id of the node that represents `ast`.
+        """
+        index_of = self._index_of
+        index = index_of.get(ast._hash, None)
+        if index is not None:
+            return index
+
+        stack = [(ast, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node._hash in index_of:
+                continue
+
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((a, False) for a in node.args if isinstance(a, Base) and a._hash not in index_of)
+                continue
+
+            for a in node.args:
+                if isinstance(a, Base):
+                    self._children.append(index_of[a._hash])
+                else:
+                    self._children.append(-self._intern_const(a) - 1)
+
+            index = len(self._op)
+            self._op.append(node._opcode)
+            self._class.append(self._intern_class(type(node)))
+            self._depth.append(node.depth)
+            self._length.append(NO_LENGTH if node.length is None else node.length)
+            self._flags.append((FLAG_SYMBOLIC if node.symbolic else 0) | (FLAG_ANNOTATED if node.annotations else 0))
+            self._child_offsets.append(len(self._children))
+            if node.annotations:
+                self._annotations[index] = node.annotations
+            if node._uneliminatable_annotations:
+                self._uneliminatable_annotations[index] = node._uneliminatable_annotations
+            if operations.opcode_flags[node._opcode] & operations.OPF_INTRODUCES_VARIABLES:
+                self._leaf_variables[index] = node.variables
+            index_of[node._hash] = index
+
+        return index_of[ast._hash]
+
+    def extend(self, asts: Iterable[Base]) -> List[int]:
+        """
+        Adds several ASTs to the arena.
+
+        :return: A list of node ids, one for each AST.
+        """
+        return [self.add(a) for a in asts]
+
+    #
+    # Reading nodes
+    #
+
+    def _child_refs(self, index: int) -> array:
+        return self._children[self._child_offsets[index] : self._child_offsets[index + 1]]
+
+    def _arg(self, ref: int):
+        if ref >= 0:
+            return ArenaNode(self, ref)
+        return self._consts[-ref - 1]
+
+    def variables(self, index: int) -> frozenset:
+        """
+        Computes the variables of a node from the variables that are introduced by the leaves below it.
+        """
+        result = set()
+        seen = set()
+        stack = [index]
+        while stack:
+            i = stack.pop()
+            if i in seen:
+                continue
+            seen.add(i)
+            leaf_vars = self._leaf_variables.get(i, None)
+            if leaf_vars is not None:
+                result |= leaf_vars
+            stack.extend(ref for ref in self._child_refs(i) if ref >= 0)
+        return frozenset(result)
+
+    def to_ast(self, index: int) -> Base:
+        """
+        Materializes a node of the arena as a regular AST. Since ASTs are hash-consed, this returns the original AST
+        object if it is still alive.
+
+        :param index:   The node id.
+        :return:        The AST.
+        """
+        built: Dict[int, Base] = {}
+        stack = [(index, False)]
+        while stack:
+            i, expanded = stack.pop()
+            if i in built:
+                continue
+
+            refs = self._child_refs(i)
+            if not expanded:
+                stack.append((i, True))
+                stack.extend((ref, False) for ref in refs if ref >= 0 and ref not in built)
+                continue
+
+            op = operations.opcode_names[self._op[i]]
+            args = tuple(built[ref] if ref >= 0 else self._consts[-ref - 1] for ref in refs)
+            # the stored annotations already include the ones relocated from the children, and the uneliminatable
+            # annotations are restored as they were
+            kwargs = {"skip_child_annotations": True}
+            length = self._length[i]
+            if length != NO_LENGTH:
+                kwargs["length"] = length
+            if i in self._annotations:
+                kwargs["annotations"] = self._annotations[i]
+            if i in self._uneliminatable_annotations:
+                kwargs["uneliminatable_annotations"] = self._uneliminatable_annotations[i]
+            if i in self._leaf_variables:
+                kwargs["variables"] = self._leaf_variables[i]
+                kwargs["symbolic"] = bool(self._flags[i] & FLAG_SYMBOLIC)
+            if op == "BVS":
+                kwargs["uninitialized"] = args[4]
+                kwargs["eager_backends"] = None
+            built[i] = self._classes[self._class[i]](op, args, **kwargs)
+
+        return built[index]
+
+
+from .. import operations
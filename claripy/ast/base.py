@@ -1,3 +1,4 @@
+import functools
 import itertools
 import logging
 import math
@@ -8,10 +9,11 @@ from collections import OrderedDict, deque
 from itertools import chain
 from typing import Optional, Generic, TypeVar, overload, TYPE_CHECKING, List, Iterable, Iterator, Tuple, NoReturn
 
+from ..utils import HashConsCache
+
 if TYPE_CHECKING:
     from .bool import Bool
     from .fp import FP
-    from ..annotation import Annotation
 
 try:
     import cPickle as pickle
@@ -50,6 +52,469 @@ class ASTCacheKey(Generic[T]):
         return f"<Key {self.ast._type_name()} {self.ast.__repr__(inner=True)}>"
 
 
+#
+# Errored-backend sets
+#
+
+# There are only a handful of backends, so the sets of backends that failed to handle an AST are shared between nodes
+# instead of allocating a fresh set for each of them.
+_empty_errored = frozenset()
+_errored_sets = {_empty_errored: _empty_errored}
+
+
+def _intern_errored(errored: frozenset) -> frozenset:
+    return _errored_sets.setdefault(errored, errored)
+
+
+#
+# Variable sets
+#
+
+
+class VariableSet(frozenset):
+    """
+    A frozenset of variable names. Unlike plain frozensets, these can be weakly referenced, which allows them to be
+    interned in a :class:`VariableSetPool`.
+    """
+
+
+class VariableSetPool:
+    """
+    A pool of interned variable sets. Most ASTs share the same few variable sets with their children, so instead of
+    having each node hold its own copy, equal sets are deduplicated through this pool. Sets are weakly held, and are
+    dropped from the pool once no AST refers to them anymore.
+    """
+
+    __slots__ = ("_pool",)
+
+    def __init__(self):
+        # hash of the set -> the interned set
+        self._pool = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._pool)
+
+    def intern(self, variables: Iterable[str]) -> VariableSet:
+        """
+        Returns the interned variable set that is equal to `variables`.
+        """
+        if not variables:
+            return _empty_variables
+        if type(variables) is not VariableSet and type(variables) is not frozenset:
+            variables = frozenset(variables)
+
+        h = hash(variables)
+        existing = self._pool.get(h, None)
+        if existing is not None:
+            if existing is variables or existing == variables:
+                return existing
+            # hash collision between two different sets: leave the pooled one alone
+            return variables if type(variables) is VariableSet else VariableSet(variables)
+
+        interned = variables if type(variables) is VariableSet else VariableSet(variables)
+        self._pool[h] = interned
+        return interned
+
+
+_empty_variables = VariableSet()
+variable_set_pool = VariableSetPool()
+
+
+#
+# Hash-cons caches
+#
+
+# the number of lock-striped shards of each hash-cons cache
+HASH_CONS_SHARDS = 64
+
+
+def set_hash_cons_cache_size(size: int) -> None:
+    """
+    Sets the size of the strong LRU tier of the hash-cons caches (see :class:`claripy.utils.HashConsCache`).
+
+    With a non-zero size, the `size` most recently built or looked-up ASTs (and, separately, the `size` most recently
+    used leaves) are kept alive even when nothing else refers to them, so rebuilding them is a cache hit instead of a
+    full re-initialization. A size of 0 (the default) disables the strong tier.
+    """
+    Base._hash_cache.resize(size)
+    Base._leaf_cache.resize(size)
+
+
+#
+# Hash-first construction
+#
+
+# operations whose nodes are looked up in Base._leaf_cache (as long as they carry no annotations)
+_leaf_cache_operations = frozenset({"BVS", "BVV", "BoolS", "BoolV", "FPS", "FPV"})
+_hash_first = False
+
+
+def set_hash_first(enabled: bool) -> None:
+    """
+    Enable or disable hash-first AST construction.
+
+    By default, an AST is hashed over its operation, arguments, and all of its derived metadata (variables, symbolic,
+    annotations), which means that all of that metadata has to be computed from the arguments before the hash-cons
+    cache can even be checked. In hash-first mode, the hash only covers what the metadata is derived *from* (the
+    operation, the arguments, the length and the annotations that are applied to the node itself), so that
+    re-constructing an existing AST returns the cached node right away. The metadata is only computed for nodes that
+    are actually created.
+
+    Hashes differ between the two modes, so this should be set before any expressions are built. The hash-cons cache
+    is cleared when the mode changes.
+    """
+    global _hash_first  # pylint:disable=global-statement
+    if enabled != _hash_first:
+        _hash_first = enabled
+        Base._hash_cache.clear()
+
+
+#
+# Hash schemes
+#
+
+_MASK128 = (1 << 128) - 1
+_MIX_MULTIPLIER = 0x9E3779B97F4A7C15F39CC0605CEDC835
+_TAG_AST = 0x2B7E151628AED2A6ABF7158809CF4F3C
+_TAG_INT = 0x243F6A8885A308D313198A2E03707344
+_TAG_NEG_INT = 0xA4093822299F31D0082EFA98EC4E6C89
+_TAG_STR = 0x452821E638D01377BE5466CF34E90C6C
+_TAG_FLOAT = 0xC0AC29B7C97C50DD3F84D5B5B5470917
+_TAG_TUPLE = 0x9216D5D98979FB1BD1310BA698DFB5AC
+_TAG_NONE = 0x2FFD72DBD01ADFB7B8E1AFED6A267E96
+_TAG_TRUE = 0xBA7C9045F12C7F9924A19947B3916CF7
+_TAG_FALSE = 0x0801F2E2858EFC16636920D871574E69
+_TAG_VARIABLES = 0xA458FEA3F4933D7E0D95748F728EB658
+_TAG_ANNOTATIONS = 0x718BCD5882154AEE7B54A41DC25A59B5
+_float_packer = struct.Struct("<d")
+_float_unpacker = struct.Struct("<Q")
+
+# operation name -> the initial value of the combine for nodes of that operation
+_op_seeds = {}
+
+
+def _fast_arg_hash(arg) -> Optional[int]:
+    """
+    Maps an argument to the 128-bit value that the "fast" hash scheme mixes in for it, or None if the argument cannot
+    be represented.
+    """
+    t = type(arg)
+    if t is int:
+        if 0 <= arg <= 0xFFFF_FFFF_FFFF_FFFF:
+            return arg ^ _TAG_INT
+        if -0x8000_0000_0000_0000 <= arg < 0:
+            return -arg ^ _TAG_NEG_INT
+        return None
+    h = getattr(arg, "_hash", None)
+    if h is not None:
+        if type(h) is not int:
+            # leaves are hashed by a tuple of their operation, length and arguments
+            if not _stable_hashes:
+                h = hash(h)
+            else:
+                x = _fast_arg_hash(h)
+                h = _stable_object_hash(h) if x is None else x
+        return h ^ _TAG_AST
+    if arg is None:
+        return _TAG_NONE
+    if arg is True:
+        return _TAG_TRUE
+    if arg is False:
+        return _TAG_FALSE
+    if t is str:
+        return _str_hash(arg) ^ _TAG_STR
+    if t is float:
+        return _float_unpacker.unpack(_float_packer.pack(arg))[0] ^ _TAG_FLOAT
+    if t is tuple:
+        h = _TAG_TUPLE
+        for elem in arg:
+            x = _fast_arg_hash(elem)
+            if x is None:
+                return None
+            h = ((h ^ x) * _MIX_MULTIPLIER) & _MASK128
+            h ^= h >> 64
+        return h
+    return None
+
+
+def set_hash_scheme(name: str) -> None:
+    """
+    Selects the scheme that is used to hash ASTs.
+
+    - "md5" (the default) serializes each node into a bytestring and hashes it with md5.
+    - "fast" combines the hashes of the children and the other arguments of each node into a 128-bit value with
+      integer arithmetic only, and falls back to md5 for nodes with unusual argument types.
+
+    Hashes differ between schemes, so this should be set before any expressions are built. The hash-cons cache is
+    cleared when the scheme changes.
+    """
+    global _hash_scheme  # pylint:disable=global-statement
+    try:
+        scheme = _hash_schemes[name]
+    except KeyError:
+        raise ClaripyValueError(f"Unknown hash scheme {name!r}") from None
+    if scheme is not _hash_scheme:
+        _hash_scheme = scheme
+        Base._hash_cache.clear()
+
+
+#
+# Stable hashing
+#
+
+_stable_hashes = False
+_MASK64 = 0xFFFF_FFFF_FFFF_FFFF
+_u64_packer = struct.Struct("<Q")
+
+
+def _stable_digest(data: bytes) -> int:
+    return _u64_packer.unpack_from(md5.md5(data).digest())[0]
+
+
+@functools.lru_cache(maxsize=4096)
+def _stable_str_hash(s: str) -> int:
+    return _stable_digest(s.encode("utf-8", "surrogatepass"))
+
+
+def _stable_object_hash(obj) -> int:
+    """
+    A process-stable hash of an arbitrary (picklable) argument, such as a floating-point sort or a rounding mode.
+    """
+    try:
+        return _stable_digest(pickle.dumps(obj, 4))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        l.warning("Cannot compute a stable hash for %r. Its hash will differ between processes.", obj)
+        return hash(obj) & _MASK64
+
+
+def _stable_variables_hash(variables) -> int:
+    """
+    A process-stable hash of a set of variable names, computed over the sorted names. It is cached on interned
+    variable sets.
+    """
+    h = getattr(variables, "_stable_hash", None)
+    if h is None:
+        h = _stable_digest(b"\x00".join(sorted(str(v).encode("utf-8", "surrogatepass") for v in variables)))
+        if type(variables) is VariableSet:
+            variables._stable_hash = h
+    return h
+
+
+def _stable_annotations_hash(annotations) -> int:
+    """
+    A process-stable hash of a tuple of annotations, combined from :meth:`Annotation.stable_hash`.
+    """
+    if not annotations:
+        return 0
+    hashes = []
+    for a in annotations:
+        try:
+            h = a.stable_hash()
+        except (pickle.PicklingError, TypeError, AttributeError):
+            l.warning("Cannot compute a stable hash for annotation %r. Its hash will differ between processes.", a)
+            h = hash(a)
+        hashes.append(h & _MASK64)
+    return _stable_digest(struct.pack(f"<{len(hashes)}Q", *hashes))
+
+
+def _stable_arg_key(arg):
+    """
+    Replaces an argument with a value whose serialization does not depend on the process.
+    """
+    t = type(arg)
+    if t is int or t is float or t is str or t is bool or arg is None:
+        return arg
+    h = getattr(arg, "_hash", None)
+    if h is not None:
+        return h
+    if t is tuple:
+        return tuple(_stable_arg_key(a) for a in arg)
+    return _stable_object_hash(arg)
+
+
+def set_stable_hashes(enabled: bool) -> None:
+    """
+    Enable or disable process-stable AST hashes.
+
+    By default, the contribution of the variables and annotations of an AST (and, depending on the hash scheme, of
+    string and other non-numeric arguments) to its hash is their Python ``hash()``, which depends on PYTHONHASHSEED
+    or on object addresses. The same expression therefore gets a different ``_hash`` in every process. In stable mode,
+    these contributions are derived deterministically instead: variable sets are hashed over their sorted names,
+    annotations through :meth:`Annotation.stable_hash`, and other arguments through their pickled form. This makes
+    AST hashes usable as keys of caches that are shared between processes, at the cost of slightly slower hashing.
+
+    Every process that shares such a cache has to enable stable mode (and select the same hash scheme) before it
+    builds any expressions. The hash-cons cache is cleared when the mode changes.
+    """
+    global _stable_hashes, _variables_hash, _annotations_hash, _str_hash  # pylint:disable=global-statement
+    enabled = bool(enabled)
+    if enabled == _stable_hashes:
+        return
+    _stable_hashes = enabled
+    if enabled:
+        _variables_hash, _annotations_hash, _str_hash = (
+            _stable_variables_hash,
+            _stable_annotations_hash,
+            _stable_str_hash,
+        )
+    else:
+        _variables_hash, _annotations_hash, _str_hash = hash, hash, hash
+    Base._hash_cache.clear()
+
+
+def _hash_config() -> str:
+    """
+    Describes the settings that determine the hashes of ASTs (the hash scheme, and whether stable hashes and
+    hash-first construction are enabled). ASTs that are built under different settings get different hashes.
+    """
+    name = next(n for n, scheme in _hash_schemes.items() if scheme is _hash_scheme)
+    return f"{name}{'+stable' if _stable_hashes else ''}{'+hash-first' if _hash_first else ''}"
+
+
+# the functions that hash the non-structural parts of an AST; swapped out by set_stable_hashes()
+_variables_hash = hash
+_annotations_hash = hash
+_str_hash = hash
+
+
+#
+# DAG size estimates
+#
+
+# The number of unique nodes of an AST is estimated with a probabilistic counting sketch (PCSA, by Flajolet and
+# Martin) that is maintained at construction time. Each node selects one bit of a bitmap of _DAG_SKETCH_BUCKETS words
+# of _DAG_SKETCH_BITS bits from its hash, and the sketch of a node is the union (bitwise or) of the sketches of its
+# arguments and its own bit. A node that is shared between several arguments sets the same bit in each of them, so it
+# is counted once.
+_DAG_SKETCH_BUCKETS = 16
+_DAG_SKETCH_BITS = 16
+_DAG_SKETCH_WORD = (1 << _DAG_SKETCH_BITS) - 1
+_DAG_SKETCH_PHI = 0.77351
+# the small-range correction of Scheuermann and Mauve
+_DAG_SKETCH_KAPPA = 1.75
+
+
+def _dag_sketch_bit(h) -> int:
+    """
+    Maps the hash of a node to the bit that it sets in a DAG size sketch.
+    """
+    x = hash(h) & _MASK64
+    # the low bits of the hashes of leaves and of small ints are anything but uniform
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    x ^= x >> 31
+    bucket = x % _DAG_SKETCH_BUCKETS
+    x //= _DAG_SKETCH_BUCKETS
+    rho = (x & -x).bit_length() - 1 if x else _DAG_SKETCH_BITS - 1
+    return 1 << (bucket * _DAG_SKETCH_BITS + min(rho, _DAG_SKETCH_BITS - 1))
+
+
+def _dag_sketch_estimate(sketch: int) -> float:
+    """
+    Estimates the number of nodes that were added to a DAG size sketch.
+    """
+    total = 0
+    for _ in range(_DAG_SKETCH_BUCKETS):
+        word = sketch & _DAG_SKETCH_WORD
+        # the index of the lowest unset bit
+        total += (~word & (word + 1)).bit_length() - 1
+        sketch >>= _DAG_SKETCH_BITS
+    mean = total / _DAG_SKETCH_BUCKETS
+    return _DAG_SKETCH_BUCKETS / _DAG_SKETCH_PHI * (2**mean - 2 ** (-_DAG_SKETCH_KAPPA * mean))
+
+
+#
+# Alpha-canonical hashes
+#
+
+# the leaf operations that are renamed by canonicalization
+_canonical_variable_operations = frozenset({"BVS", "BoolS", "FPS"})
+_TAG_CANONICAL_SET = 0x636920D871574E69A458FEA3F4933D7E
+# constraint set key -> its canonical form
+_canonical_set_cache = {}
+_CANONICAL_SET_CACHE_SIZE = 4096
+
+
+def _canonical_mix(h: int, x: int) -> int:
+    h = ((h ^ x) * _MIX_MULTIPLIER) & _MASK128
+    return h ^ (h >> 64)
+
+
+def _canonical_arg_hash(arg) -> int:
+    x = _fast_arg_hash(arg)
+    if x is None:
+        x = _stable_object_hash(arg) if _stable_hashes else hash(arg) & _MASK64
+    return x
+
+
+def _canonical_combine(h: int, children) -> Tuple[int, Tuple[str, ...]]:
+    """
+    Mixes the canonical forms of some children into `h`. The variables of the children are numbered in the order in
+    which they first appear, and the position of each variable of a child in that numbering is mixed in as well, so
+    that the result does not depend on the names of the variables, only on how they are shared between the children.
+    """
+    names = []
+    index = {}
+    for child_hash, child_names in children:
+        h = _canonical_mix(h, child_hash ^ _TAG_AST)
+        for name in child_names:
+            i = index.get(name, None)
+            if i is None:
+                i = index[name] = len(names)
+                names.append(name)
+            h = _canonical_mix(h, i ^ _TAG_VARIABLES)
+    return h, tuple(names)
+
+
+def _canonical_pre(ast):
+    return DESCEND if ast._canonical is None else ast._canonical
+
+
+def _canonical_visit(ast, args):
+    h = _canonical_mix(_canonical_arg_hash(ast.op), _canonical_arg_hash(ast.length))
+    if ast.annotations:
+        h = _canonical_mix(h, (_annotations_hash(ast.annotations) & _MASK64) ^ _TAG_ANNOTATIONS)
+
+    if ast.op in _canonical_variable_operations:
+        # everything but the name
+        for arg in ast.args[1:]:
+            h = _canonical_mix(h, _canonical_arg_hash(arg))
+        r = (h, (ast.args[0],))
+    else:
+        children = []
+        for arg, r in zip(ast.args, args):
+            if isinstance(arg, Base):
+                children.append(r)
+            else:
+                h = _canonical_mix(h, _canonical_arg_hash(arg))
+        r = _canonical_combine(h, children)
+
+    ast._canonical = r
+    return r
+
+
+def constraint_set_canonical_form(constraints: Iterable["Base"]) -> Tuple[int, Tuple[str, ...]]:
+    """
+    Computes the alpha-canonical form of a list of constraints, i.e., a hash that only depends on the structure of
+    the constraints and not on the names of their variables, and the variables in their canonical order (see
+    :meth:`Base.canonical_form`). The order of the constraints matters. The canonical forms of the constraints are
+    memoized on the ASTs, and the results for the most recently seen constraint lists are memoized as well.
+
+    :param constraints: The constraints.
+    :returns:           A tuple of the canonical hash and the variables.
+    """
+    constraints = tuple(constraints)
+    key = tuple(c._hash for c in constraints)
+    r = _canonical_set_cache.get(key, None)
+    if r is None:
+        children = DAGVisitor(_canonical_visit, pre=_canonical_pre).walk_all(constraints)
+        r = _canonical_combine(_TAG_CANONICAL_SET, children)
+        if len(_canonical_set_cache) >= _CANONICAL_SET_CACHE_SIZE:
+            _canonical_set_cache.clear()
+        _canonical_set_cache[key] = r
+    return r
+
+
 #
 # AST variable naming
 #
@@ -65,6 +530,10 @@ def _make_name(name: str, size: int, explicit_name: bool = False, prefix: str =
         return name
 
 
+def _visit_nothing(ast, args):  # pylint:disable=unused-argument
+    return None
+
+
 def _d(h, cls, state):
     """
     This function is the deserializer for ASTs.
@@ -98,6 +567,7 @@ class Base:
 
     __slots__ = [
         "op",
+        "_opcode",
         "args",
         "variables",
         "symbolic",
@@ -117,10 +587,15 @@ class Base:
         "_uneliminatable_annotations",
         "_relocatable_annotations",
         "depth",
+        "tree_size",
+        "_dag_sketch",
+        "_dag_size",
+        "_canonical",
+        "_known_bits",
         "__weakref__",
     ]
-    _hash_cache = weakref.WeakValueDictionary()
-    _leaf_cache = weakref.WeakValueDictionary()
+    _hash_cache = HashConsCache(shards=HASH_CONS_SHARDS)
+    _leaf_cache = HashConsCache(shards=HASH_CONS_SHARDS)
 
     FULL_SIMPLIFY = 1
     LITE_SIMPLIFY = 2
@@ -155,6 +630,15 @@ class Base:
 
         a_args = args if type(args) is tuple else tuple(args)
 
+        if _hash_first and hash is None and (op not in _leaf_cache_operations or kwargs.get("annotations", None)):
+            hash = Base._calc_hash(op, a_args, Base._structural_keywords(op, a_args, kwargs, add_variables))
+            self = cls._hash_cache.get(hash, None)
+            if self is not None:
+                return self
+            counted = True
+        else:
+            counted = False
+
         # initialize the following properties: symbolic, variables and errored
         need_symbolic = "symbolic" not in kwargs
         need_variables = "variables" not in kwargs
@@ -164,40 +648,65 @@ class Base:
         # case it will stay as None, and will be passed to __a_init__() "as is". __a_init__() will properly handle it
         # there.
         arg_max_depth = 0
+        args_tree_size = 0
+        args_dag_sketch = 0
         if need_symbolic or need_variables or need_errored:
             symbolic_flag = False
-            variables_set = set()
-            errored_set = set()
+            variables = _empty_variables
+            # only allocated when the union of the children's variable sets is larger than each of them
+            grown_variables = None
+            errored_set = _empty_errored
             for a in a_args:
                 if not isinstance(a, Base):
                     continue
                 if need_symbolic and not symbolic_flag:
                     symbolic_flag |= a.symbolic
                 if need_variables:
-                    variables_set |= a.variables
-                if need_errored:
+                    arg_variables = a.variables
+                    if grown_variables is not None:
+                        grown_variables |= arg_variables
+                    elif arg_variables is variables or arg_variables <= variables:
+                        pass
+                    elif variables <= arg_variables:
+                        variables = arg_variables
+                    else:
+                        grown_variables = set(variables)
+                        grown_variables |= arg_variables
+                if need_errored and a._errored:
                     errored_set |= a._errored
                 if args_have_annotations is not True:
                     args_have_annotations = args_have_annotations or bool(a.annotations)
                 if arg_max_depth < a.depth:
                     arg_max_depth = a.depth
+                args_tree_size += a.tree_size
+                args_dag_sketch |= a._dag_sketch
 
             if need_symbolic:
                 kwargs["symbolic"] = symbolic_flag
             if need_variables:
-                kwargs["variables"] = frozenset(variables_set)
+                kwargs["variables"] = (
+                    variables if grown_variables is None else variable_set_pool.intern(grown_variables)
+                )
             if need_errored:
                 kwargs["errored"] = errored_set
-
-        if type(kwargs["variables"]) is not frozenset:  # pylint:disable=unidiomatic-typecheck
-            kwargs["variables"] = frozenset(kwargs["variables"])
+        else:
+            for a in a_args:
+                if isinstance(a, Base):
+                    args_tree_size += a.tree_size
+                    args_dag_sketch |= a._dag_sketch
 
         if add_variables:
-            kwargs["variables"] = kwargs["variables"] | add_variables
+            kwargs["variables"] = variable_set_pool.intern(kwargs["variables"] | add_variables)
+        elif not need_variables:
+            kwargs["variables"] = variable_set_pool.intern(kwargs["variables"])
 
         eager_backends = list(backends._eager_backends) if "eager_backends" not in kwargs else kwargs["eager_backends"]
 
         if not kwargs["symbolic"] and eager_backends is not None and op not in operations.leaf_operations:
+            if eager_backends:
+                r = folding.fold(op, a_args)
+                if r is not None:
+                    return r
             for eb in eager_backends:
                 try:
                     r = operations._handle_annotations(eb._abstract(eb.call(op, args)), args)
@@ -228,6 +737,9 @@ class Base:
             skip_child_annotations = kwargs.pop("skip_child_annotations")
         else:
             skip_child_annotations = False
+        # ASTs that are restored as they were (see ASTReader and ASTArena) pass the uneliminatable annotations, which
+        # cannot be derived from their annotations alone
+        restored_uneliminatable_annotations = kwargs.pop("uneliminatable_annotations", None)
 
         if not annotations and not args_have_annotations:
             uneliminatable_annotations = frozenset()
@@ -273,11 +785,13 @@ class Base:
             )
 
         kwargs["annotations"] = annotations
+        if restored_uneliminatable_annotations is not None:
+            uneliminatable_annotations = restored_uneliminatable_annotations
 
         cache = cls._hash_cache
         if hash is not None:
             h = hash
-        elif op in {"BVS", "BVV", "BoolS", "BoolV", "FPS", "FPV"} and not annotations:
+        elif op in _leaf_cache_operations and not annotations:
             if op == "FPV" and a_args[0] == 0.0 and math.copysign(1, a_args[0]) < 0:
                 # Python does not distinguish between +0.0 and -0.0 so we add sign to tuple to distinguish
                 h = (op, kwargs.get("length", None), ("-",) + a_args)
@@ -290,7 +804,8 @@ class Base:
             cache = cls._leaf_cache
         else:
             h = Base._calc_hash(op, a_args, kwargs) if hash is None else hash
-        self = cache.get(h, None)
+        # the lookup in hash-first mode has already been counted as a miss
+        self = cache.peek(h, None) if counted else cache.get(h, None)
         if self is None:
             self = super().__new__(cls)
             depth = arg_max_depth + 1
@@ -298,12 +813,15 @@ class Base:
                 op,
                 a_args,
                 depth=depth,
+                tree_size=args_tree_size + 1,
+                dag_sketch=args_dag_sketch | _dag_sketch_bit(h),
                 uneliminatable_annotations=uneliminatable_annotations,
                 relocatable_annotations=relocatable_annotations,
                 **kwargs,
             )
             self._hash = h
-            cache[h] = self
+            # another thread may have built the same AST in the meantime
+            self = cache.setdefault(h, self)
         # else:
         #   if self.args != a_args or self.op != op or self.variables != kwargs['variables']:
         #       raise Exception("CRAP -- hash collision")
@@ -312,10 +830,23 @@ class Base:
 
     @classmethod
     def __init_with_annotations__(
-        cls, op, a_args, depth=None, uneliminatable_annotations=None, relocatable_annotations=None, **kwargs
+        cls,
+        op,
+        a_args,
+        depth=None,
+        tree_size=None,
+        dag_sketch=None,
+        uneliminatable_annotations=None,
+        relocatable_annotations=None,
+        **kwargs,
     ):
         cache = cls._hash_cache
-        h = Base._calc_hash(op, a_args, kwargs)
+        if _hash_first:
+            h = Base._calc_hash(
+                op, a_args, Base._structural_keywords(op, a_args, dict(kwargs, skip_child_annotations=True))
+            )
+        else:
+            h = Base._calc_hash(op, a_args, kwargs)
         self = cache.get(h, None)
         if self is not None:
             return self
@@ -325,15 +856,15 @@ class Base:
             op,
             a_args,
             depth=depth,
+            tree_size=tree_size,
+            dag_sketch=None if dag_sketch is None else dag_sketch | _dag_sketch_bit(h),
             uneliminatable_annotations=uneliminatable_annotations,
             relocatable_annotations=relocatable_annotations,
             **kwargs,
         )
 
         self._hash = h
-        cache[h] = self
-
-        return self
+        return cache.setdefault(h, self)
 
     def __reduce__(self):
         # HASHCONS: these attributes key the cache
@@ -350,17 +881,28 @@ class Base:
     @staticmethod
     def _calc_hash(op, args, keywords):
         """
-        Calculates the hash of an AST, given the operation, args, and kwargs.
+        Calculates the hash of an AST, given the operation, args, and kwargs, using the current hash scheme (see
+        :func:`set_hash_scheme`).
 
         :param op:                  The operation.
         :param args:                The arguments to the operation.
         :param keywords:            A dict including the 'symbolic', 'variables', and 'length' items.
         :returns:                   a hash.
+        """
+        return _hash_scheme(op, args, keywords)
+
+    @staticmethod
+    def _md5_hash(op, args, keywords):
+        """
+        The "md5" hash scheme: serializes the AST into a bytestring and hashes it with md5.
 
         We do it using md5 to avoid hash collisions.
         (hash(-1) == hash(-2), for example)
         """
-        args_tup = tuple(a if type(a) in (int, float) else getattr(a, "_hash", hash(a)) for a in args)
+        if _stable_hashes:
+            args_tup = tuple(_stable_arg_key(a) for a in args)
+        else:
+            args_tup = tuple(a if type(a) in (int, float) else getattr(a, "_hash", hash(a)) for a in args)
         # HASHCONS: these attributes key the cache
         # BEFORE CHANGING THIS, SEE ALL OTHER INSTANCES OF "HASHCONS" IN THIS FILE
 
@@ -371,9 +913,9 @@ class Base:
                 op,
                 args_tup,
                 str(keywords.get("length", None)),
-                hash(keywords["variables"]),
+                _variables_hash(keywords["variables"]),
                 keywords["symbolic"],
-                hash(keywords.get("annotations", None)),
+                _annotations_hash(keywords.get("annotations", None)),
             )
             to_hash = pickle.dumps(to_hash, -1)
 
@@ -383,6 +925,78 @@ class Base:
         hd = md5.md5(to_hash).digest()
         return md5_unpacker.unpack(hd)[0]  # 64 bits
 
+    @staticmethod
+    def _fast_hash(op, args, keywords):
+        """
+        The "fast" hash scheme: an incremental 128-bit multiply-xorshift combine of the hashes of the children and of
+        the other arguments, without serializing anything into an intermediate bytestring. Every component is mixed in
+        together with a tag for its type, so that, e.g., an integer argument cannot alias the hash of a child AST.
+
+        ASTs with arguments that this scheme cannot represent (anything besides ASTs, None, bools, 64-bit integers,
+        floats, strings and tuples thereof) are hashed with the md5 scheme instead.
+        """
+        h = _op_seeds.get(op, None)
+        if h is None:
+            h = _op_seeds[op] = int.from_bytes(md5.md5(op.encode()).digest(), "little")
+
+        for a in args:
+            x = _fast_arg_hash(a)
+            if x is None:
+                return Base._md5_hash(op, args, keywords)
+            h = ((h ^ x) * _MIX_MULTIPLIER) & _MASK128
+            h ^= h >> 64
+
+        length = keywords.get("length", None)
+        x = _TAG_NONE if length is None else _fast_arg_hash(length)
+        if x is None:
+            return Base._md5_hash(op, args, keywords)
+        annotations = keywords.get("annotations", None)
+        for x in (
+            x,
+            _variables_hash(keywords["variables"]) ^ _TAG_VARIABLES,
+            _TAG_TRUE if keywords["symbolic"] else _TAG_FALSE,
+            _TAG_NONE if annotations is None else _annotations_hash(annotations) ^ _TAG_ANNOTATIONS,
+        ):
+            h = ((h ^ x) * _MIX_MULTIPLIER) & _MASK128
+            h ^= h >> 64
+
+        return h
+
+    @staticmethod
+    def _structural_keywords(op, args, kwargs, add_variables=None):
+        """
+        Builds the keywords that are hashed in hash-first mode. Variables and the symbolic flag are derived from the
+        arguments for every operation except for symbolic leaves and unions, which introduce new variables, so those
+        are hashed as well. The variables of a union include the ones of its arguments, and its symbolic flag is
+        derived from them, whether they are passed explicitly (when an AST is rebuilt) or not (when it is built by the
+        operation).
+        """
+        if op in operations.leaf_operations_symbolic_with_union:
+            variables = kwargs.get("variables", _empty_variables)
+            if add_variables:
+                variables = variables | add_variables
+            if op in operations.leaf_operations_symbolic:
+                symbolic = kwargs.get("symbolic", False)
+            else:
+                variables = variables.union(*(a.variables for a in args if isinstance(a, Base)))
+                symbolic = False
+            variables = variable_set_pool.intern(variables)
+        else:
+            variables = _empty_variables
+            symbolic = False
+
+        annotations = kwargs.get("annotations", None)
+        annotations = tuple(annotations) if annotations else ()
+        if not kwargs.get("skip_child_annotations", False):
+            child_annotations = tuple(from_iterable(a._relocatable_annotations for a in args if isinstance(a, Base)))
+            if child_annotations:
+                annotations = child_annotations + annotations
+
+        keywords = {"variables": variables, "symbolic": symbolic, "annotations": annotations}
+        if "length" in kwargs:
+            keywords["length"] = kwargs["length"]
+        return keywords
+
     @staticmethod
     def _arg_serialize(arg) -> Optional[bytes]:
         if arg is None:
@@ -445,10 +1059,10 @@ class Base:
         else:
             length = b"none"
 
-        variables = struct.pack("<Q", hash(keywords["variables"]) & 0xFFFF_FFFF_FFFF_FFFF)
+        variables = struct.pack("<Q", _variables_hash(keywords["variables"]) & 0xFFFF_FFFF_FFFF_FFFF)
         symbolic = b"\x01" if keywords["symbolic"] else b"\x00"
         if "annotations" in keywords:
-            annotations = struct.pack("<Q", hash(keywords["annotations"]) & 0xFFFF_FFFF_FFFF_FFFF)
+            annotations = struct.pack("<Q", _annotations_hash(keywords["annotations"]) & 0xFFFF_FFFF_FFFF_FFFF)
         else:
             annotations = b"\xf9"
 
@@ -470,6 +1084,8 @@ class Base:
         annotations=None,
         encoded_name=None,
         depth=None,
+        tree_size=None,
+        dag_sketch=None,
         uneliminatable_annotations=None,
         relocatable_annotations=None,
     ):  # pylint:disable=unused-argument
@@ -483,23 +1099,29 @@ class Base:
         # HASHCONS: these attributes key the cache
         # BEFORE CHANGING THIS, SEE ALL OTHER INSTANCES OF "HASHCONS" IN THIS FILE
         self.op = op
+        self._opcode = operations.opcode(op)
         self.args = args if type(args) is tuple else tuple(args)
         self.length = length
-        self.variables = frozenset(variables) if type(variables) is not frozenset else variables
+        self.variables = variable_set_pool.intern(variables) if type(variables) is not VariableSet else variables
         self.symbolic = symbolic
         self.annotations: Tuple[Annotation] = annotations
         self._uneliminatable_annotations = uneliminatable_annotations
         self._relocatable_annotations = relocatable_annotations
 
         self.depth = depth if depth is not None else 1
+        self.tree_size = tree_size if tree_size is not None else 1
+        self._dag_sketch = dag_sketch if dag_sketch is not None else 0
+        self._dag_size = None
+        self._canonical = None
+        self._known_bits = None
 
         self._eager_backends = eager_backends
         self._cached_encoded_name = encoded_name
 
-        self._errored = errored if errored is not None else set()
+        self._errored = _intern_errored(frozenset(errored)) if errored else _empty_errored
 
         self._simplified = simplified
-        self._cache_key = ASTCacheKey(self)
+        self._cache_key = None
         self._excavated = None
         self._burrowed = None
 
@@ -517,12 +1139,35 @@ class Base:
             res = hash(self._hash)
         return res
 
+    @property
+    def opcode(self) -> int:
+        """
+        The integer opcode of the operation of this AST (see :func:`claripy.operations.opcode`).
+        """
+        return self._opcode
+
+    def is_leaf(self) -> bool:
+        """
+        Whether this AST is a leaf (a symbol or a value).
+        """
+        return bool(operations.opcode_flags[self._opcode] & operations.OPF_LEAF)
+
     @property
     def cache_key(self: T) -> ASTCacheKey[T]:
         """
         A key that refers to this AST - this value is appropriate for usage as a key in dictionaries.
         """
-        return self._cache_key
+        key = self._cache_key
+        if key is None:
+            # the key is created on first use, since most nodes never end up as a dictionary key
+            key = self._cache_key = ASTCacheKey(self)  # pylint:disable=attribute-defined-outside-init
+        return key
+
+    def _mark_errored(self, backend) -> None:
+        """
+        Records that `backend` is unable to handle this AST.
+        """
+        self._errored = _intern_errored(self._errored | {backend})  # pylint:disable=attribute-defined-outside-init
 
     @property
     def _encoded_name(self):
@@ -575,6 +1220,8 @@ class Base:
                 symbolic=self.symbolic,
                 length=kwargs["length"],
                 depth=self.depth,
+                tree_size=self.tree_size,
+                dag_sketch=self._dag_sketch,
                 eager_backends=self._eager_backends,
                 uc_alloc_depth=self._uc_alloc_depth,
             )
@@ -844,8 +1491,8 @@ class Base:
         ast_queue = deque([self])
         while ast_queue:
             ast = ast_queue.pop()
-            if isinstance(ast, Base) and id(ast.cache_key) not in seen:
-                seen.add(id(ast.cache_key))
+            if isinstance(ast, Base) and id(ast) not in seen:
+                seen.add(id(ast))
 
                 if ast.depth == 1:
                     yield ast
@@ -854,6 +1501,31 @@ class Base:
                 ast_queue.extend(ast.args)
                 continue
 
+    def dag_size(self) -> int:
+        """
+        Return the number of unique nodes of this AST (including itself), counting shared subexpressions once. The
+        count is computed on the first call and cached on the node. See `dag_size_estimate` for a constant-time
+        estimate.
+        """
+        if self._dag_size is None:
+            visitor = DAGVisitor(_visit_nothing)
+            visitor.walk(self)
+            self._dag_size = len(visitor.memo)
+        return self._dag_size
+
+    @property
+    def dag_size_estimate(self) -> int:
+        """
+        An estimate of the number of unique nodes of this AST, which is maintained at construction time and is cheap
+        to read. It is usually within 30% of `dag_size()`, and never less than the depth nor more than the tree size
+        of the AST.
+        """
+        if self._dag_size is not None:
+            return self._dag_size
+        if self.tree_size <= self.depth:
+            return self.tree_size
+        return max(self.depth, min(self.tree_size, round(_dag_sketch_estimate(self._dag_sketch))))
+
     # TODO: Deprecate this property
     @property
     def recursive_children_asts(self):
@@ -950,29 +1622,36 @@ class Base:
 
         # TODO: Convert a and b into canonical forms
 
-        if self.op != o.op:
-            return False
-
-        if len(self.args) != len(o.args):
-            return False
-
-        for arg_a, arg_b in zip(self.args, o.args):
-            if not isinstance(arg_a, Base):
-                if type(arg_a) != type(arg_b):
-                    return False
-                # They are not ASTs
-                if arg_a != arg_b:
-                    return False
-                else:
-                    continue
+        # the pairs of nodes that still have to be compared, and those that are known to match
+        pairs = [(self, o)]
+        matched = set()
+        while pairs:
+            a, b = pairs.pop()
+            if (id(a), id(b)) in matched:
+                continue
+            matched.add((id(a), id(b)))
+
+            if a.op != b.op or len(a.args) != len(b.args):
+                return False
+
+            for arg_a, arg_b in zip(a.args, b.args):
+                if not isinstance(arg_a, Base):
+                    if type(arg_a) != type(arg_b):
+                        return False
+                    # They are not ASTs
+                    if arg_a != arg_b:
+                        return False
+                    else:
+                        continue
 
-            if arg_a.op in operations.leaf_operations:
-                if arg_a is not arg_b:
-                    return False
+                if arg_a.is_leaf():
+                    if arg_a is not arg_b:
+                        return False
 
-            else:
-                if not arg_a.structurally_match(arg_b):
-                    return False
+                elif arg_a is not arg_b:
+                    if not isinstance(arg_b, Base):
+                        return False
+                    pairs.append((arg_a, arg_b))
 
         return True
 
@@ -987,64 +1666,7 @@ class Base:
         :param leaf_operation:      An operation that should be applied to the leaf nodes.
         :returns:                   An AST with all instances of ast's in replacements.
         """
-        if variable_set is None:
-            variable_set = set()
-
-        if leaf_operation is None:
-            leaf_operation = lambda x: x
-
-        arg_queue = [iter([self])]
-        rep_queue = []
-        ast_queue = []
-
-        while arg_queue:
-            try:
-                ast = next(arg_queue[-1])
-                repl = ast
-
-                if not isinstance(ast, Base):
-                    rep_queue.append(repl)
-                    continue
-
-                elif ast.cache_key in replacements:
-                    repl = replacements[ast.cache_key]
-
-                elif ast.variables >= variable_set:
-                    if ast.op in operations.leaf_operations:
-                        repl = leaf_operation(ast)
-                        if repl is not ast:
-                            replacements[ast.cache_key] = repl
-
-                    elif ast.depth > 1:
-                        arg_queue.append(iter(ast.args))
-                        ast_queue.append(ast)
-                        continue
-
-                rep_queue.append(repl)
-                continue
-
-            except StopIteration:
-                arg_queue.pop()
-
-                if ast_queue:
-                    ast = ast_queue.pop()
-                    repl = ast
-
-                    args = rep_queue[-len(ast.args) :]
-                    del rep_queue[-len(ast.args) :]
-
-                    # Check if replacement occurred.
-                    if any((a is not b for a, b in zip(ast.args, args))):
-                        repl = ast.make_like(ast.op, tuple(args))
-                        replacements[ast.cache_key] = repl
-
-                    rep_queue.append(repl)
-
-        assert len(arg_queue) == 0, "arg_queue is not empty"
-        assert len(ast_queue) == 0, "ast_queue is not empty"
-        assert len(rep_queue) == 1, ("rep_queue has unexpected length", len(rep_queue))
-
-        return rep_queue.pop()
+        return _replacer(replacements, variable_set, leaf_operation).walk(self)
 
     def replace(self: T, old, new, variable_set=None, leaf_operation=None) -> T:  # pylint:disable=unused-argument
         """
@@ -1062,16 +1684,50 @@ class Base:
             raise ClaripyReplacementError(f"cannot replace type {type(old)} ast with type {type(new)} ast")
 
     def _identify_vars(self, all_vars, counter):
-        if self.op == "BVS":
-            if self.args not in all_vars:
-                all_vars[self.args] = BV("BVS", self.args, length=self.length, explicit_name=True)
-        elif self.op == "BoolS":
-            if self.args not in all_vars:
-                all_vars[self.args] = BoolS("var_" + str(next(counter)))
-        else:
-            for arg in self.args:
-                if isinstance(arg, Base):
-                    arg._identify_vars(all_vars, counter)
+        def _pre(ast):
+            if ast.op == "BVS":
+                if ast.args not in all_vars:
+                    all_vars[ast.args] = BV("BVS", ast.args, length=ast.length, explicit_name=True)
+            elif ast.op == "BoolS":
+                if ast.args not in all_vars:
+                    all_vars[ast.args] = BoolS("var_" + str(next(counter)))
+            else:
+                return DESCEND
+            return None
+
+        DAGVisitor(_visit_nothing, pre=_pre).walk(self)
+
+    def canonical_form(self) -> Tuple[int, Tuple[str, ...]]:
+        """
+        Return the alpha-canonical form of this AST: a 128-bit hash that only depends on the structure of the AST and
+        not on the names of its variables, and the names of the variables in their canonical order (the order in which
+        they first appear, from left to right). Two ASTs that are the same up to a consistent renaming of their
+        variables have the same hash, and the variables at the same positions are the ones that correspond to each
+        other, so a model of one translates to the other through ``dict(zip(variables, other_variables))``.
+
+        The form is computed from those of the children and memoized on every node.
+        """
+        r = self._canonical
+        if r is None:
+            r = DAGVisitor(_canonical_visit, pre=_canonical_pre).walk(self)
+        return r
+
+    def known_bits(self) -> Tuple[int, int]:
+        """
+        Return the bits of this AST that have the same value for all assignments of its variables, as a tuple of a
+        mask of these bits and their values (see :mod:`claripy.known_bits`). Bools are treated as 1-bit values, and
+        nothing is known about ASTs of other sorts.
+
+        The known bits are computed from those of the children and memoized on every node.
+        """
+        return known_bits.known_bits(self)
+
+    @property
+    def canonical_hash(self) -> int:
+        """
+        The hash of the alpha-canonical form of this AST (see :meth:`canonical_form`).
+        """
+        return self.canonical_form()[0]
 
     def canonicalize(self: T, var_map=None, counter=None) -> T:
         counter = itertools.count() if counter is None else counter
@@ -1089,122 +1745,136 @@ class Base:
     # them to shallower levels.
     #
 
-    def _burrow_ite(self):
-        if self.op != "If":
-            # print("i'm not an if")
-            return self.swap_args([(a.ite_burrowed if isinstance(a, Base) else a) for a in self.args])
-
+    def _burrow_ite_step(self):
+        """
+        Checks whether this If can be burrowed one level down, i.e., whether its two branches are the same operation
+        with only one differing argument. If so, returns the true branch, the index of the differing argument and the
+        If that selects between the two differing arguments. Otherwise, returns None.
+        """
         if not all(isinstance(a, Base) for a in self.args):
             # print("not all my args are bases")
-            return self
+            return None
 
         old_true = self.args[1]
         old_false = self.args[2]
 
         if old_true.op != old_false.op or len(old_true.args) != len(old_false.args):
-            return self
+            return None
 
         if old_true.op == "If":
             # let's no go into this right now
-            return self
+            return None
 
-        if any(a.op in operations.leaf_operations for a in self.args):
+        if any(a.is_leaf() for a in self.args):
             # burrowing through these is pretty funny
-            return self
+            return None
 
         matches = [old_true.args[i] is old_false.args[i] for i in range(len(old_true.args))]
         if matches.count(True) != 1 or all(matches):
             # TODO: handle multiple differences for multi-arg ast nodes
             # print("wrong number of matches:",matches,old_true,old_false)
-            return self
+            return None
 
         different_idx = matches.index(False)
         inner_if = If(self.args[0], old_true.args[different_idx], old_false.args[different_idx])
-        new_args = list(old_true.args)
-        new_args[different_idx] = inner_if.ite_burrowed
-        # print("replaced the",different_idx,"arg:",new_args)
-        return old_true.__class__(old_true.op, new_args, length=self.length)
-
-    def _excavate_ite(self):
-        ast_queue = [iter([self])]
-        arg_queue = []
-        op_queue = []
+        return old_true, different_idx, inner_if
 
-        while ast_queue:
-            try:
-                ast = next(ast_queue[-1])
+    def _burrow_ite(self):
+        # The burrowed version of a node depends on the burrowed versions of its arguments (or, for an If that can be
+        # burrowed, on that of the inner If). They are computed with an explicit stack, and cached on the nodes.
+        stack = [self]
+        steps = {}
+        while stack:
+            ast = stack[-1]
+            if ast._burrowed is not None and ast is not self:
+                stack.pop()
+                continue
 
-                if not isinstance(ast, Base):
-                    arg_queue.append(ast)
+            key = id(ast)
+            if key not in steps:
+                if ast.op != "If":
+                    steps[key] = None
+                    deps = [a for a in ast.args if isinstance(a, Base) and a._burrowed is None]
+                else:
+                    step = steps[key] = ast._burrow_ite_step()
+                    deps = [step[2]] if step is not None and step[2]._burrowed is None else []
+                if deps:
+                    stack.extend(deps)
                     continue
 
-                if ast.op in operations.leaf_operations:
-                    arg_queue.append(ast)
-                    continue
+            stack.pop()
+            step = steps[key]
+            if ast.op != "If":
+                burrowed = ast.swap_args([(a._burrowed if isinstance(a, Base) else a) for a in ast.args])
+            elif step is None:
+                burrowed = ast
+            else:
+                old_true, different_idx, inner_if = step
+                new_args = list(old_true.args)
+                new_args[different_idx] = inner_if._burrowed
+                # print("replaced the",different_idx,"arg:",new_args)
+                burrowed = old_true.__class__(old_true.op, new_args, length=ast.length)
 
-                if ast.annotations:
-                    arg_queue.append(ast)
-                    continue
+            if ast is self:
+                return burrowed
+            ast._burrowed = burrowed
+            burrowed._burrowed = burrowed
 
-                op_queue.append(ast)
-                ast_queue.append(iter(ast.args))
+    def _excavate_ite(self):
+        def _pre(ast):
+            if ast.is_leaf() or ast.annotations:
+                return ast
+            if ast._excavated is not None and ast is not self:
+                return ast._excavated
+            return DESCEND
 
-            except StopIteration:
-                ast_queue.pop()
+        def _visit(op, args):
+            ite_args = [isinstance(a, Base) and a.op == "If" for a in args]
 
-                if op_queue:
-                    op = op_queue.pop()
+            if op.op == "If":
+                # if we are an If, call the If handler so that we can take advantage of its simplifiers
+                excavated = If(*args)
 
-                    args = arg_queue[-len(op.args) :]
-                    del arg_queue[-len(op.args) :]
+            elif ite_args.count(True) == 0:
+                # if there are no ifs that came to the surface, there's nothing more to do
+                excavated = op.swap_args(args, simplify=True)
 
-                    ite_args = [isinstance(a, Base) and a.op == "If" for a in args]
+            else:
+                # this gets called when we're *not* in an If, but there are Ifs in the args.
+                # it pulls those Ifs out to the surface.
+                cond = args[ite_args.index(True)].args[0]
+                new_true_args = []
+                new_false_args = []
+
+                for a in args:
+                    if not isinstance(a, Base) or a.op != "If":
+                        new_true_args.append(a)
+                        new_false_args.append(a)
+                    elif a.args[0] is cond:
+                        new_true_args.append(a.args[1])
+                        new_false_args.append(a.args[2])
+                    elif a.args[0] is Not(cond):
+                        new_true_args.append(a.args[2])
+                        new_false_args.append(a.args[1])
+                    else:
+                        # weird conditions -- giving up!
+                        excavated = op.swap_args(args, simplify=True)
+                        break
 
-                    if op.op == "If":
-                        # if we are an If, call the If handler so that we can take advantage of its simplifiers
-                        excavated = If(*args)
+                else:
+                    excavated = If(
+                        cond,
+                        op.swap_args(new_true_args, simplify=True),
+                        op.swap_args(new_false_args, simplify=True),
+                    )
 
-                    elif ite_args.count(True) == 0:
-                        # if there are no ifs that came to the surface, there's nothing more to do
-                        excavated = op.swap_args(args, simplify=True)
+            # the excavated subexpressions are cached as well, so that shared (or later excavated) subexpressions
+            # are not excavated again
+            if op is not self:
+                op._excavated = excavated
+            return excavated
 
-                    else:
-                        # this gets called when we're *not* in an If, but there are Ifs in the args.
-                        # it pulls those Ifs out to the surface.
-                        cond = args[ite_args.index(True)].args[0]
-                        new_true_args = []
-                        new_false_args = []
-
-                        for a in args:
-                            if not isinstance(a, Base) or a.op != "If":
-                                new_true_args.append(a)
-                                new_false_args.append(a)
-                            elif a.args[0] is cond:
-                                new_true_args.append(a.args[1])
-                                new_false_args.append(a.args[2])
-                            elif a.args[0] is Not(cond):
-                                new_true_args.append(a.args[2])
-                                new_false_args.append(a.args[1])
-                            else:
-                                # weird conditions -- giving up!
-                                excavated = op.swap_args(args, simplify=True)
-                                break
-
-                        else:
-                            excavated = If(
-                                cond,
-                                op.swap_args(new_true_args, simplify=True),
-                                op.swap_args(new_false_args, simplify=True),
-                            )
-
-                    # continue
-                    arg_queue.append(excavated)
-
-        assert len(op_queue) == 0, "op_queue is not empty"
-        assert len(ast_queue) == 0, "ast_queue is not empty"
-        assert len(arg_queue) == 1, ("arg_queue has unexpected length", len(arg_queue))
-
-        return arg_queue.pop()
+        return DAGVisitor(_visit, pre=_pre).walk(self)
 
     @property
     def ite_burrowed(self: T) -> T:
@@ -1334,8 +2004,66 @@ class Base:
             return self
 
 
+_hash_schemes = {"md5": Base._md5_hash, "fast": Base._fast_hash}
+_hash_scheme = Base._md5_hash
+
+
+#
+# Replacements
+#
+
+
+def _replacer(replacements, variable_set=None, leaf_operation=None) -> "DAGVisitor":
+    """
+    Builds the visitor that carries out replacements for replace_dict() and replace_many().
+    """
+    if variable_set is None:
+        variable_set = set()
+
+    def _pre(ast):
+        key = ast.cache_key
+        if key in replacements:
+            return replacements[key]
+        if not ast.variables >= variable_set:
+            return ast
+        if ast.is_leaf():
+            if leaf_operation is None:
+                return ast
+            repl = leaf_operation(ast)
+            if repl is not ast:
+                replacements[key] = repl
+            return repl
+        if ast.depth == 1:
+            return ast
+        return DESCEND
+
+    def _visit(ast, args):
+        # Check if replacement occurred.
+        if any(a is not b for a, b in zip(ast.args, args)):
+            repl = ast.make_like(ast.op, args)
+            replacements[ast.cache_key] = repl
+            return repl
+        return ast
+
+    return DAGVisitor(_visit, pre=_pre)
+
+
+def replace_many(asts: Iterable, replacements, variable_set=None, leaf_operation=None) -> List:
+    """
+    Carries out the same replacements as :meth:`Base.replace_dict` in several ASTs at once. The subexpressions that
+    the ASTs have in common are only visited once.
+
+    :param asts:                The ASTs (other values are returned as they are).
+    :param replacements:        A dictionary of cache keys to their replacements.
+    :param variable_set:        For optimization, ast's without these variables are not checked for replacing.
+    :param leaf_operation:      An operation that should be applied to the leaf nodes.
+    :returns:                   A list of the ASTs, with all instances of ast's in replacements replaced.
+    """
+    return _replacer(replacements, variable_set, leaf_operation).walk_all(asts)
+
+
 def simplify(e: T) -> T:
-    if isinstance(e, Base) and e.op in operations.leaf_operations:
+    if isinstance(e, Base) and e.is_leaf():
         return e
 
     s = e._first_backend("simplify")
@@ -1361,9 +2089,12 @@ def simplify(e: T) -> T:
         return s
 
 
-from ..errors import BackendError, ClaripyOperationError, ClaripyReplacementError
+from ..errors import BackendError, ClaripyOperationError, ClaripyReplacementError, ClaripyValueError
 from .. import operations
+from .. import folding
+from .. import known_bits
 from ..backend_manager import backends
 from ..ast.bool import If, Not, BoolS
 from ..ast.bv import BV
 from .. import simplifications
+from .visitor import DAGVisitor, DESCEND
@@ -158,6 +158,10 @@ Bool.__ror__ = Or
 
 
 def is_true(e, exact=None):  # pylint:disable=unused-argument
+    truth = known_bits.known_truth(e)
+    if truth is not None:
+        return truth
+
     for b in backends._quick_backends:
         try:
             return b.is_true(e)
@@ -169,6 +173,10 @@ def is_true(e, exact=None):  # pylint:disable=unused-argument
 
 
 def is_false(e, exact=None):  # pylint:disable=unused-argument
+    truth = known_bits.known_truth(e)
+    if truth is not None:
+        return not truth
+
     for b in backends._quick_backends:
         try:
             return b.is_false(e)
@@ -268,6 +276,7 @@ def constraint_to_si(expr):
     return satisfiable, replace_list
 
 
+from .. import known_bits
 from ..backend_manager import backends
 from ..errors import ClaripyOperationError, ClaripyTypeError, BackendError
 from .bits import Bits
@@ -1,15 +1,14 @@
 import logging
 import numbers
-import weakref
 
 from .bits import Bits
-from ..ast.base import _make_name
+from ..ast.base import _make_name, HASH_CONS_SHARDS
 from .bool import If
-from ..utils import deprecated
+from ..utils import deprecated, HashConsCache
 
 l = logging.getLogger("claripy.ast.bv")
 
-_bvv_cache = weakref.WeakValueDictionary()
+_bvv_cache = HashConsCache(shards=HASH_CONS_SHARDS)
 
 
 # This is a hilarious hack to get around some sort of bug in z3's python bindings, where
@@ -296,14 +295,14 @@ def BVV(value, size=None, **kwargs) -> BV:
         value &= (1 << size) - 1
 
     if not kwargs:
-        try:
-            return _bvv_cache[(value, size)]
-        except KeyError:
-            pass
+        result = _bvv_cache.get((value, size), None)
+        if result is not None:
+            return result
 
     result = BV("BVV", (value, size), length=size, **kwargs)
-    _bvv_cache[(value, size)] = result
-    return result
+    if kwargs:
+        return result
+    return _bvv_cache.setdefault((value, size), result)
 
 
 def SI(
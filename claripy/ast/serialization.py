@@ -0,0 +1,496 @@
+"""
+A compact binary format for storing AST DAGs.
+
+Pickling ASTs describes every AST (and everything below it) separately. This format instead writes a stream of
+records in which every unique node appears exactly once, after all of its children, and refers to them by their
+position in the stream. Strings, AST classes and other objects (annotations, floating-point sorts, ...) are also
+written once and referred to by index afterwards.
+
+The stream starts with a header (the magic bytes and the hash settings of the writer), followed by records that each
+start with a one-byte tag:
+
+- ``S``: a string (length, utf-8 bytes).
+- ``C``: an AST class (module name and class name, as string references).
+- ``O``: a pickled object (length, bytes).
+- ``N``: a node: class, operation name, flags, length, the arguments, and, depending on the flags, its hash, its
+  variables (for operations that introduce new variables), its annotations and its uneliminatable annotations (which
+  include those of its children). Annotations are written as references to objects, so that an annotation that is
+  shared by several nodes is read back as one object.
+- ``R``: a root, i.e., one of the ASTs that were passed to :meth:`ASTWriter.write`.
+- ``E``: the end of the stream.
+
+All integers are written as LEB128 varints.
+"""
+
+import importlib
+import io
+import mmap
+import pickle
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+from .base import Base, _hash_config
+
+MAGIC = b"CLDAG\x02"
+
+_TAG_STRING = ord("S")
+_TAG_CLASS = ord("C")
+_TAG_OBJECT = ord("O")
+_TAG_NODE = ord("N")
+_TAG_ROOT = ord("R")
+_TAG_END = ord("E")
+
+# argument encodings
+_V_NODE = 0
+_V_UINT = 1
+_V_NINT = 2
+_V_STR = 3
+_V_NONE = 4
+_V_TRUE = 5
+_V_FALSE = 6
+_V_FLOAT = 7
+_V_TUPLE = 8
+_V_OBJECT = 9
+
+# node flags
+_F_SYMBOLIC = 1
+_F_ANNOTATED = 2
+_F_HASHED = 4
+_F_UNINITIALIZED_TRUE = 8
+_F_UNINITIALIZED_FALSE = 16
+_F_UNELIMINATABLE = 32
+
+_float_struct = struct.Struct("<d")
+
+
+def _write_uint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _ast_children(args) -> Iterator[Base]:
+    for a in args:
+        if isinstance(a, Base):
+            yield a
+        elif type(a) is tuple:
+            yield from _ast_children(a)
+
+
+class ASTWriter:
+    """
+    Writes ASTs to a binary stream. Nodes that are shared between the written ASTs (or that were written before) are
+    only written once.
+
+    The stream is only complete once the writer is closed (or used as a context manager).
+    """
+
+    def __init__(self, f: BinaryIO, buffer_size: int = 1 << 16):
+        """
+        :param f:           The (binary) file object to write to.
+        :param buffer_size: The number of bytes to buffer before writing to `f`.
+        """
+        self._f = f
+        self._buffer_size = buffer_size
+        self._out = bytearray(MAGIC)
+        self._index_of = {}
+        self._strings = {}
+        self._classes = {}
+        self._objects = {}
+        # objects that are memoized by their id() have to be kept alive
+        self._keepalive = []
+        self._closed = False
+
+        config = _hash_config().encode()
+        _write_uint(self._out, len(config))
+        self._out += config
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def node_count(self) -> int:
+        """
+        The number of unique nodes that were written so far.
+        """
+        return len(self._index_of)
+
+    def write(self, ast: Base) -> int:
+        """
+        Writes an AST, and all of the nodes below it that have not been written yet.
+
+        :param ast: The AST.
+        :return:    The index of the node that represents `ast` in the stream.
+        """
+        index_of = self._index_of
+        index = index_of.get(ast._hash, None)
+        if index is None:
+            stack = [(ast, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if node._hash in index_of:
+                    continue
+                if not expanded:
+                    stack.append((node, True))
+                    stack.extend((a, False) for a in _ast_children(node.args) if a._hash not in index_of)
+                    continue
+                self._write_node(node)
+            index = index_of[ast._hash]
+
+        out = self._out
+        out.append(_TAG_ROOT)
+        _write_uint(out, index)
+        if len(out) >= self._buffer_size:
+            self.flush()
+        return index
+
+    def write_all(self, asts: Iterable[Base]) -> List[int]:
+        return [self.write(a) for a in asts]
+
+    def flush(self) -> None:
+        if self._out:
+            self._f.write(self._out)
+            self._out = bytearray()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._out.append(_TAG_END)
+            self.flush()
+            self._closed = True
+
+    #
+    # Tables
+    #
+
+    def _string(self, s: str) -> int:
+        idx = self._strings.get(s, None)
+        if idx is None:
+            idx = self._strings[s] = len(self._strings)
+            data = s.encode("utf-8", "surrogatepass")
+            out = self._out
+            out.append(_TAG_STRING)
+            _write_uint(out, len(data))
+            out += data
+        return idx
+
+    def _class(self, cls: type) -> int:
+        idx = self._classes.get(cls, None)
+        if idx is None:
+            module = self._string(cls.__module__)
+            name = self._string(cls.__qualname__)
+            idx = self._classes[cls] = len(self._classes)
+            out = self._out
+            out.append(_TAG_CLASS)
+            _write_uint(out, module)
+            _write_uint(out, name)
+        return idx
+
+    def _object(self, obj) -> int:
+        try:
+            key = (type(obj), obj)
+            idx = self._objects.get(key, None)
+        except TypeError:
+            key = id(obj)
+            idx = self._objects.get(key, None)
+            if idx is None:
+                self._keepalive.append(obj)
+
+        if idx is None:
+            idx = self._objects[key] = len(self._objects)
+            data = pickle.dumps(obj, 4)
+            out = self._out
+            out.append(_TAG_OBJECT)
+            _write_uint(out, len(data))
+            out += data
+        return idx
+
+    #
+    # Nodes
+    #
+
+    def _write_value(self, rec: bytearray, v) -> None:
+        t = type(v)
+        if t is int:
+            if v >= 0:
+                rec.append(_V_UINT)
+                _write_uint(rec, v)
+            else:
+                rec.append(_V_NINT)
+                _write_uint(rec, -v)
+        elif isinstance(v, Base):
+            rec.append(_V_NODE)
+            _write_uint(rec, self._index_of[v._hash])
+        elif t is str:
+            rec.append(_V_STR)
+            _write_uint(rec, self._string(v))
+        elif v is None:
+            rec.append(_V_NONE)
+        elif v is True:
+            rec.append(_V_TRUE)
+        elif v is False:
+            rec.append(_V_FALSE)
+        elif t is float:
+            rec.append(_V_FLOAT)
+            rec += _float_struct.pack(v)
+        elif t is tuple:
+            rec.append(_V_TUPLE)
+            _write_uint(rec, len(v))
+            for e in v:
+                self._write_value(rec, e)
+        else:
+            rec.append(_V_OBJECT)
+            _write_uint(rec, self._object(v))
+
+    def _write_objects(self, rec: bytearray, objs) -> None:
+        _write_uint(rec, len(objs))
+        for obj in objs:
+            _write_uint(rec, self._object(obj))
+
+    def _write_node(self, node: Base) -> None:
+        rec = bytearray()
+        rec.append(_TAG_NODE)
+        _write_uint(rec, self._class(type(node)))
+        _write_uint(rec, self._string(node.op))
+
+        h = node._hash
+        uninitialized = node._uninitialized
+        flags = (
+            (_F_SYMBOLIC if node.symbolic else 0)
+            | (_F_ANNOTATED if node.annotations else 0)
+            | (_F_HASHED if type(h) is int else 0)
+            | (_F_UNINITIALIZED_TRUE if uninitialized is True else 0)
+            | (_F_UNINITIALIZED_FALSE if uninitialized is False else 0)
+            | (_F_UNELIMINATABLE if node._uneliminatable_annotations else 0)
+        )
+        rec.append(flags)
+        _write_uint(rec, 0 if node.length is None else node.length + 1)
+        _write_uint(rec, len(node.args))
+        for a in node.args:
+            self._write_value(rec, a)
+
+        if flags & _F_HASHED:
+            _write_uint(rec, h)
+        if operations.opcode_flags[node._opcode] & operations.OPF_INTRODUCES_VARIABLES:
+            _write_uint(rec, len(node.variables))
+            for v in sorted(node.variables):
+                _write_uint(rec, self._string(v))
+        if flags & _F_ANNOTATED:
+            self._write_objects(rec, node.annotations)
+        if flags & _F_UNELIMINATABLE:
+            self._write_objects(rec, node._uneliminatable_annotations)
+
+        self._out += rec
+        self._index_of[h] = len(self._index_of)
+
+
+class ASTReader:
+    """
+    Reads ASTs from a buffer (bytes, or a memory-mapped file) that was written by :class:`ASTWriter`.
+
+    Nodes are rebuilt in the order in which they were written, so every node is constructed exactly once, directly
+    from its already-constructed children. If `trust_hashes` is set and the stream was written with the same hash
+    settings (see :func:`claripy.ast.base.set_hash_scheme` and :func:`claripy.ast.base.set_stable_hashes`), the
+    stored hashes are used instead of hashing every node again. Without stable hashes, this is only correct for
+    streams that were written by a process with the same PYTHONHASHSEED.
+    """
+
+    def __init__(self, data, trust_hashes: bool = False):
+        """
+        :param data:            A bytes-like object, or an mmap.
+        :param trust_hashes:    Whether to reuse the stored hashes.
+        """
+        if data[: len(MAGIC)] != MAGIC:
+            raise ClaripySerializationError("Not a serialized AST DAG")
+
+        self._data = data
+        self._pos = len(MAGIC)
+        config = self._read_bytes(self._read_uint()).decode()
+        self.trusted = trust_hashes and config == _hash_config()
+
+        self._nodes: List[Base] = []
+        self._strings: List[str] = []
+        self._classes: List[type] = []
+        self._objects: List = []
+
+    def __iter__(self) -> Iterator[Base]:
+        """
+        Yields the root ASTs in the order in which they were written, parsing the stream as it goes.
+        """
+        data = self._data
+        size = len(data)
+        nodes = self._nodes
+        while self._pos < size:
+            tag = data[self._pos]
+            self._pos += 1
+            if tag == _TAG_NODE:
+                self._read_node()
+            elif tag == _TAG_ROOT:
+                yield nodes[self._read_uint()]
+            elif tag == _TAG_STRING:
+                self._strings.append(self._read_bytes(self._read_uint()).decode("utf-8", "surrogatepass"))
+            elif tag == _TAG_CLASS:
+                self._read_class()
+            elif tag == _TAG_OBJECT:
+                self._objects.append(pickle.loads(self._read_bytes(self._read_uint())))
+            elif tag == _TAG_END:
+                return
+            else:
+                raise ClaripySerializationError(f"Unknown record type {tag:#x} at offset {self._pos - 1}")
+
+    def read_all(self) -> List[Base]:
+        return list(self)
+
+    def _read_uint(self) -> int:
+        data = self._data
+        pos = self._pos
+        b = data[pos]
+        pos += 1
+        if b < 0x80:
+            self._pos = pos
+            return b
+        n = b & 0x7F
+        shift = 7
+        while True:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        self._pos = pos
+        return n
+
+    def _read_bytes(self, n: int) -> bytes:
+        start = self._pos
+        self._pos = start + n
+        return bytes(self._data[start : start + n])
+
+    def _read_class(self) -> None:
+        module = self._strings[self._read_uint()]
+        name = self._strings[self._read_uint()]
+        obj = importlib.import_module(module)
+        for part in name.split("."):
+            obj = getattr(obj, part)
+        self._classes.append(obj)
+
+    def _read_value(self):
+        data = self._data
+        tag = data[self._pos]
+        self._pos += 1
+        if tag == _V_NODE:
+            return self._nodes[self._read_uint()]
+        if tag == _V_UINT:
+            return self._read_uint()
+        if tag == _V_NINT:
+            return -self._read_uint()
+        if tag == _V_STR:
+            return self._strings[self._read_uint()]
+        if tag == _V_NONE:
+            return None
+        if tag == _V_TRUE:
+            return True
+        if tag == _V_FALSE:
+            return False
+        if tag == _V_FLOAT:
+            (v,) = _float_struct.unpack_from(data, self._pos)
+            self._pos += 8
+            return v
+        if tag == _V_TUPLE:
+            return tuple(self._read_value() for _ in range(self._read_uint()))
+        if tag == _V_OBJECT:
+            return self._objects[self._read_uint()]
+        raise ClaripySerializationError(f"Unknown value type {tag:#x} at offset {self._pos - 1}")
+
+    def _read_objects(self) -> tuple:
+        objects = self._objects
+        return tuple(objects[self._read_uint()] for _ in range(self._read_uint()))
+
+    def _read_node(self) -> None:
+        cls = self._classes[self._read_uint()]
+        op = self._strings[self._read_uint()]
+        flags = self._data[self._pos]
+        self._pos += 1
+        length = self._read_uint()
+        args = tuple(self._read_value() for _ in range(self._read_uint()))
+
+        # the stored annotations already include the ones relocated from the children, and the uneliminatable
+        # annotations are restored as they were
+        kwargs = {"symbolic": bool(flags & _F_SYMBOLIC), "eager_backends": None, "skip_child_annotations": True}
+        if length:
+            kwargs["length"] = length - 1
+        if flags & _F_HASHED:
+            h = self._read_uint()
+            if self.trusted:
+                kwargs["hash"] = h
+        if operations.opcode_flags[operations.opcode(op)] & operations.OPF_INTRODUCES_VARIABLES:
+            kwargs["variables"] = frozenset(self._strings[self._read_uint()] for _ in range(self._read_uint()))
+        if flags & _F_ANNOTATED:
+            kwargs["annotations"] = self._read_objects()
+        if flags & _F_UNELIMINATABLE:
+            kwargs["uneliminatable_annotations"] = frozenset(self._read_objects())
+        if flags & _F_UNINITIALIZED_TRUE:
+            kwargs["uninitialized"] = True
+        elif flags & _F_UNINITIALIZED_FALSE:
+            kwargs["uninitialized"] = False
+
+        self._nodes.append(cls(op, args, **kwargs))
+
+
+#
+# Convenience functions
+#
+
+
+def dump(asts: Iterable[Base], f: BinaryIO) -> None:
+    """
+    Writes ASTs to a binary file object.
+    """
+    with ASTWriter(f) as writer:
+        writer.write_all(asts)
+
+
+def dumps(asts: Iterable[Base]) -> bytes:
+    """
+    Serializes ASTs into a bytestring.
+    """
+    f = io.BytesIO()
+    dump(asts, f)
+    return f.getvalue()
+
+
+def loads(data, trust_hashes: bool = False) -> List[Base]:
+    """
+    Deserializes the ASTs in a bytestring (or any other bytes-like object).
+    """
+    return ASTReader(data, trust_hashes=trust_hashes).read_all()
+
+
+def load(f: BinaryIO, trust_hashes: bool = False, use_mmap: Optional[bool] = None) -> List[Base]:
+    """
+    Reads ASTs from a binary file object.
+
+    :param f:               The file object.
+    :param trust_hashes:    Whether to reuse the stored hashes (see :class:`ASTReader`).
+    :param use_mmap:        Whether to map the file into memory instead of reading it. By default, files are mapped
+                            if they have a file descriptor.
+    """
+    if use_mmap is None:
+        try:
+            f.fileno()
+            use_mmap = True
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            use_mmap = False
+
+    if not use_mmap:
+        return loads(f.read(), trust_hashes=trust_hashes)
+
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return ASTReader(m, trust_hashes=trust_hashes).read_all()
+
+
+from .. import operations
+from ..errors import ClaripySerializationError
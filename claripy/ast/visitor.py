@@ -0,0 +1,151 @@
+"""
+A memoized, non-recursive post-order visitor for AST DAGs.
+
+ASTs are hash-consed, so an expression is a DAG in which a subexpression can be shared by many parents. Walking such an
+expression as a tree visits shared nodes over and over (exponentially often, in the worst case), and walking it
+recursively fails on very deep expressions. :class:`DAGVisitor` walks the DAG with an explicit stack and remembers the
+result for every node, so that every unique node is visited once.
+
+A walk is driven by two callbacks:
+
+- ``pre(node)`` is called when a node is reached for the first time, before its arguments are visited. It either
+  returns :data:`DESCEND` to visit the arguments, or any other value, which becomes the result for the node without
+  looking at its arguments. This is how subtrees are cut early, for example::
+
+      pre = lambda node: node if node.variables.isdisjoint(interesting) else DESCEND
+
+- ``visit(node, args)`` is called once all arguments of a node have been visited, with the results for the arguments.
+  Arguments that are not ASTs are passed as-is (or through ``nonast``, if it is given). Its return value is the result
+  for the node.
+
+Arguments are visited from left to right.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _Descend:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "DESCEND"
+
+
+DESCEND = _Descend()
+
+# markers in the memo of a DAGVisitor
+_UNSEEN = object()
+_PENDING = object()
+
+
+class DAGVisitor:
+    """
+    Walks AST DAGs in post-order, visiting every unique node once.
+
+    The results are memoized in `memo`, which maps the ids of the visited nodes to their results, and which is shared
+    between all walks of a visitor. The visitor keeps the roots of its walks alive, so that the ids stay valid.
+    """
+
+    __slots__ = ("visit", "pre", "nonast", "memo", "_roots", "_pending")
+
+    def __init__(
+        self,
+        visit: Callable[["Base", tuple], Any],
+        pre: Optional[Callable[["Base"], Any]] = None,
+        nonast: Optional[Callable[[Any], Any]] = None,
+        memo: Optional[Dict[int, Any]] = None,
+    ):
+        """
+        :param visit:   Called with each node and the results for its arguments, returns the result for the node.
+        :param pre:     Called with each node before its arguments are visited. Returns DESCEND, or the result for
+                        the node.
+        :param nonast:  Called with each argument that is not an AST, returns the value that is passed to `visit`.
+        :param memo:    A dict of node ids to results to start with.
+        """
+        self.visit = visit
+        self.pre = pre
+        self.nonast = nonast
+        self.memo = {} if memo is None else memo
+        self._roots = []
+        self._pending = []
+
+    def walk(self, root):
+        """
+        Visits `root` and everything below it that has not been visited before.
+
+        :param root:    The AST to walk (or a value that is not an AST, which is passed through `nonast`).
+        :returns:       The result for `root`.
+        """
+        if not isinstance(root, Base):
+            return root if self.nonast is None else self.nonast(root)
+
+        memo = self.memo
+        if id(root) in memo:
+            return memo[id(root)]
+        self._roots.append(root)
+
+        visit = self.visit
+        pre = self.pre
+        nonast = self.nonast
+        stack = [root]
+        self._pending = []
+
+        try:
+            while stack:
+                node = stack[-1]
+                key = id(node)
+                r = memo.get(key, _UNSEEN)
+                if r is _UNSEEN:
+                    if pre is not None:
+                        r = pre(node)
+                        if r is not DESCEND:
+                            memo[key] = r
+                            stack.pop()
+                            continue
+                    memo[key] = _PENDING
+
+                    depth = len(stack)
+                    for a in reversed(node.args):
+                        if isinstance(a, Base) and id(a) not in memo:
+                            stack.append(a)
+                    if len(stack) != depth:
+                        continue
+
+                elif r is not _PENDING:
+                    # shared nodes can be pushed more than once before they are visited
+                    stack.pop()
+                    continue
+
+                stack.pop()
+                if nonast is None:
+                    args = tuple(memo[id(a)] if isinstance(a, Base) else a for a in node.args)
+                else:
+                    args = tuple(memo[id(a)] if isinstance(a, Base) else nonast(a) for a in node.args)
+                memo[key] = visit(node, args)
+        except BaseException:
+            # forget about the nodes that were being visited, so that the memo can be used again
+            pending = {}
+            for n in stack:
+                if memo.get(id(n), None) is _PENDING:
+                    pending[id(n)] = n
+                    del memo[id(n)]
+            self._pending = list(pending.values())
+            raise
+
+        return memo[id(root)]
+
+    def walk_all(self, roots) -> List:
+        """
+        Walks several ASTs, sharing the results for their common subexpressions.
+        """
+        return [self.walk(root) for root in roots]
+
+    def pending(self) -> List["Base"]:
+        """
+        The nodes whose arguments were being visited when the last walk was interrupted (by an exception raised by a
+        callback), from the root downwards.
+        """
+        return self._pending
+
+
+from .base import Base
@@ -1,29 +1,73 @@
+import threading
+
+
 class BackendManager:
     def __init__(self):
         self._eager_backends = []
         self._quick_backends = []
-        self._all_backends = []
-        self._backends_by_type = {}
+        # the backends that have been constructed, in the order in which they were registered (or constructed)
+        self._backends = []
+        self._by_type = {}
         self._backends_by_name = {}
+        # name -> factory of the backends that are only constructed when they are first used
+        self._lazy_backends = {}
+        self._lazy_lock = threading.RLock()
 
     def _register_backend(self, b, name, eager, quick):
         self._backends_by_name[name] = b
-        self._backends_by_type[b.__class__.__name__] = b
-        self._all_backends.append(b)
+        self._by_type[b.__class__.__name__] = b
+        self._backends.append(b)
         if eager:
             self._eager_backends.append(b)
 
         if quick:
             self._quick_backends.append(b)
 
+    def _register_lazy_backend(self, factory, name):
+        """
+        Registers a backend that is constructed (by calling `factory`) when it is first used, so that the modules that
+        it depends on do not have to be imported up front. Lazy backends cannot be eager or quick backends.
+        """
+        self._lazy_backends[name] = factory
+
+    def _construct(self, name):
+        with self._lazy_lock:
+            b = self._backends_by_name.get(name, None)
+            if b is None:
+                b = self._lazy_backends[name]()
+                self._register_backend(b, name, False, False)
+                del self._lazy_backends[name]
+        return b
+
+    def _construct_all(self):
+        for name in list(self._lazy_backends):
+            self._construct(name)
+
+    @property
+    def _all_backends(self):
+        """
+        All backends, including the lazy ones (which are constructed by this).
+        """
+        if self._lazy_backends:
+            self._construct_all()
+        return self._backends
+
+    @property
+    def _backends_by_type(self):
+        if self._lazy_backends:
+            self._construct_all()
+        return self._by_type
+
     def __getattr__(self, a):
         if a in self._backends_by_name:
             return self._backends_by_name[a]
+        elif a in self._lazy_backends:
+            return self._construct(a)
         else:
             raise AttributeError(a)
 
     def downsize(self):
-        for b in self._all_backends:
+        for b in self._backends:
             b.downsize()
 
 
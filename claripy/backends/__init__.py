@@ -56,19 +56,24 @@ class Backend:
         "_cache_objects",
         "_solver_required",
         "_tls",
+        "_thread_caches",
+        "_thread_caches_lock",
         "_true_cache",
         "_false_cache",
     )
 
     def __init__(self, solver_required=None):
-        self._op_raw = {}
-        self._op_expr = {}
+        self._op_raw = OpcodeDict()
+        self._op_expr = OpcodeDict()
         self._cache_objects = True
         self._solver_required = solver_required is not None
 
         self._tls = threading.local()
-        self._true_cache = weakref.WeakKeyDictionary()
-        self._false_cache = weakref.WeakKeyDictionary()
+        # thread -> the name and the cache of every per-thread cache of that thread, for stats()
+        self._thread_caches = weakref.WeakKeyDictionary()
+        self._thread_caches_lock = threading.Lock()
+        self._true_cache = CountedWeakKeyDictionary()
+        self._false_cache = CountedWeakKeyDictionary()
 
     @property
     def is_smt_backend(self):
@@ -79,9 +84,32 @@ class Backend:
         try:
             return self._tls.object_cache
         except AttributeError:
-            self._tls.object_cache = weakref.WeakKeyDictionary()
+            self._tls.object_cache = self._register_thread_cache("object_cache", CountedWeakKeyDictionary())
             return self._tls.object_cache
 
+    def _register_thread_cache(self, name, cache):
+        """
+        Records a cache that belongs to the current thread, so that it shows up in the statistics of the backend.
+
+        :returns:   The cache.
+        """
+        with self._thread_caches_lock:
+            self._thread_caches.setdefault(threading.current_thread(), {})[name] = cache
+        return cache
+
+    def _caches(self):
+        """
+        Returns the caches of this backend that are shared between threads, by name.
+        """
+        return {"true_cache": self._true_cache, "false_cache": self._false_cache}
+
+    def _thread_caches_by_thread(self):
+        """
+        Returns the per-thread caches of this backend, as a list of (thread, {name: cache}) pairs.
+        """
+        with self._thread_caches_lock:
+            return [(thread, dict(caches)) for thread, caches in self._thread_caches.items()]
+
     def _make_raw_ops(self, op_list, op_dict=None, op_module=None):
         for o in op_list:
             if op_dict is not None:
@@ -135,6 +163,36 @@ class Backend:
         self._true_cache.clear()
         self._false_cache.clear()
 
+    def _after_fork_in_child(self):
+        """
+        Called in the child process after a fork (see :func:`claripy.prepare_for_fork`). Only the thread that forked
+        exists in the child, so its per-thread state is kept, the state of all other threads is dropped, and the locks
+        (which might have been held by other threads) are replaced.
+        """
+        current = threading.current_thread()
+        state = dict(self._tls.__dict__)
+        self._tls = threading.local()
+        self._tls.__dict__.update(state)
+
+        caches = self._thread_caches.get(current, None)
+        self._thread_caches = weakref.WeakKeyDictionary()
+        if caches is not None:
+            self._thread_caches[current] = caches
+        self._thread_caches_lock = threading.Lock()
+
+    def native_memory(self):
+        """
+        Returns an estimate of the memory (in bytes) that the library behind this backend has allocated outside of the
+        Python heap, or 0 if it is not known.
+        """
+        return 0
+
+    def _drop_native_caches(self):
+        """
+        Drops the caches of the current thread that keep objects of the library behind this backend alive, if there
+        are any. Called when the memory budget (see :func:`claripy.set_memory_budget`) is exceeded.
+        """
+
     def handles(self, expr):
         """
         Checks whether this backend can handle the expression.
@@ -156,83 +214,70 @@ class Backend:
         :param save:    Save the result in the expression's object cache
         :return:        A backend object.
         """
-        ast_queue = [[expr]]
-        arg_queue = []
-        op_queue = []
-
-        try:
-            while ast_queue:
-                args_list = ast_queue[-1]
-
-                if args_list:
-                    ast = args_list.pop(0)
-
-                    if type(ast) in {bool, int, str, float} or not isinstance(ast, Base):
-                        converted = self._convert(ast)
-                        arg_queue.append(converted)
-                        continue
-
-                    if self in ast._errored:
-                        raise BackendError(
-                            "%s can't handle operation %s (%s) due to a failed "
-                            "conversion on a child node" % (self, ast.op, ast.__class__.__name__)
-                        )
-
-                    if self._cache_objects:
-                        cached_obj = self._object_cache.get(ast._cache_key, None)
-                        if cached_obj is not None:
-                            arg_queue.append(cached_obj)
-                            continue
-
-                    op_queue.append(ast)
-                    if ast.op in self._op_expr:
-                        ast_queue.append(None)
-                    else:
-                        ast_queue.append(list(ast.args))
-
-                else:
-                    ast_queue.pop()
-
-                    if op_queue:
-                        ast = op_queue.pop()
+        if type(expr) in {bool, int, str, float} or not isinstance(expr, Base):
+            return self._convert(expr)
 
-                        op = self._op_expr.get(ast.op, None)
-                        if op is not None:
-                            r = op(ast)
+        if memory_budget._budget is not None:
+            memory_budget.tick()
 
-                        else:
-                            args = arg_queue[-len(ast.args) :]
-                            del arg_queue[-len(ast.args) :]
-
-                            try:
-                                r = self._call(ast.op, args)
-                            except BackendUnsupportedError:
-                                r = self.default_op(ast)
-
-                        for a in ast.annotations:
-                            r = self.apply_annotation(r, a)
-
-                        if self._cache_objects:
-                            self._object_cache[ast._cache_key] = r
-
-                        arg_queue.append(r)
+        visitor = DAGVisitor(self._convert_visit, pre=self._convert_pre, nonast=self._convert)
+        try:
+            return visitor.walk(expr)
 
         except (RuntimeError, ctypes.ArgumentError) as e:
             raise ClaripyRecursionError("Recursion limit reached. Sorry about that.") from e
 
         except BackendError:
-            for ast in op_queue:
-                ast._errored.add(self)
-            if isinstance(expr, Base):
-                expr._errored.add(self)
+            for ast in visitor.pending():
+                ast._mark_errored(self)
+            expr._mark_errored(self)
             raise
 
-        # Note: Uncomment the following assertions if you are touching the above implementation
-        # assert len(op_queue) == 0, "op_queue is not empty"
-        # assert len(ast_queue) == 0, "ast_queue is not empty"
-        # assert len(arg_queue) == 1, ("arg_queue has unexpected length", len(arg_queue))
+    def _convert_pre(self, ast):
+        """
+        Called by convert() before the arguments of `ast` are converted. Returns the converted AST if it is cached, or
+        if it is converted as a whole.
+        """
+        if self in ast._errored:
+            raise BackendError(
+                "%s can't handle operation %s (%s) due to a failed "
+                "conversion on a child node" % (self, ast.op, ast.__class__.__name__)
+            )
 
-        return arg_queue.pop()
+        if self._cache_objects:
+            cache = self._object_cache
+            cached_obj = cache.get(ast.cache_key, None)
+            if cached_obj is not None:
+                cache.counters.hits += 1
+                return cached_obj
+            cache.counters.misses += 1
+
+        op = self._op_expr.lookup(ast._opcode)
+        if op is None:
+            return DESCEND
+        try:
+            return self._converted(ast, op(ast))
+        except BackendError:
+            ast._mark_errored(self)
+            raise
+
+    def _convert_visit(self, ast, args):
+        """
+        Called by convert() with `ast` and its converted arguments.
+        """
+        try:
+            r = self._call(ast.op, args, opcode=ast._opcode)
+        except BackendUnsupportedError:
+            r = self.default_op(ast)
+        return self._converted(ast, r)
+
+    def _converted(self, ast, r):
+        for a in ast.annotations:
+            r = self.apply_annotation(r, a)
+
+        if self._cache_objects:
+            self._object_cache[ast.cache_key] = r
+        return r
 
     def convert_list(self, args):
         return [a if isinstance(a, numbers.Number) else self.convert(a) for a in args]
@@ -250,16 +295,18 @@ class Backend:
         converted = self.convert_list(args)
         return self._call(op, converted)
 
-    def _call(self, op, args):
+    def _call(self, op, args, opcode=None):
         """_call
 
         :param op:
         :param args:
+        :param opcode:  The opcode of `op`, if it is known. Used to look up the operation without hashing its name.
         :return:
         """
-        if op in self._op_raw:
+        raw_op = self._op_raw.get(op, None) if opcode is None else self._op_raw.lookup(opcode)
+        if raw_op is not None:
             # the raw ops don't get the model, cause, for example, Z3 stuff can't take it
-            obj = self._op_raw[op](*args)
+            obj = raw_op(*args)
         elif not op.startswith("__"):
             l.debug("backend has no operation %s", op)
             raise BackendUnsupportedError
@@ -326,8 +373,11 @@ class Backend:
             )
 
         try:
-            return self._true_cache[e.cache_key]
+            t = self._true_cache[e.cache_key]
+            self._true_cache.counters.hits += 1
+            return t
         except KeyError:
+            self._true_cache.counters.misses += 1
             t = self._is_true(
                 self.convert(e), extra_constraints=extra_constraints, solver=solver, model_callback=model_callback
             )
@@ -355,8 +405,11 @@ class Backend:
             )
 
         try:
-            return self._false_cache[e.cache_key]
+            f = self._false_cache[e.cache_key]
+            self._false_cache.counters.hits += 1
+            return f
         except KeyError:
+            self._false_cache.counters.misses += 1
             f = self._is_false(
                 self.convert(e), extra_constraints=extra_constraints, solver=solver, model_callback=model_callback
             )
@@ -844,11 +897,27 @@ class Backend:
 
 
 from ..errors import BackendError, ClaripyRecursionError, BackendUnsupportedError
-from .backend_z3 import BackendZ3
-from .backend_z3_parallel import BackendZ3Parallel
 from .backend_concrete import BackendConcrete
 from .backend_vsa import BackendVSA
 from ..ast.base import Base
+from ..ast.visitor import DAGVisitor, DESCEND
+from ..operations import OpcodeDict
+
+
+def __getattr__(name):
+    # the Z3 backends are only imported when they are first used, since importing z3 is slow
+    if name == "BackendZ3":
+        from .backend_z3 import BackendZ3  # pylint:disable=import-outside-toplevel
+
+        return BackendZ3
+    if name == "BackendZ3Parallel":
+        from .backend_z3_parallel import BackendZ3Parallel  # pylint:disable=import-outside-toplevel
+
+        return BackendZ3Parallel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # If you need support for multiple solvers, please import claripy.backends.backend_smtlib_solvers by yourself
 # from .backend_smtlib_solvers import *
+from ..utils import CountedWeakKeyDictionary
+from .. import memory_budget
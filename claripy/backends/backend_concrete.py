@@ -105,10 +105,14 @@ class BackendConcrete(Backend):
         """
         if type(expr) is BV:
             if expr.op == "BVV":
-                cached_obj = self._object_cache.get(expr._cache_key, None)
+                cache = self._object_cache
+                cached_obj = cache.get(expr.cache_key, None)
                 if cached_obj is None:
+                    cache.counters.misses += 1
                     cached_obj = self.BVV(*expr.args)
-                    self._object_cache[expr._cache_key] = cached_obj
+                    cache[expr.cache_key] = cached_obj
+                else:
+                    cache.counters.hits += 1
                 return cached_obj
         if type(expr) is Bool and expr.op == "BoolV":
             return expr.args[0]
@@ -14,6 +14,7 @@ import z3
 from cachetools import LRUCache
 
 from ..errors import ClaripyZ3Error, ClaripySolverInterruptError
+from ..utils import CacheCounters, CountedWeakValueDictionary
 
 l = logging.getLogger("claripy.backends.backend_z3")
 
@@ -132,9 +133,11 @@ class SmartLRUCache(LRUCache):
     def __init__(self, maxsize, getsizeof=None, evict=None):
         LRUCache.__init__(self, maxsize, getsizeof=getsizeof)
         self._evict = evict
+        self.counters = CacheCounters()
 
     def popitem(self):
         key, val = LRUCache.popitem(self)
+        self.counters.evictions += 1
         if self._evict:
             self._evict(key, val)
         return key, val
@@ -251,7 +254,9 @@ class BackendZ3(Backend):
         try:
             return self._tls.ast_cache
         except AttributeError:
-            self._tls.ast_cache = SmartLRUCache(self._ast_cache_size, evict=self._pop_from_ast_cache)
+            self._tls.ast_cache = self._register_thread_cache(
+                "ast_cache", SmartLRUCache(self._ast_cache_size, evict=self._pop_from_ast_cache)
+            )
             return self._tls.ast_cache
 
     @property
@@ -259,7 +264,7 @@ class BackendZ3(Backend):
         try:
             return self._tls.var_cache
         except AttributeError:
-            self._tls.var_cache = weakref.WeakValueDictionary()
+            self._tls.var_cache = self._register_thread_cache("var_cache", CountedWeakValueDictionary())
             return self._tls.var_cache
 
     @property
@@ -267,16 +272,35 @@ class BackendZ3(Backend):
         try:
             return self._tls.sym_cache
         except AttributeError:
-            self._tls.sym_cache = weakref.WeakValueDictionary()
+            self._tls.sym_cache = self._register_thread_cache("sym_cache", CountedWeakValueDictionary())
             return self._tls.sym_cache
 
     def downsize(self):
         Backend.downsize(self)
 
-        self._ast_cache.clear()
+        self._drop_native_caches()
         self._var_cache.clear()
         self._sym_cache.clear()
 
+    def _after_fork_in_child(self):
+        Backend._after_fork_in_child(self)
+        # the contexts of the other threads are gone
+        context = getattr(self._tls, "context", None)
+        ALL_Z3_CONTEXTS.clear()
+        if context is not None:
+            ALL_Z3_CONTEXTS.add(context)
+
+    def native_memory(self):
+        return z3.Z3_get_estimated_alloc_size()
+
+    def _drop_native_caches(self):
+        ast_cache = getattr(self._tls, "ast_cache", None)
+        if ast_cache is not None:
+            # evict the entries one by one, so that the references to the Z3 terms are released by
+            # _pop_from_ast_cache() (clear() does not go through popitem() in recent versions of cachetools)
+            while ast_cache:
+                ast_cache.popitem()
+
     def _name(self, o):  # pylint:disable=unused-argument
         l.warning("BackendZ3.name() called. This is weird.")
         raise BackendError("name is not implemented yet")
@@ -428,11 +452,13 @@ class BackendZ3(Backend):
 
     def _abstract_internal(self, ctx, ast, split_on=None):
         h = self._z3_ast_hash(ast)
+        ast_cache = self._ast_cache
         try:
-            cached_ast, _ = self._ast_cache[h]
+            cached_ast, _ = ast_cache[h]
+            ast_cache.counters.hits += 1
             return cached_ast
         except KeyError:
-            pass
+            ast_cache.counters.misses += 1
 
         decl = z3.Z3_get_app_decl(ctx, ast)
         decl_num = z3.Z3_get_decl_kind(ctx, decl)
@@ -0,0 +1,134 @@
+"""
+Introspection of the caches of claripy: how many entries they hold, roughly how much memory they take on the Python
+heap, and how often they are hit.
+"""
+
+import itertools
+from typing import Dict
+
+from .utils import HashConsCache
+from .utils.cachecounters import SIZE_SAMPLE, approximate_bytes
+
+
+def _stats(entries, size, hits=0, misses=0, evictions=0) -> Dict[str, int]:
+    return {"entries": entries, "bytes": size, "hits": hits, "misses": misses, "evictions": evictions}
+
+
+def _sample(items):
+    try:
+        return list(itertools.islice(items, SIZE_SAMPLE))
+    except RuntimeError:
+        # the cache changed its size while it was sampled (by another thread)
+        return []
+
+
+def _cache_stats(cache) -> Dict[str, int]:
+    if isinstance(cache, HashConsCache):
+        count = len(cache)
+        return _stats(
+            count, approximate_bytes(cache.sample(SIZE_SAMPLE), count), cache.hits, cache.misses, cache.evictions
+        )
+    count = len(cache)
+    counters = cache.counters
+    return _stats(
+        count,
+        approximate_bytes(_sample(cache.items()), count),
+        counters.hits,
+        counters.misses,
+        counters.evictions,
+    )
+
+
+def _total(per_thread) -> Dict[str, int]:
+    total = _stats(0, 0)
+    for s in per_thread:
+        for k in total:
+            total[k] += s[k]
+    return total
+
+
+def stats(per_thread: bool = False) -> Dict[str, Dict]:
+    """
+    Reports the state of the caches of claripy.
+
+    For every cache, the number of entries, an estimate of the memory they take on the Python heap (from a sample of
+    the entries, see :func:`claripy.utils.cachecounters.entry_size`), and the hit, miss and eviction counters since
+    the last :func:`reset_stats` are reported. Caches that are kept per thread (such as the object caches of the
+    backends and the term caches of Z3) are summed up over all threads.
+
+    :param per_thread:  Also report the per-thread caches for each thread separately, under a "threads" key that
+                        maps thread names to their statistics.
+    :returns:           A dict of cache names to dicts with "entries", "bytes", "hits", "misses" and "evictions".
+    """
+    r = {
+        "ast.hash_cache": _cache_stats(Base._hash_cache),
+        "ast.leaf_cache": _cache_stats(Base._leaf_cache),
+        "ast.bvv_cache": _cache_stats(bv._bvv_cache),
+    }
+
+    pool = base.variable_set_pool._pool
+    r["ast.variable_sets"] = _stats(len(pool), approximate_bytes(_sample(pool.items()), len(pool)))
+    canonical_sets = base._canonical_set_cache
+    r["ast.canonical_sets"] = _stats(
+        len(canonical_sets), approximate_bytes(_sample(canonical_sets.copy().items()), len(canonical_sets))
+    )
+
+    memo = simplifications.simpleton._memo
+    counters = simplifications.simpleton.memo_counters
+    r["simplifications.memo"] = _stats(
+        len(memo),
+        approximate_bytes(simplifications.simpleton.sample_memo(SIZE_SAMPLE), len(memo)),
+        counters.hits,
+        counters.misses,
+        counters.evictions,
+    )
+
+    for name, backend in backends._backends_by_name.items():
+        for cache_name, cache in backend._caches().items():
+            r[f"{name}.{cache_name}"] = _cache_stats(cache)
+
+        threads = {}
+        for thread, caches in backend._thread_caches_by_thread():
+            for cache_name, cache in caches.items():
+                threads.setdefault(f"{name}.{cache_name}", {})[thread.name] = _cache_stats(cache)
+        for cache_name, per_cache in threads.items():
+            r[cache_name] = _total(per_cache.values())
+            if per_thread:
+                r[cache_name]["threads"] = per_cache
+
+    frontends = list(model_cache_mixin._model_cache_frontends)
+    models = [m for f in frontends for m in itertools.islice(f._models, 1)]
+    count = sum(len(f._models) for f in frontends)
+    counters = model_cache_mixin.model_cache_counters
+    r["frontends.model_cache"] = _stats(
+        count,
+        approximate_bytes(((None, m.model) for m in models), count),
+        counters.hits,
+        counters.misses,
+        counters.evictions,
+    )
+    return r
+
+
+def reset_stats() -> None:
+    """
+    Resets the hit, miss and eviction counters of all caches that are reported by :func:`stats`.
+    """
+    Base._hash_cache.reset_counters()
+    Base._leaf_cache.reset_counters()
+    bv._bvv_cache.reset_counters()
+    simplifications.simpleton.memo_counters.reset_counters()
+    for backend in backends._backends:
+        for cache in backend._caches().values():
+            cache.counters.reset_counters()
+        for _, caches in backend._thread_caches_by_thread():
+            for cache in caches.values():
+                cache.counters.reset_counters()
+    model_cache_mixin.model_cache_counters.reset_counters()
+
+
+from . import simplifications
+from .ast import base, bv
+from .ast.base import Base
+from .backend_manager import backends
+from .frontend_mixins import model_cache_mixin
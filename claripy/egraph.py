@@ -0,0 +1,771 @@
+"""
+An equality-saturation simplifier for bitvector and boolean expressions.
+
+An e-graph represents many equivalent expressions at once. It is a set of equivalence classes (e-classes) of nodes
+(e-nodes), where every node is an operation whose arguments are e-classes rather than expressions. Rewrite rules add
+the expressions that they produce to the class of the node that they matched, and never remove anything, so rules do
+not compete with each other and the order in which they are applied does not matter. Once the rules have been applied
+until nothing changes anymore (saturation), or once the budget is spent, the smallest expression in the class of the
+root is extracted.
+
+The rules are the identities that the simplifiers in :mod:`claripy.simplifications` apply one node at a time
+(constant folding, neutral and absorbing elements, nested extractions and concatenations, double negations, ...),
+stated over classes instead of single expressions, plus the simplifiers themselves, which are applied to one
+expression from each class. Associative and commutative operations (``+``, ``*``, ``&``, ``|``, ``^``, ``And`` and
+``Or``) are kept flattened with sorted arguments, so that no rules for reordering arguments are needed. As an example,
+``(a + b) - a`` becomes ``a + b + -a``, in which ``a`` and ``-a`` cancel out, which no local rewrite finds.
+
+Everything happens on ASTs, without any solver, so this is a way to shrink large expressions (such as those of lifted
+code) without a round-trip through Z3. ASTs that carry annotations, and ASTs that are not bitvectors or booleans, are
+left alone.
+"""
+
+import logging
+import time
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Tuple
+
+l = logging.getLogger("claripy.egraph")
+
+DEFAULT_NODE_LIMIT = 10000
+DEFAULT_TIME_LIMIT = 1.0
+DEFAULT_ITERATIONS = 16
+
+# the largest number of arguments that flattening an associative operation creates a node with. Classes can contain
+# themselves through other classes (such as x in x ^ y ^ y), and flattening through such cycles never ends.
+MAX_ARITY = 16
+
+# the operation of the nodes of leaves and of ASTs that are not looked into
+_LEAF = "<leaf>"
+
+# associative and commutative operations: the neutral element (by length), the absorbing element (by length, if any),
+# how to combine two constants, and whether the operation is idempotent
+_AC = {
+    "__add__": (lambda n: 0, None, lambda a, b: a + b, False),
+    "__mul__": (lambda n: 1, lambda n: 0, lambda a, b: a * b, False),
+    "__and__": (lambda n: (1 << n) - 1, lambda n: 0, lambda a, b: a & b, True),
+    "__or__": (lambda n: 0, lambda n: (1 << n) - 1, lambda a, b: a | b, True),
+    "__xor__": (lambda n: 0, None, lambda a, b: a ^ b, False),
+    "And": (lambda n: True, lambda n: False, lambda a, b: a and b, True),
+    "Or": (lambda n: False, lambda n: True, lambda a, b: a or b, True),
+}
+_COMPLEMENT = {"__and__": "__invert__", "__or__": "__invert__", "And": "Not", "Or": "Not"}
+
+_BOOL_OPERATIONS = frozenset(
+    {"And", "Or", "Not", "__eq__", "__ne__", "__lt__", "__le__", "__gt__", "__ge__", "SLT", "SLE", "SGT", "SGE"}
+)
+# comparisons, and whether they hold when both sides are the same
+_REFLEXIVE = {
+    "__eq__": True,
+    "__ne__": False,
+    "__lt__": False,
+    "__le__": True,
+    "__gt__": False,
+    "__ge__": True,
+    "SLT": False,
+    "SLE": True,
+    "SGT": False,
+    "SGE": True,
+}
+
+ENode = Tuple[str, tuple, tuple]
+
+
+class EClass:
+    """
+    An equivalence class of nodes, with the sort of its expressions (the AST type and the length), the value of its
+    expressions if they are constant, and one of its expressions (if the class has an AST that was added to the
+    e-graph; nodes that are added by the rules only exist as nodes).
+    """
+
+    __slots__ = ("nodes", "sort", "const", "ast")
+
+    def __init__(self, node: ENode, sort, ast):
+        self.nodes: List[ENode] = [node]
+        self.sort = sort
+        self.const = None
+        self.ast = ast
+
+
+class EGraph:
+    """
+    An e-graph of claripy ASTs.
+
+    Nodes are tuples of the operation, the leading arguments that are not ASTs (such as the bounds of an Extract), and
+    the e-classes of the AST arguments. Leaves (and ASTs that are not looked into) are nodes of their own, which are
+    identified by the hash of the AST.
+    """
+
+    def __init__(self, node_limit: int = DEFAULT_NODE_LIMIT):
+        """
+        :param node_limit:  The number of nodes after which no more rules are applied.
+        """
+        self.node_limit = node_limit
+        self._parents: List[int] = []
+        self._classes: Dict[int, EClass] = {}
+        # canonical nodes -> their classes
+        self._memo: Dict[ENode, int] = {}
+        self._leaves: Dict[object, "Base"] = {}
+        self._node_count = 0
+        # the nodes that the simplifiers of claripy were applied to
+        self._simplified = set()
+        # the classes that are new or changed since the rules were last applied
+        self._dirty = set()
+        self._visitor = DAGVisitor(self._visit, pre=self._pre)
+
+    def __len__(self):
+        return self._node_count
+
+    @property
+    def class_count(self) -> int:
+        return len(self._classes)
+
+    #
+    # Building
+    #
+
+    def find(self, c: int) -> int:
+        """
+        Returns the canonical id of the class `c`.
+        """
+        parents = self._parents
+        while parents[c] != c:
+            parents[c] = parents[parents[c]]
+            c = parents[c]
+        return c
+
+    def add(self, expr: "Base") -> int:
+        """
+        Adds an AST (and everything below it) to the e-graph.
+
+        :returns:   The id of its class.
+        """
+        return self.find(self._visitor.walk(expr))
+
+    def _pre(self, expr):
+        if _is_opaque(expr):
+            return self._add_leaf(expr)
+        return DESCEND
+
+    def _visit(self, expr, args):
+        lits = len(args) - sum(1 for a in expr.args if isinstance(a, Base))
+        return self._add_node(
+            (expr.op, tuple(args[:lits]), tuple(self.find(a) for a in args[lits:])), _sort_of(expr), expr
+        )
+
+    def _add_leaf(self, expr) -> int:
+        key = expr._hash
+        self._leaves[key] = expr
+        c = self._add_node((_LEAF, (key,), ()), _sort_of(expr), expr)
+        if expr.op in ("BVV", "BoolV") and not expr.annotations and expr.args[0] is not None:
+            self._classes[self.find(c)].const = expr.args[0]
+        return c
+
+    def _add_node(self, node: ENode, sort, expr=None) -> int:
+        node = self._canonicalize(node)
+        c = self._memo.get(node, None)
+        if c is not None:
+            return self.find(c)
+
+        c = len(self._parents)
+        self._parents.append(c)
+        self._classes[c] = EClass(node, sort, expr)
+        self._memo[node] = c
+        self._node_count += 1
+        self._dirty.add(c)
+        return c
+
+    def _canonicalize(self, node: ENode) -> ENode:
+        op, lits, args = node
+        find = self.find
+        args = tuple(find(a) for a in args)
+        if op in _AC:
+            args = tuple(sorted(args))
+        return op, lits, args
+
+    def node(self, op: str, args: Iterable[int], lits: tuple = ()) -> int:
+        """
+        Adds a node to the e-graph.
+
+        :param op:      The operation.
+        :param args:    The classes of the AST arguments.
+        :param lits:    The leading arguments that are not ASTs.
+        :returns:       The id of the class of the node.
+        """
+        args = tuple(args)
+        if op in _AC and len(args) == 1:
+            return self.find(args[0])
+        if op == "Concat" and len(args) == 1:
+            return self.find(args[0])
+        return self._add_node((op, lits, args), self._node_sort(op, lits, args))
+
+    def const(self, value, sort) -> int:
+        """
+        Adds a constant of the given sort to the e-graph.
+
+        :returns:   The id of its class.
+        """
+        if sort[0] is Bool:
+            return self._add_leaf(BoolV(bool(value)))
+        return self._add_leaf(BVV(value & ((1 << sort[1]) - 1), sort[1]))
+
+    def union(self, a: int, b: int) -> bool:
+        """
+        Merges two classes. The graph has to be rebuilt afterwards (see :meth:`rebuild`).
+
+        :returns:   Whether the classes were different.
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        ca, cb = self._classes[a], self._classes[b]
+        if ca.sort != cb.sort:
+            l.debug("Not merging classes of different sorts %s and %s", ca.sort, cb.sort)
+            return False
+        if len(ca.nodes) < len(cb.nodes):
+            a, b, ca, cb = b, a, cb, ca
+        self._parents[b] = a
+        ca.nodes.extend(cb.nodes)
+        if ca.const is None:
+            ca.const = cb.const
+        if ca.ast is None:
+            ca.ast = cb.ast
+        del self._classes[b]
+        self._dirty.add(a)
+        return True
+
+    def rebuild(self) -> None:
+        """
+        Restores the invariants after classes were merged: nodes are canonical, and equal nodes are in the same class
+        (and so are the classes of nodes whose arguments became equal).
+        """
+        while True:
+            memo = {}
+            merges = []
+            for c, cls in self._classes.items():
+                nodes = []
+                for node in cls.nodes:
+                    canonical = self._canonicalize(node)
+                    if canonical != node:
+                        # the rules for the nodes above might match now
+                        self._dirty.add(c)
+                    other = memo.get(canonical, None)
+                    if other is None:
+                        memo[canonical] = c
+                        nodes.append(canonical)
+                    elif other != c:
+                        merges.append((other, c))
+                cls.nodes = nodes
+            self._memo = memo
+            if not merges:
+                return
+            for a, b in merges:
+                self.union(a, b)
+
+    #
+    # Looking at classes
+    #
+
+    def sort_of(self, c: int):
+        return self._classes[self.find(c)].sort
+
+    def const_of(self, c: int):
+        """
+        Returns the value of the expressions in class `c`, or None if they are not known to be constant.
+        """
+        return self._classes[self.find(c)].const
+
+    def nodes_of(self, c: int, op: str) -> List[ENode]:
+        """
+        Returns the nodes of class `c` with the operation `op`.
+        """
+        return [n for n in self._classes[self.find(c)].nodes if n[0] == op]
+
+    def length_of(self, c: int) -> int:
+        return self._classes[self.find(c)].sort[1]
+
+    def _node_sort(self, op, lits, args):
+        if op in _BOOL_OPERATIONS:
+            return _BOOL_SORT
+        if op == "Extract":
+            return BV, lits[0] - lits[1] + 1
+        if op in ("ZeroExt", "SignExt"):
+            return BV, lits[0] + self.length_of(args[0])
+        if op == "Concat":
+            return BV, sum(self.length_of(a) for a in args)
+        if op == "If":
+            return self.sort_of(args[1])
+        return self.sort_of(args[0])
+
+    #
+    # Saturation
+    #
+
+    def saturate(self, iterations: int = DEFAULT_ITERATIONS, time_limit: Optional[float] = DEFAULT_TIME_LIMIT) -> bool:
+        """
+        Applies the rewrite rules until nothing changes anymore, or until the budget is spent.
+
+        :param iterations:  The maximum number of rounds, in each of which the rules are applied to all nodes that
+                            might match anew.
+        :param time_limit:  The time (in seconds) after which no more rules are applied, or None for no limit.
+        :returns:           Whether the e-graph was saturated.
+        """
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        for _ in range(iterations):
+            # rules only look at a node and at the nodes of its arguments, so they only have to be applied to nodes in
+            # or right above the classes that changed since the last round
+            find = self.find
+            dirty = {find(c) for c in self._dirty}
+            self._dirty = set()
+            if not dirty:
+                return True
+            matches = [
+                (c, n)
+                for c, cls in self._classes.items()
+                for n in cls.nodes
+                if c in dirty or any(find(a) in dirty for a in n[2])
+            ]
+            for c, node in matches:
+                if self._node_count >= self.node_limit or (deadline is not None and time.perf_counter() > deadline):
+                    # the rules might not have been applied to all nodes that could match
+                    self._dirty |= dirty
+                    self.rebuild()
+                    return False
+                for rule in _rules.get(node[0], ()):
+                    for r in rule(self, c, node) or ():
+                        self.union(c, r)
+                for r in self._simplify(c, node):
+                    self.union(c, r)
+            self.rebuild()
+        return not self._dirty
+
+    def _simplify(self, c, node):
+        """
+        Applies constant folding and the simplifiers of claripy to one expression of a node.
+        """
+        op, lits, args = node
+        if op is _LEAF or node in self._simplified:
+            return ()
+        self._simplified.add(node)
+
+        classes = [self._classes[self.find(a)] for a in args]
+        if all(cls.const is not None for cls in classes):
+            folded = folding.fold(op, lits + tuple(_const_ast(cls) for cls in classes))
+            if folded is not None:
+                return (self.add(folded),)
+
+        if any(cls.ast is None for cls in classes):
+            return ()
+        r = simplifications.simpleton.simplify(op, lits + tuple(cls.ast for cls in classes))
+        if r is None or type(r) is not self._classes[self.find(c)].sort[0]:
+            return ()
+        return (self.add(r),)
+
+    #
+    # Extraction
+    #
+
+    def extract(self, c: int) -> "Base":
+        """
+        Returns the smallest expression (by the number of nodes in its tree) in class `c`.
+        """
+        best = self._costs()
+        built = {}
+        stack = [self.find(c)]
+        while stack:
+            c = stack[-1]
+            if c in built:
+                stack.pop()
+                continue
+            node = best[c][1]
+            missing = [a for a in node[2] if self.find(a) not in built]
+            if missing:
+                stack.extend(self.find(a) for a in missing)
+                continue
+            stack.pop()
+            built[c] = self._build(node, self._classes[c].sort, [built[self.find(a)] for a in node[2]])
+        return built[self.find(c)]
+
+    def _costs(self) -> Dict[int, Tuple[int, ENode]]:
+        best = {}
+        changed = True
+        while changed:
+            changed = False
+            for c, cls in self._classes.items():
+                current = best.get(c, None)
+                for node in cls.nodes:
+                    cost = 1
+                    for a in node[2]:
+                        b = best.get(self.find(a), None)
+                        if b is None:
+                            break
+                        cost += b[0]
+                    else:
+                        if current is None or cost < current[0]:
+                            current = best[c] = (cost, node)
+                            changed = True
+        return best
+
+    def _build(self, node: ENode, sort, args) -> "Base":
+        op, lits, _ = node
+        if op is _LEAF:
+            return self._leaves[lits[0]]
+        kwargs = {}
+        if any(a.uninitialized is True for a in args):
+            kwargs["uninitialized"] = True
+        if sort[0] is Bool:
+            return Bool(op, lits + tuple(args), **kwargs)
+        return BV(op, lits + tuple(args), length=sort[1], **kwargs)
+
+
+def _const_ast(cls: EClass):
+    if cls.sort[0] is Bool:
+        return BoolV(cls.const)
+    return BVV(cls.const, cls.sort[1])
+
+
+def _sort_of(expr):
+    return type(expr), expr.length
+
+
+def _is_opaque(expr) -> bool:
+    """
+    Whether an AST is added to an e-graph as a whole, without looking at its arguments.
+    """
+    if type(expr) not in (BV, Bool) or expr.annotations or expr.is_leaf():
+        return True
+    seen_ast = False
+    for a in expr.args:
+        if isinstance(a, Base):
+            if type(a) not in (BV, Bool):
+                return True
+            seen_ast = True
+        elif seen_ast or type(a) is not int:
+            return True
+    return False
+
+
+#
+# The rules. Each rule is called with the e-graph, the class and a node of the class, and returns the classes that
+# are equal to it.
+#
+
+
+def _flatten(g: EGraph, c, op, args) -> Optional[list]:
+    """
+    Replaces the arguments of an associative operation that are (in the most flattened way) nodes of the same
+    operation by their arguments. Returns None if there are none.
+    """
+    c = g.find(c)
+    flattened = []
+    for a in args:
+        a = g.find(a)
+        # nodes such as x ^ 0 in the class of x itself would be flattened forever
+        inner = [n for n in g.nodes_of(a, op) if a not in n[2]] if a != c else None
+        if inner:
+            flattened.extend(max(inner, key=lambda n: len(n[2]))[2])
+        else:
+            flattened.append(a)
+    return flattened if len(args) < len(flattened) <= MAX_ARITY else None
+
+
+def _node_or_arg(g: EGraph, op, args, sort):
+    if not args:
+        return g.const(_AC[op][0](sort[1]), sort)
+    if len(args) == 1:
+        return args[0]
+    return g.node(op, args)
+
+
+def _ac_rules(g: EGraph, c, node):
+    op, _, args = node
+    sort = g.sort_of(c)
+    neutral, absorbing, combine, idempotent = _AC[op]
+    n = sort[1]
+    mask = (1 << n) - 1 if sort[0] is BV else None
+    out = []
+
+    flattened = _flatten(g, c, op, args)
+    if flattened is not None:
+        out.append(g.node(op, flattened))
+
+    # combine the constants
+    values = [g.const_of(a) for a in args]
+    known = [v for v in values if v is not None]
+    if known:
+        value = reduce(combine, known)
+        if mask is not None:
+            value &= mask
+        if absorbing is not None and value == absorbing(n):
+            return [g.const(value, sort)]
+        if len(known) > 1 or value == neutral(n):
+            rest = [a for a, v in zip(args, values) if v is None]
+            if value != neutral(n):
+                rest.append(g.const(value, sort))
+            out.append(_node_or_arg(g, op, rest, sort))
+
+    if idempotent and len(set(args)) < len(args):
+        out.append(_node_or_arg(g, op, sorted(set(args)), sort))
+
+    if op == "__xor__" and len(set(args)) < len(args):
+        # x ^ x == 0
+        odd = [a for a in sorted(set(args)) if args.count(a) % 2]
+        out.append(_node_or_arg(g, op, odd, sort))
+
+    if op == "__add__":
+        # x + -x == 0
+        for i, a in enumerate(args):
+            for neg in g.nodes_of(a, "__neg__"):
+                if neg[2][0] in args[:i] + args[i + 1 :]:
+                    rest = list(args)
+                    del rest[i]
+                    rest.remove(neg[2][0])
+                    out.append(_node_or_arg(g, op, rest, sort))
+                    break
+
+    complement = _COMPLEMENT.get(op, None)
+    if complement is not None:
+        # x & ~x == 0, x | ~x == -1
+        for a in args:
+            if any(inv[2][0] in args for inv in g.nodes_of(a, complement)):
+                return [g.const(absorbing(n), sort)]
+
+    if op in ("__and__", "__or__", "__xor__") and len(args) == 2 and len(known) == 1:
+        # bitwise operations with a constant apply to each part of a concatenation separately
+        (value,) = known
+        (other,) = (a for a, v in zip(args, values) if v is None)
+        for concat in g.nodes_of(other, "Concat")[:1]:
+            parts = []
+            offset = n
+            for part in concat[2]:
+                size = g.length_of(part)
+                offset -= size
+                piece = g.const((value >> offset) & ((1 << size) - 1), (BV, size))
+                parts.append(g.node(op, (part, piece)))
+            out.append(g.node("Concat", parts))
+
+    return out
+
+
+def _sub_rules(g: EGraph, c, node):
+    a, b = node[2]
+    if g.find(a) == g.find(b):
+        return [g.const(0, g.sort_of(c))]
+    return [g.node("__add__", (a, g.node("__neg__", (b,))))]
+
+
+def _double_negation(inverse):
+    def _rules(g: EGraph, c, node):  # pylint:disable=unused-argument
+        return [inner[2][0] for inner in g.nodes_of(node[2][0], inverse)]
+
+    return _rules
+
+
+def _not_rules(g: EGraph, c, node):
+    a = node[2][0]
+    out = [inner[2][0] for inner in g.nodes_of(a, "Not")]
+    for cmp_op, negated in (("__eq__", "__ne__"), ("__ne__", "__eq__")):
+        for cmp in g.nodes_of(a, cmp_op):
+            out.append(g.node(negated, cmp[2]))
+    return out
+
+
+def _extract_reducible(g: EGraph, c) -> bool:
+    """
+    Whether the extraction of bits from the expressions in class `c` can be simplified by the rules for Extract.
+    """
+    if g.const_of(c) is not None:
+        return True
+    return any(n[0] in ("Extract", "Concat", "ZeroExt", "SignExt") for n in g._classes[g.find(c)].nodes)
+
+
+def _extract_rules(g: EGraph, c, node):
+    (high, low), (a,) = node[1], node[2]
+    if low == 0 and high == g.length_of(a) - 1:
+        return [a]
+
+    out = []
+    for inner in g.nodes_of(a, "Extract"):
+        out.append(g.node("Extract", inner[2], (high + inner[1][1], low + inner[1][1])))
+
+    for concat in g.nodes_of(a, "Concat"):
+        # the parts of the concatenation that overlap the extracted bits, from the most significant one
+        parts = []
+        offset = g.length_of(a)
+        for arg in concat[2]:
+            size = g.length_of(arg)
+            offset -= size
+            if offset <= high and offset + size > low:
+                h, lo = min(high, offset + size - 1) - offset, max(low, offset) - offset
+                parts.append(arg if h == size - 1 and lo == 0 else g.node("Extract", (arg,), (h, lo)))
+        out.append(g.node("Concat", parts))
+
+    for ext in g.nodes_of(a, "ZeroExt"):
+        inner = ext[2][0]
+        size = g.length_of(inner)
+        if high < size:
+            out.append(g.node("Extract", (inner,), (high, low)))
+        elif low >= size:
+            out.append(g.const(0, (BV, high - low + 1)))
+        else:
+            out.append(g.node("ZeroExt", (g.node("Extract", (inner,), (size - 1, low)),), (high - size + 1,)))
+
+    for ext in g.nodes_of(a, "SignExt"):
+        inner = ext[2][0]
+        if high < g.length_of(inner):
+            out.append(g.node("Extract", (inner,), (high, low)))
+
+    # extractions distribute over bitwise operations, and the low bits of arithmetic only depend on the low bits.
+    # Pushing extractions down everywhere would add an extraction of every width for every node below, so it is only
+    # done if the extraction of one of the arguments can be simplified right away.
+    distributive = ("__and__", "__or__", "__xor__", "__invert__")
+    if low == 0:
+        distributive += ("__add__", "__mul__", "__sub__", "__neg__")
+    for op in distributive:
+        for inner in g.nodes_of(a, op):
+            if any(_extract_reducible(g, arg) for arg in inner[2]):
+                out.append(g.node(op, [g.node("Extract", (arg,), (high, low)) for arg in inner[2]]))
+
+    for ite in g.nodes_of(a, "If"):
+        cond, t, f = ite[2]
+        if _extract_reducible(g, t) or _extract_reducible(g, f):
+            extracted = (g.node("Extract", (t,), (high, low)), g.node("Extract", (f,), (high, low)))
+            out.append(g.node("If", (cond,) + extracted))
+
+    return out
+
+
+def _concat_rules(g: EGraph, c, node):
+    args = node[2]
+    out = []
+    flattened = _flatten(g, c, "Concat", args)
+    if flattened is not None:
+        out.append(g.node("Concat", flattened))
+
+    # merge all runs of adjacent extractions of the same expression, and of constants, at once (merging one pair at a
+    # time would add a node for every way of splitting up the runs)
+    runs = []
+    for a in args:
+        value = g.const_of(a)
+        last = runs[-1] if runs else None
+        if value is not None:
+            size = g.length_of(a)
+            if last is not None and last[0] == "const":
+                runs[-1] = ("const", (last[1] << size) | value, last[2] + size)
+            else:
+                runs.append(("const", value, size))
+            continue
+        extracts = g.nodes_of(a, "Extract")
+        if last is not None and last[0] == "extract":
+            _, src, high, low = last
+            adjacent = [e for e in extracts if g.find(e[2][0]) == src and e[1][0] == low - 1]
+            if adjacent:
+                runs[-1] = ("extract", src, high, adjacent[0][1][1])
+                continue
+        if extracts:
+            runs.append(("extract", g.find(extracts[0][2][0]), extracts[0][1][0], extracts[0][1][1]))
+        else:
+            runs.append(("arg", a))
+    if len(runs) < len(args):
+        parts = []
+        for run in runs:
+            if run[0] == "const":
+                parts.append(g.const(run[1], (BV, run[2])))
+            elif run[0] == "extract":
+                parts.append(g.node("Extract", (run[1],), run[2:]))
+            else:
+                parts.append(run[1])
+        out.append(g.node("Concat", parts))
+
+    if g.const_of(args[0]) == 0:
+        rest = g.node("Concat", args[1:])
+        out.append(g.node("ZeroExt", (rest,), (g.length_of(args[0]),)))
+    return out
+
+
+def _extend_rules(g: EGraph, c, node):
+    op, (n,), (a,) = node
+    if n == 0:
+        return [a]
+    return [g.node(op, inner[2], (n + inner[1][0],)) for inner in g.nodes_of(a, op)]
+
+
+def _shift_rules(g: EGraph, c, node):
+    op = node[0]
+    a, b = node[2]
+    amount = g.const_of(b)
+    if amount == 0:
+        return [a]
+    if amount is not None and amount >= g.length_of(a) and op in ("__lshift__", "LShR"):
+        return [g.const(0, g.sort_of(c))]
+    return ()
+
+
+def _if_rules(g: EGraph, c, node):
+    cond, t, f = node[2]
+    if g.find(t) == g.find(f):
+        return [t]
+    value = g.const_of(cond)
+    if value is not None:
+        return [t if value else f]
+    return [g.node("If", (inner[2][0], f, t)) for inner in g.nodes_of(cond, "Not")]
+
+
+def _comparison_rules(g: EGraph, c, node):
+    a, b = node[2]
+    if g.find(a) == g.find(b):
+        return [g.const(_REFLEXIVE[node[0]], _BOOL_SORT)]
+    return ()
+
+
+_rules = {op: (_ac_rules,) for op in _AC}
+_rules.update({op: (_comparison_rules,) for op in _REFLEXIVE})
+_rules.update(
+    {
+        "__sub__": (_sub_rules,),
+        "__neg__": (_double_negation("__neg__"),),
+        "__invert__": (_double_negation("__invert__"),),
+        "Not": (_not_rules,),
+        "Extract": (_extract_rules,),
+        "Concat": (_concat_rules,),
+        "ZeroExt": (_extend_rules,),
+        "SignExt": (_extend_rules,),
+        "__lshift__": (_shift_rules,),
+        "__rshift__": (_shift_rules,),
+        "LShR": (_shift_rules,),
+        "If": (_if_rules,),
+    }
+)
+
+
+def egraph_simplify(
+    expr: "Base",
+    node_limit: int = DEFAULT_NODE_LIMIT,
+    time_limit: Optional[float] = DEFAULT_TIME_LIMIT,
+    iterations: int = DEFAULT_ITERATIONS,
+) -> "Base":
+    """
+    Simplifies an expression by equality saturation (see :mod:`claripy.egraph`), without a solver.
+
+    :param expr:        The expression.
+    :param node_limit:  The number of e-nodes after which no more rewrite rules are applied.
+    :param time_limit:  The time (in seconds) after which no more rewrite rules are applied, or None for no limit.
+    :param iterations:  The maximum number of rounds of applying the rewrite rules to all nodes.
+    :returns:           The smallest equivalent expression that was found, or `expr` if none is smaller.
+    """
+    if not isinstance(expr, Base) or _is_opaque(expr):
+        return expr
+    g = EGraph(node_limit=node_limit)
+    root = g.add(expr)
+    g.saturate(iterations=iterations, time_limit=time_limit)
+    r = g.extract(root)
+    return r if r.tree_size < expr.tree_size else expr
+
+
+from . import folding, simplifications
+from .ast.base import Base
+from .ast.bool import Bool, BoolV
+from .ast.bv import BV, BVV
+from .ast.visitor import DESCEND, DAGVisitor
+
+_BOOL_SORT = (Bool, None)
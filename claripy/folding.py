@@ -0,0 +1,307 @@
+"""
+Direct constant folding of BV and Bool operations.
+
+When every AST argument of an operation is a concrete value (a `BVV` or a `BoolV` without annotations), the result is
+computed here on plain Python ints and bools and returned as the interned `BVV`/`BoolV` leaf, without converting the
+arguments into (and the result out of) the concrete backend. The semantics mirror those of `claripy.bv`. Anything that
+is not handled here (unsupported operations, division by zero, mismatched or zero lengths, ...) makes `fold()` return
+None, in which case the caller falls back to the regular simplification and eager-evaluation path.
+"""
+
+_enabled = True
+
+
+def set_constant_folding(enabled: bool) -> None:
+    """
+    Enable or disable direct constant folding. It is enabled by default. When it is disabled, operations on concrete
+    values are evaluated by the eager backends instead.
+
+    :param enabled: Whether constant folding is enabled.
+    """
+    global _enabled  # pylint:disable=global-statement
+    _enabled = enabled
+
+
+def fold(op, args):
+    """
+    Folds an operation on concrete values.
+
+    :param op:      The name of the operation.
+    :param args:    The (already type-fixed) arguments of the operation.
+    :returns:       The resulting `BVV` or `BoolV`, or None if the operation cannot be folded.
+    """
+    if not _enabled:
+        return None
+    folder = _folders.get(op, None)
+    if folder is None:
+        return None
+
+    BV, Bool = ast.BV, ast.Bool
+    for a in args:
+        t = type(a)
+        if t is BV:
+            if a.op != "BVV" or a.annotations or not a.length or a.args[0] is None:
+                return None
+        elif t is Bool:
+            if a.op != "BoolV" or a.annotations:
+                return None
+        elif t is not int:
+            return None
+    return folder(*args)
+
+
+#
+# Helpers
+#
+
+
+def _bvv(value, size):
+    return ast.all_operations.BVV(value, size)
+
+
+def _boolv(value):
+    return ast.true if value else ast.false
+
+
+def _signed(value, size):
+    return value - (1 << size) if value >> (size - 1) else value
+
+
+def _same_length(args):
+    size = args[0].length
+    for a in args:
+        if type(a) is not ast.BV or a.length != size:
+            return None
+    return size
+
+
+def _round_to_zero_div(a, b):
+    # like SDiv in claripy.bv
+    return a // b if a * b > 0 else (a + (-a % b)) // b
+
+
+#
+# Arithmetic and bitwise operations
+#
+
+
+def _reducer(func):
+    def _fold_reduce(*args):
+        size = _same_length(args)
+        if size is None:
+            return None
+        mask = (1 << size) - 1
+        value = args[0].args[0]
+        for a in args[1:]:
+            value = func(value, a.args[0]) & mask
+        return _bvv(value, size)
+
+    return _fold_reduce
+
+
+def _binary(func):
+    def _fold_binary(a, b):
+        size = a.length
+        if type(a) is not ast.BV or type(b) is not ast.BV or b.length != size:
+            return None
+        value = func(a.args[0], b.args[0], size)
+        return None if value is None else _bvv(value, size)
+
+    return _fold_binary
+
+
+def _unary(func):
+    def _fold_unary(a):
+        if type(a) is not ast.BV:
+            return None
+        return _bvv(func(a.args[0], a.length), a.length)
+
+    return _fold_unary
+
+
+def _udiv(a, b, size):  # pylint:disable=unused-argument
+    return None if b == 0 else a // b
+
+
+def _umod(a, b, size):  # pylint:disable=unused-argument
+    return None if b == 0 else a % b
+
+
+def _sdiv(a, b, size):
+    if b == 0:
+        return None
+    return _round_to_zero_div(_signed(a, size), _signed(b, size))
+
+
+def _smod(a, b, size):
+    if b == 0:
+        return None
+    a = _signed(a, size)
+    b = _signed(b, size)
+    return a - _round_to_zero_div(a, b) * b
+
+
+def _shl(a, b, size):
+    return 0 if b >= size else a << b
+
+
+def _ashr(a, b, size):
+    return _signed(a, size) >> min(b, size)
+
+
+def _lshr(a, b, size):  # pylint:disable=unused-argument
+    return a >> b
+
+
+def _rotl(a, b, size):
+    b %= size
+    return (a << b) | (a >> (size - b))
+
+
+def _rotr(a, b, size):
+    b %= size
+    return (a >> b) | (a << (size - b))
+
+
+def _fold_reverse(a):
+    if type(a) is not ast.BV or a.length % 8 != 0:
+        return None
+    if a.length == 8:
+        return a
+    return _bvv(int.from_bytes(a.args[0].to_bytes(a.length // 8, "big"), "little"), a.length)
+
+
+#
+# Bit-modifying operations
+#
+
+
+def _fold_extract(high, low, a):
+    if type(high) is not int or type(low) is not int or type(a) is not ast.BV or not 0 <= low <= high < a.length:
+        return None
+    return _bvv(a.args[0] >> low, high + 1 - low)
+
+
+def _fold_zeroext(num, a):
+    if type(num) is not int or type(a) is not ast.BV or num < 0:
+        return None
+    return _bvv(a.args[0], a.length + num)
+
+
+def _fold_signext(num, a):
+    if type(num) is not int or type(a) is not ast.BV or num < 0:
+        return None
+    return _bvv(_signed(a.args[0], a.length), a.length + num)
+
+
+def _fold_concat(*args):
+    value = 0
+    size = 0
+    for a in args:
+        if type(a) is not ast.BV:
+            return None
+        value = (value << a.length) | a.args[0]
+        size += a.length
+    return _bvv(value, size)
+
+
+#
+# Comparisons
+#
+
+
+def _comparison(func, signed=False):
+    def _fold_comparison(a, b):
+        size = a.length
+        if type(a) is not ast.BV or type(b) is not ast.BV or b.length != size:
+            return None
+        if signed:
+            return _boolv(func(_signed(a.args[0], size), _signed(b.args[0], size)))
+        return _boolv(func(a.args[0], b.args[0]))
+
+    return _fold_comparison
+
+
+def _equality(negate):
+    def _fold_equality(a, b):
+        if type(a) is int or type(a) is not type(b) or a.length != b.length:
+            return None
+        return _boolv((a.args[0] == b.args[0]) is not negate)
+
+    return _fold_equality
+
+
+#
+# Boolean operations
+#
+
+
+def _fold_and(*args):
+    for a in args:
+        if type(a) is not ast.Bool:
+            return None
+    return _boolv(all(a.args[0] for a in args))
+
+
+def _fold_or(*args):
+    for a in args:
+        if type(a) is not ast.Bool:
+            return None
+    return _boolv(any(a.args[0] for a in args))
+
+
+def _fold_not(a):
+    if type(a) is not ast.Bool:
+        return None
+    return _boolv(not a.args[0])
+
+
+def _fold_if(cond, iftrue, iffalse):
+    if type(cond) is not ast.Bool or type(iftrue) is int or type(iftrue) is not type(iffalse):
+        return None
+    if iftrue.length != iffalse.length:
+        return None
+    return iftrue if cond.args[0] else iffalse
+
+
+_folders = {
+    "__add__": _reducer(lambda a, b: a + b),
+    "__sub__": _reducer(lambda a, b: a - b),
+    "__mul__": _reducer(lambda a, b: a * b),
+    "__and__": _reducer(lambda a, b: a & b),
+    "__or__": _reducer(lambda a, b: a | b),
+    "__xor__": _reducer(lambda a, b: a ^ b),
+    "__floordiv__": _binary(_udiv),
+    "__mod__": _binary(_umod),
+    "SDiv": _binary(_sdiv),
+    "SMod": _binary(_smod),
+    "__lshift__": _binary(_shl),
+    "__rshift__": _binary(_ashr),
+    "LShR": _binary(_lshr),
+    "RotateLeft": _binary(_rotl),
+    "RotateRight": _binary(_rotr),
+    "__invert__": _unary(lambda a, size: ~a),
+    "__neg__": _unary(lambda a, size: -a),
+    "Reverse": _fold_reverse,
+    "Extract": _fold_extract,
+    "ZeroExt": _fold_zeroext,
+    "SignExt": _fold_signext,
+    "Concat": _fold_concat,
+    "__eq__": _equality(False),
+    "__ne__": _equality(True),
+    "__lt__": _comparison(lambda a, b: a < b),
+    "__le__": _comparison(lambda a, b: a <= b),
+    "__gt__": _comparison(lambda a, b: a > b),
+    "__ge__": _comparison(lambda a, b: a >= b),
+    "SLT": _comparison(lambda a, b: a < b, signed=True),
+    "SLE": _comparison(lambda a, b: a <= b, signed=True),
+    "SGT": _comparison(lambda a, b: a > b, signed=True),
+    "SGE": _comparison(lambda a, b: a >= b, signed=True),
+    "And": _fold_and,
+    "Or": _fold_or,
+    "Not": _fold_not,
+    "If": _fold_if,
+}
+
+
+from . import ast
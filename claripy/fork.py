@@ -0,0 +1,56 @@
+"""
+Support for forking worker processes off a process that has already built up expressions and backend objects.
+
+A forked child shares the memory of its parent copy-on-write, but any write to a shared object copies the page that
+it lives on. Reference count updates and garbage collections write to objects all the time, so without some care, the
+children end up with private copies of most of the state of the parent.
+"""
+
+import gc
+import os
+import threading
+
+_registered = False
+
+
+def prepare_for_fork() -> None:
+    """
+    Prepares claripy for forking worker processes that share the state that this process has built. Call it after the
+    caches are warmed up, right before forking. Objects that are created later are not covered, so call it again
+    before every round of forks.
+
+    - All ASTs that are currently in the hash-cons caches are pinned (see :meth:`HashConsCache.freeze`), so that they
+      stay alive and are found by the children, instead of being freed (and written to) and rebuilt by each of them.
+    - Garbage is collected and all remaining objects are moved to the permanent generation of the garbage collector
+      (:func:`gc.freeze`), so that collections in the children do not touch them.
+    - In every child, the per-thread state of the backends is reinitialized: only the thread that forked exists in the
+      child, so its state (including its Z3 context and its converted objects) is kept, and the state of all other
+      threads is dropped. Locks that might have been held by other threads at the time of the fork are replaced.
+    """
+    global _registered  # pylint:disable=global-statement
+    for cache in _hash_cons_caches():
+        cache.freeze()
+    gc.collect()
+    gc.freeze()
+    if not _registered and hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+        _registered = True
+
+
+def _hash_cons_caches():
+    return Base._hash_cache, Base._leaf_cache, bv._bvv_cache
+
+
+def _after_fork_in_child():
+    for cache in _hash_cons_caches():
+        cache._after_fork_in_child()
+    for backend in backends._backends:
+        backend._after_fork_in_child()
+    memory_budget._lock = threading.Lock()
+    simplifications.simpleton._memo_lock = threading.RLock()
+
+
+from . import memory_budget, simplifications
+from .ast import bv
+from .ast.base import Base
+from .backend_manager import backends
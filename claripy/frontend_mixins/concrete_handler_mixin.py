@@ -41,6 +41,8 @@ class ConcreteHandlerMixin:
 
     def is_true(self, e, **kwargs):
         c = self._concrete_value(e)
+        if c is None:
+            c = known_truth(e)
         if c is not None:
             return c
         else:
@@ -48,7 +50,12 @@ class ConcreteHandlerMixin:
 
     def is_false(self, e, **kwargs):
         c = self._concrete_value(e)
+        if c is None:
+            c = known_truth(e)
         if c is not None:
             return not c
         else:
             return super().is_false(e, **kwargs)
+
+
+from ..known_bits import known_truth
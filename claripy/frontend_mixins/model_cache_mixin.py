@@ -3,6 +3,7 @@ import weakref
 import itertools
 
 from .. import errors
+from ..utils import CacheCounters
 
 
 class ModelCache:
@@ -90,13 +91,22 @@ class ModelCache:
             new_ast = ast.replace_dict(self.constraint_only_replacements, leaf_operation=self._leaf_op_existonly)
         return backends.concrete.eval(new_ast, 1)[0]
 
+    def _replace_all(self, asts, allow_unconstrained: bool = True):
+        """
+        Replaces the symbols in all of `asts` by their values in the model, in one pass over all of them.
+        """
+        if allow_unconstrained:
+            return replace_many(asts, self.replacements, leaf_operation=self._leaf_op)
+        else:
+            return replace_many(asts, self.constraint_only_replacements, leaf_operation=self._leaf_op_existonly)
+
     def eval_constraints(self, constraints):
         """Returns whether the constraints is satisfied trivially by using the
         last model."""
         # eval_ast is concretizing symbols and evaluating them, this can raise
         # exceptions.
         try:
-            return all(self.eval_ast(c) for c in constraints)
+            return all(backends.concrete.eval(c, 1)[0] for c in self._replace_all(constraints))
         except errors.ClaripyZeroDivisionError:
             return False
 
@@ -111,12 +121,19 @@ class ModelCache:
         :return:                    A tuple of evaluated results, one element per AST.
         """
 
-        return tuple(self.eval_ast(c, allow_unconstrained=allow_unconstrained) for c in asts)
+        return tuple(backends.concrete.eval(c, 1)[0] for c in self._replace_all(asts, allow_unconstrained))
+
+
+# the live model caches and the counters of all of them, for claripy.stats(): a hit is a query that is answered from
+# the cached models, a miss is one that goes on to the solver
+_model_cache_frontends = weakref.WeakSet()
+model_cache_counters = CacheCounters()
 
 
 class ModelCacheMixin:
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        _model_cache_frontends.add(self)
         self._models = set()
         self._exhausted = False
         self._eval_exhausted = weakref.WeakSet()
@@ -127,6 +144,7 @@ class ModelCacheMixin:
 
     def _blank_copy(self, c):
         super()._blank_copy(c)
+        _model_cache_frontends.add(c)
         c._models = set()
         c._exhausted = False
         c._eval_exhausted = weakref.WeakSet()
@@ -147,6 +165,7 @@ class ModelCacheMixin:
 
     def __setstate__(self, base_state):
         super().__setstate__(base_state)
+        _model_cache_frontends.add(self)
         self._models = set()
         self._exhausted = False
         self._eval_exhausted = weakref.WeakSet()
@@ -159,6 +178,18 @@ class ModelCacheMixin:
     # Model cleaning
     #
 
+    def _clear_model_cache(self):
+        """
+        Forgets all cached models, and which expressions have been exhausted.
+        """
+        self._models = set()
+        self._exhausted = False
+        self._eval_exhausted.clear()
+        self._max_exhausted.clear()
+        self._min_exhausted.clear()
+        self._max_signed_exhausted.clear()
+        self._min_signed_exhausted.clear()
+
     def simplify(self, *args, **kwargs):
         results = super().simplify(*args, **kwargs)
         if len(results) > 0 and any(c is false for c in results):
@@ -302,14 +333,18 @@ class ModelCacheMixin:
 
     def satisfiable(self, extra_constraints=(), **kwargs):
         for _ in self._get_models(extra_constraints=extra_constraints):
+            model_cache_counters.hits += 1
             return True
+        model_cache_counters.misses += 1
         return super().satisfiable(extra_constraints=extra_constraints, **kwargs)
 
     def batch_eval(self, asts, n, extra_constraints=(), **kwargs):
         results = self._get_batch_solutions(asts, n=n, extra_constraints=extra_constraints)
 
         if len(results) == n or (len(asts) == 1 and asts[0].cache_key in self._eval_exhausted):
+            model_cache_counters.hits += 1
             return results
+        model_cache_counters.misses += 1
 
         remaining = n - len(results)
 
@@ -385,3 +420,4 @@ class ModelCacheMixin:
 from .. import backends, false
 from ..errors import UnsatError
 from ..ast import all_operations, Base
+from ..ast.base import replace_many
@@ -8,22 +8,30 @@ from ..frontend import Frontend
 
 
 class ConstrainedFrontend(Frontend):  # pylint:disable=abstract-method
+    # constraints with more (estimated) unique nodes than this are left alone by simplify(), since simplifying them
+    # takes long and rarely pays off. None means no limit.
+    simplify_size_limit = None
+
     def __init__(self):
         Frontend.__init__(self)
         self.constraints = []
         self.variables = set()
         self._finalized = False
+        # the number of constraints at the start of self.constraints that simplify() has already processed
+        self._simplified_count = 0
 
     def _blank_copy(self, c):
         super()._blank_copy(c)
         c.constraints = []
         c.variables = set()
         c._finalized = False
+        c._simplified_count = 0
 
     def _copy(self, c):
         super()._copy(c)
         c.constraints = list(self.constraints)
         c.variables = set(self.variables)
+        c._simplified_count = self._simplified_count
 
         # finalize both
         self.finalize()
@@ -34,10 +42,15 @@ class ConstrainedFrontend(Frontend):  # pylint:disable=abstract-method
     #
 
     def __getstate__(self):
-        return self.constraints, self.variables, self._finalized, super().__getstate__()
+        return self.constraints, self.variables, self._finalized, self._simplified_count, super().__getstate__()
 
     def __setstate__(self, s):
-        self.constraints, self.variables, self._finalized, base_state = s
+        if len(s) == 4:
+            # pickled before the count of simplified constraints was tracked
+            self.constraints, self.variables, self._finalized, base_state = s
+            self._simplified_count = 0
+        else:
+            self.constraints, self.variables, self._finalized, self._simplified_count, base_state = s
         super().__setstate__(base_state)
 
     #
@@ -103,23 +116,42 @@ class ConstrainedFrontend(Frontend):  # pylint:disable=abstract-method
             self.variables.update(c.variables)
         return constraints
 
+    def _should_simplify(self, c):
+        if any(isinstance(a, SimplificationAvoidanceAnnotation) for a in c.annotations):
+            return False
+        limit = self.simplify_size_limit
+        return limit is None or c.dag_size_estimate <= limit
+
     def simplify(self):
-        to_simplify = [
-            c
-            for c in self.constraints
-            if not any(isinstance(a, SimplificationAvoidanceAnnotation) for a in c.annotations)
-        ]
-        no_simplify = [
-            c for c in self.constraints if any(isinstance(a, SimplificationAvoidanceAnnotation) for a in c.annotations)
-        ]
-
-        if len(to_simplify) == 0:
-            return self.constraints
-
-        simplified = simplify(And(*to_simplify)).split(["And"])  # pylint:disable=no-member
-        self.constraints = no_simplify + simplified
+        """
+        Simplifies the constraints that were added since the last call, and keeps the ones that were simplified before
+        as they are, so that a long-lived frontend does not simplify all of its constraints over and over. New
+        constraints are simplified together, but not together with the old ones.
+        """
+        done = self._simplified_count
+        to_simplify = []
+        no_simplify = []
+        for c in self.constraints[done:]:
+            (to_simplify if self._should_simplify(c) else no_simplify).append(c)
+
+        if len(to_simplify) != 0:
+            simplified = simplify(And(*to_simplify)).split(["And"])  # pylint:disable=no-member
+            # new constraints that are always true do not change the constraints that are already there
+            simplified = [c for c in simplified if c is not true] if done else simplified
+            del self.constraints[done:]
+            self.constraints += no_simplify
+            self.constraints += simplified
+        self._simplified_count = len(self.constraints)
         return self.constraints
 
+    def canonical_form(self):
+        """
+        Returns the alpha-canonical hash of the constraints of this frontend and their variables in canonical order,
+        which can be used to share cached results between solvers whose constraints only differ in the names of their
+        variables. See :func:`claripy.ast.base.constraint_set_canonical_form`.
+        """
+        return constraint_set_canonical_form(self.constraints)
+
     #
     # Stuff that should be implemented by subclasses
     #
@@ -152,6 +184,6 @@ class ConstrainedFrontend(Frontend):  # pylint:disable=abstract-method
         raise NotImplementedError("is_false() is not implemented")
 
 
-from ..ast.base import simplify
-from ..ast.bool import And, Or
+from ..ast.base import simplify, constraint_set_canonical_form
+from ..ast.bool import And, Or, true
 from ..annotation import SimplificationAvoidanceAnnotation
@@ -99,14 +99,16 @@ class ReplacementFrontend(ConstrainedFrontend):
         self._replacements = {}
         self._replacement_cache = weakref.WeakKeyDictionary(self._replacements)
 
-    def _replacement(self, old):
+    def _has_replacements(self):
         # depressing hack
         try:
-            if not self._replacement_cache:
-                return old
+            return bool(self._replacement_cache)
         except RuntimeError:
-            if not self._replacement_cache:
-                return old
+            return bool(self._replacement_cache)
+
+    def _replacement(self, old):
+        if not self._has_replacements():
+            return old
 
         if not isinstance(old, Base):
             return old
@@ -171,7 +173,10 @@ class ReplacementFrontend(ConstrainedFrontend):
     #
 
     def _replace_list(self, lst):
-        return tuple(self._replacement(c) for c in lst)
+        if not self._has_replacements():
+            return tuple(lst)
+        # replace_many() records the replaced ASTs in the cache as well
+        return tuple(replace_many(lst, self._replacement_cache))
 
     def eval(self, e, n, extra_constraints=(), exact=None):
         er = self._replacement(e)
@@ -299,7 +304,7 @@ class ReplacementFrontend(ConstrainedFrontend):
         return added
 
 
-from ..ast.base import Base
+from ..ast.base import Base, replace_many
 from ..ast.bv import BVV
 from ..ast.bool import BoolV, false
 from ..errors import ClaripyFrontendError, BackendError
@@ -0,0 +1,412 @@
+"""
+A known-bits analysis of BV and Bool expressions.
+
+Every expression is abstracted to a pair ``(mask, value)`` (a "tnum"): the bits that are set in `mask` have the same
+value in every assignment of the variables, namely the corresponding bits of `value`, and the other bits are unknown
+(and zero in `value`). Bools are treated as 1-bit values. For example, ``ZeroExt(24, x) << 4`` (with an 8-bit `x`) is
+``(0xfffff00f, 0)``: the top 20 and the low 4 bits are known to be zero.
+
+The pairs are computed bottom-up, from those of the arguments, and cached on every node (see
+:meth:`claripy.ast.Base.known_bits`). They let the simplifiers fold comparisons and extractions that only depend on
+known bits (such as ``(x & 0xf0) == 1`` or ``(x << 8)[7:0]``), and let :func:`claripy.is_true` and
+:func:`claripy.is_false` decide such conditions without asking a solver. The analysis is sound but not complete: a
+bit that is unknown might still be constant.
+"""
+
+from typing import Optional, Tuple
+
+# (mask, value) of an expression that nothing is known about
+UNKNOWN = (0, 0)
+
+
+def known_bits(expr) -> Tuple[int, int]:
+    """
+    Returns the known bits of an expression.
+
+    :param expr:    A BV or Bool AST.
+    :returns:       A tuple of a mask of the bits that are known, and their values.
+    """
+    r = expr._known_bits
+    if r is not None:
+        return r
+    r = _pre(expr)
+    if r is not DESCEND:
+        return r
+    # usually, the arguments of a new node have been looked at already
+    Base = ast.Base
+    args = tuple(a._known_bits if isinstance(a, Base) else a for a in expr.args)
+    if None in args:
+        return DAGVisitor(_visit, pre=_pre).walk(expr)
+    return _visit(expr, args)
+
+
+def known_truth(expr) -> Optional[bool]:
+    """
+    Returns the value of a Bool AST if it is the same for all assignments of its variables (as far as the known bits
+    tell), or None.
+    """
+    if type(expr) is not ast.Bool:
+        return None
+    mask, value = known_bits(expr)
+    return bool(value) if mask else None
+
+
+def known_comparison(op: str, a, b, trivial: bool = True) -> Optional[bool]:
+    """
+    Returns the result of the comparison ``op(a, b)`` if it follows from the known bits of `a` and `b`, or None.
+
+    :param op:      The name of a comparison operation, such as "__eq__" or "SLT".
+    :param trivial: Whether to return the result of comparisons that hold for any value of one of the sides (such as
+                    ``x >= 0``) as well.
+    """
+    compare = _comparisons.get(op, None)
+    if compare is None or not isinstance(a, (ast.BV, ast.Bool)) or type(a) is not type(b):
+        return None
+    width = _width(a)
+    bits_a, bits_b = known_bits(a), known_bits(b)
+    r = compare(bits_a, bits_b, width)
+    if r is UNKNOWN:
+        return None
+    if not trivial and (
+        compare(UNKNOWN, bits_b, width) is not UNKNOWN or compare(bits_a, UNKNOWN, width) is not UNKNOWN
+    ):
+        return None
+    return bool(r[1])
+
+
+#
+# The walk
+#
+
+
+def _width(expr) -> int:
+    return 1 if type(expr) is ast.Bool else expr.length
+
+
+def _pre(expr):
+    if expr._known_bits is not None:
+        return expr._known_bits
+    t = type(expr)
+    if t is ast.BV:
+        if expr.op == "BVV":
+            if expr.args[0] is None:
+                return UNKNOWN
+            r = expr._known_bits = ((1 << expr.length) - 1, expr.args[0])
+            return r
+    elif t is ast.Bool:
+        if expr.op == "BoolV":
+            r = expr._known_bits = (1, int(expr.args[0]))
+            return r
+    else:
+        # the analysis does not look at other sorts, but they can appear as arguments (and are unknown, then)
+        return UNKNOWN
+    if expr.op not in _transfer:
+        expr._known_bits = UNKNOWN
+        return UNKNOWN
+    return DESCEND
+
+
+def _visit(expr, args):
+    r = _transfer[expr.op](expr, *args)
+    expr._known_bits = r
+    return r
+
+
+#
+# Transfer functions. Each is called with the expression and the known bits of its arguments (or the arguments
+# themselves, if they are not ASTs), and returns the known bits of the expression.
+#
+
+
+def _ones(width: int) -> int:
+    return (1 << width) - 1
+
+
+def _sign_extend(x: int, width: int, to: int) -> int:
+    """
+    Copies the top bit of the `width`-bit `x` into the bits above it, up to `to` bits.
+    """
+    if x >> (width - 1) & 1:
+        return x | (_ones(to) ^ _ones(width))
+    return x
+
+
+def _and(expr, *args):  # pylint:disable=unused-argument
+    ones = -1
+    zeros = 0
+    for mask, value in args:
+        ones &= value
+        zeros |= mask & ~value
+    ones &= _ones(_width(expr))
+    return ones | zeros, ones
+
+
+def _or(expr, *args):  # pylint:disable=unused-argument
+    ones = 0
+    zeros = _ones(_width(expr))
+    for mask, value in args:
+        ones |= value
+        zeros &= mask & ~value
+    return ones | zeros, ones
+
+
+def _xor(expr, *args):  # pylint:disable=unused-argument
+    mask = _ones(_width(expr))
+    value = 0
+    for m, v in args:
+        mask &= m
+        value ^= v
+    return mask, value & mask
+
+
+def _invert(expr, a):
+    mask, value = a
+    return mask, ~value & mask & _ones(_width(expr))
+
+
+def _add(expr, *args):
+    # carries are known as long as no unknown bit can change them (see the tnum_add of the Linux kernel)
+    full = _ones(expr.length)
+    mask, value = args[0]
+    for m, v in args[1:]:
+        unknown = (~mask | ~m) & full
+        sum_values = value + v
+        sum_unknown = ((~mask & full) + (~m & full) + sum_values) ^ sum_values
+        unknown |= sum_unknown
+        mask = ~unknown & full
+        value = sum_values & mask
+    return mask, value
+
+
+def _sub(expr, a, b):
+    full = _ones(expr.length)
+    (ma, va), (mb, vb) = a, b
+    difference = va - vb
+    unknown = ((difference + (~ma & full)) ^ (difference - (~mb & full))) | (~ma & full) | (~mb & full)
+    mask = ~unknown & full
+    return mask, difference & mask
+
+
+def _neg(expr, a):
+    return _sub(expr, (_ones(expr.length), 0), a)
+
+
+def _trailing_zeros(mask: int, value: int, width: int) -> int:
+    known_zeros = mask & ~value
+    n = 0
+    while n < width and known_zeros >> n & 1:
+        n += 1
+    return n
+
+
+def _mul(expr, *args):
+    width = expr.length
+    if all(m == _ones(width) for m, _ in args):
+        value = 1
+        for _, v in args:
+            value *= v
+        return _ones(width), value & _ones(width)
+    # the product has (at least) as many trailing zeros as its factors together
+    zeros = min(width, sum(_trailing_zeros(m, v, width) for m, v in args))
+    return _ones(zeros), 0
+
+
+def _shift_amount(expr, b) -> Optional[int]:
+    mask, value = b
+    return value if mask == _ones(expr.length) else None
+
+
+def _lshift(expr, a, b):
+    width = expr.length
+    shift = _shift_amount(expr, b)
+    if shift is None:
+        return UNKNOWN
+    if shift >= width:
+        return _ones(width), 0
+    mask, value = a
+    return (mask << shift | _ones(shift)) & _ones(width), value << shift & _ones(width)
+
+
+def _lshr(expr, a, b):
+    width = expr.length
+    shift = _shift_amount(expr, b)
+    if shift is None:
+        return UNKNOWN
+    if shift >= width:
+        return _ones(width), 0
+    mask, value = a
+    return mask >> shift | (_ones(width) ^ _ones(width - shift)), value >> shift
+
+
+def _ashr(expr, a, b):
+    width = expr.length
+    shift = _shift_amount(expr, b)
+    if shift is None:
+        return UNKNOWN
+    shift = min(shift, width - 1)
+    mask, value = a
+    # if the sign bit is unknown, it is 0 in both the mask and the value, and so are the bits that it is shifted into
+    return _sign_extend(mask, width, width + shift) >> shift, _sign_extend(value, width, width + shift) >> shift
+
+
+def _rotate(left):
+    def _rotate_known_bits(expr, a, b):
+        width = expr.length
+        shift = _shift_amount(expr, b)
+        if shift is None:
+            return UNKNOWN
+        shift %= width
+        if not left:
+            shift = (width - shift) % width
+        full = _ones(width)
+        return tuple((x << shift | x >> (width - shift)) & full for x in a)
+
+    return _rotate_known_bits
+
+
+def _reverse(expr, a):
+    if expr.length % 8 != 0:
+        return UNKNOWN
+    size = expr.length // 8
+    return tuple(int.from_bytes(x.to_bytes(size, "big"), "little") for x in a)
+
+
+def _extract(expr, high, low, a):  # pylint:disable=unused-argument
+    full = _ones(high - low + 1)
+    return tuple(x >> low & full for x in a)
+
+
+def _zeroext(expr, n, a):
+    mask, value = a
+    width = expr.length - n
+    return mask | (_ones(expr.length) ^ _ones(width)), value
+
+
+def _signext(expr, n, a):
+    width = expr.length - n
+    return tuple(_sign_extend(x, width, expr.length) for x in a)
+
+
+def _concat(expr, *args):
+    mask = value = 0
+    for arg, (m, v) in zip(expr.args, args):
+        mask = mask << arg.length | m
+        value = value << arg.length | v
+    return mask, value
+
+
+def _if(expr, cond, if_true, if_false):  # pylint:disable=unused-argument
+    cond_mask, cond_value = cond
+    if cond_mask:
+        return if_true if cond_value else if_false
+    (mt, vt), (mf, vf) = if_true, if_false
+    mask = mt & mf & ~(vt ^ vf)
+    return mask, vt & mask
+
+
+#
+# Comparisons, which are called with the known bits of both sides and their width, and return the known bits of the
+# result (either (1, 0), (1, 1) or UNKNOWN)
+#
+
+_FALSE = (1, 0)
+_TRUE = (1, 1)
+
+
+def _eq(a, b, width):  # pylint:disable=unused-argument
+    (ma, va), (mb, vb) = a, b
+    if (va ^ vb) & ma & mb:
+        return _FALSE
+    if ma == mb == _ones(width):
+        return _TRUE
+    return UNKNOWN
+
+
+def _ne(a, b, width):
+    r = _eq(a, b, width)
+    return r if r is UNKNOWN else (1, r[1] ^ 1)
+
+
+def _unsigned_bounds(a, width):
+    mask, value = a
+    return value, value | (~mask & _ones(width))
+
+
+def _signed_bounds(a, width):
+    mask, value = a
+    sign = 1 << (width - 1)
+    unknown = ~mask & _ones(width)
+    low = value | (unknown & sign)
+    high = value | (unknown & ~sign)
+    return low - ((low & sign) << 1), high - ((high & sign) << 1)
+
+
+def _ordering(bounds, strict, swap=False):
+    def _compare(a, b, width):
+        if swap:
+            a, b = b, a
+        a_low, a_high = bounds(a, width)
+        b_low, b_high = bounds(b, width)
+        if a_high < b_low or (not strict and a_high <= b_low):
+            return _TRUE
+        if a_low > b_high or (strict and a_low >= b_high):
+            return _FALSE
+        return UNKNOWN
+
+    return _compare
+
+
+_comparisons = {
+    "__eq__": _eq,
+    "__ne__": _ne,
+    "__lt__": _ordering(_unsigned_bounds, True),
+    "__le__": _ordering(_unsigned_bounds, False),
+    "__gt__": _ordering(_unsigned_bounds, True, swap=True),
+    "__ge__": _ordering(_unsigned_bounds, False, swap=True),
+    "ULT": _ordering(_unsigned_bounds, True),
+    "ULE": _ordering(_unsigned_bounds, False),
+    "UGT": _ordering(_unsigned_bounds, True, swap=True),
+    "UGE": _ordering(_unsigned_bounds, False, swap=True),
+    "SLT": _ordering(_signed_bounds, True),
+    "SLE": _ordering(_signed_bounds, False),
+    "SGT": _ordering(_signed_bounds, True, swap=True),
+    "SGE": _ordering(_signed_bounds, False, swap=True),
+}
+
+
+def _comparison(compare):
+    def _compare_known_bits(expr, a, b):
+        return compare(a, b, _width(expr.args[0]))
+
+    return _compare_known_bits
+
+
+_transfer = {
+    "__and__": _and,
+    "__or__": _or,
+    "__xor__": _xor,
+    "__invert__": _invert,
+    "__add__": _add,
+    "__sub__": _sub,
+    "__neg__": _neg,
+    "__mul__": _mul,
+    "__lshift__": _lshift,
+    "LShR": _lshr,
+    "__rshift__": _ashr,
+    "RotateLeft": _rotate(True),
+    "RotateRight": _rotate(False),
+    "Reverse": _reverse,
+    "Extract": _extract,
+    "ZeroExt": _zeroext,
+    "SignExt": _signext,
+    "Concat": _concat,
+    "If": _if,
+    "And": _and,
+    "Or": _or,
+    "Not": _invert,
+}
+_transfer.update((op, _comparison(compare)) for op, compare in _comparisons.items())
+
+
+from . import ast
+from .ast.visitor import DESCEND, DAGVisitor
@@ -0,0 +1,241 @@
+"""
+A global budget for the memory that is taken by the caches of claripy (and by the solvers behind the backends).
+
+Once a budget is set with :func:`set_memory_budget`, the memory usage is estimated every so often (every
+`check_interval` conversions of an expression into a backend object), and whenever it exceeds the budget, caches are
+shrunk, from the least valuable to the most valuable, until the usage is back within the budget:
+
+1. the strong LRU tiers of the hash-cons caches and the memo of simplification results (halved every time), and the
+   memo of canonical forms
+2. the truth caches (``is_true``/``is_false``) of the backends
+3. the object caches of the backends
+4. the caches of the current thread that keep native solver objects alive (such as the Z3 term cache)
+5. the model caches of the frontends
+6. everything else: the strong LRU tiers, the simplification memo, and all caches of the backends (see :func:`claripy.downsize`)
+
+The memory that is held by live ASTs is not counted, since it cannot be freed by claripy. Much of the memory of the
+solvers cannot be freed either, so if the usage still exceeds the budget after all caches are dropped, the caches are
+only shrunk again once the usage has grown by another quarter.
+"""
+
+import itertools
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+l = logging.getLogger("claripy.memory_budget")
+
+_budget = None
+_check_interval = 1000
+_countdown = 1000
+# the memory usage after the last time that dropping all caches was not enough, if that is still the case
+_floor = None
+_lock = threading.Lock()
+
+
+def set_memory_budget(budget: Optional[int], check_interval: int = 1000) -> None:
+    """
+    Sets the memory budget. It is disabled (None) by default.
+
+    :param budget:          The budget in bytes, or None to disable it.
+    :param check_interval:  The number of conversions of expressions into backend objects between two checks of the
+                            memory usage.
+    """
+    global _budget, _check_interval, _countdown, _floor  # pylint:disable=global-statement
+    if budget is not None and budget < 0:
+        raise ClaripyValueError("The memory budget cannot be negative")
+    if check_interval < 1:
+        raise ClaripyValueError("The check interval must be positive")
+    _budget = budget
+    _check_interval = check_interval
+    _countdown = check_interval
+    _floor = None
+
+
+def memory_budget() -> Optional[int]:
+    """
+    Returns the memory budget in bytes, or None if there is none.
+    """
+    return _budget
+
+
+def tick() -> None:
+    """
+    Counts a conversion, and enforces the budget every `check_interval` conversions.
+    """
+    global _countdown  # pylint:disable=global-statement
+    _countdown -= 1
+    if _countdown <= 0:
+        _countdown = _check_interval
+        enforce_memory_budget()
+
+
+def memory_usage() -> int:
+    """
+    Estimates the memory (in bytes) that is taken by the caches of claripy that can be shrunk, and by the libraries
+    behind the backends. Of the hash-cons caches, only the strong LRU tiers are counted.
+
+    Since this runs every so often while expressions are converted, it only looks at the number of entries of every
+    cache, and multiplies it with the average size of an entry, which is estimated from a sample of the entries (see
+    :func:`claripy.utils.cachecounters.approximate_bytes`) only when the cache has doubled or halved in size since it
+    was last sampled. Use :func:`claripy.stats` for a detailed report.
+    """
+    from .cache_stats import _sample  # pylint:disable=import-outside-toplevel
+    from .frontend_mixins import model_cache_mixin  # pylint:disable=import-outside-toplevel
+
+    total = 0
+    for name, cache in (
+        ("ast.hash_cache", Base._hash_cache),
+        ("ast.leaf_cache", Base._leaf_cache),
+        ("ast.bvv_cache", bv._bvv_cache),
+    ):
+        total += _estimate(name, cache.strong_count, lambda cache=cache: cache.sample(SIZE_SAMPLE))
+
+    simpleton = simplifications.simpleton
+    total += _estimate("simplifications.memo", len(simpleton._memo), lambda: simpleton.sample_memo(SIZE_SAMPLE))
+    canonical_sets = base._canonical_set_cache
+    total += _estimate("ast.canonical_sets", len(canonical_sets), lambda: _sample(canonical_sets.copy().items()))
+
+    for name, backend in list(backends._backends_by_name.items()):
+        for cache_name, cache in backend._caches().items():
+            total += _estimate(f"{name}.{cache_name}", len(cache), lambda cache=cache: _sample(cache.items()))
+        per_thread = {}
+        for _, caches in backend._thread_caches_by_thread():
+            for cache_name, cache in caches.items():
+                per_thread.setdefault(f"{name}.{cache_name}", []).append(cache)
+        for cache_name, caches in per_thread.items():
+            count = sum(len(cache) for cache in caches)
+            largest = max(caches, key=len)
+            total += _estimate(cache_name, count, lambda cache=largest: _sample(cache.items()))
+        total += backend.native_memory()
+
+    frontends = list(model_cache_mixin._model_cache_frontends)
+    total += _estimate(
+        "frontends.model_cache",
+        sum(len(f._models) for f in frontends),
+        lambda: [(None, m.model) for f in frontends[:SIZE_SAMPLE] for m in itertools.islice(f._models, 1)],
+    )
+    return total
+
+
+# the estimated size of an entry of every cache, and the number of entries of the cache when it was estimated
+_entry_sizes: Dict[str, Tuple[float, int]] = {}
+
+
+def _estimate(name: str, count: int, sample: Callable[[], List]) -> int:
+    """
+    Estimates the memory that the `count` entries of a cache take.
+
+    :param name:    The name of the cache.
+    :param count:   The number of entries of the cache.
+    :param sample:  Returns a sample of the (key, value) pairs of the cache, if the size of an entry has to be estimated
+                    again.
+    """
+    if not count:
+        return 0
+    known = _entry_sizes.get(name, None)
+    if known is None or not known[1] // 2 <= count <= known[1] * 2:
+        items = sample()
+        if not items:
+            return 0
+        known = _entry_sizes[name] = (approximate_bytes(items, len(items)) / len(items), count)
+    return round(known[0] * count)
+
+
+#
+# The ways to free memory, from the least to the most valuable caches
+#
+
+
+def _shrink_strong_tiers():
+    for cache in (Base._hash_cache, Base._leaf_cache, bv._bvv_cache):
+        cache.evict(-(-cache.strong_count // 2))
+    simplifications.simpleton.evict_memo(-(-len(simplifications.simpleton._memo) // 2))
+    base._canonical_set_cache.clear()
+
+
+def _clear_truth_caches():
+    for backend in backends._backends:
+        for cache in backend._caches().values():
+            cache.clear()
+
+
+def _clear_object_caches():
+    for backend in backends._backends:
+        for _, caches in backend._thread_caches_by_thread():
+            cache = caches.get("object_cache", None)
+            if cache is not None:
+                cache.clear()
+
+
+def _drop_native_caches():
+    for backend in backends._backends:
+        backend._drop_native_caches()
+
+
+def _clear_model_caches():
+    from .frontend_mixins import model_cache_mixin  # pylint:disable=import-outside-toplevel
+
+    for frontend in list(model_cache_mixin._model_cache_frontends):
+        frontend._clear_model_cache()
+
+
+def _drop_everything():
+    for cache in (Base._hash_cache, Base._leaf_cache, bv._bvv_cache):
+        cache.clear_strong()
+    simplifications.simpleton.clear_memo()
+    backends.downsize()
+
+
+_stages = (
+    _shrink_strong_tiers,
+    _clear_truth_caches,
+    _clear_object_caches,
+    _drop_native_caches,
+    _clear_model_caches,
+    _drop_everything,
+)
+
+
+def enforce_memory_budget() -> bool:
+    """
+    Checks the memory usage right away, and shrinks caches if it exceeds the budget.
+
+    :returns:   Whether the memory usage is within the budget (always True if there is no budget).
+    """
+    global _floor  # pylint:disable=global-statement
+    budget = _budget
+    if budget is None:
+        return True
+    if not _lock.acquire(blocking=False):
+        # another thread is already at it
+        return True
+    try:
+        usage = memory_usage()
+        if usage <= budget:
+            _floor = None
+            return True
+        if _floor is not None and usage <= _floor + _floor // 4:
+            return False
+        for stage in _stages:
+            l.info("Memory usage of %d bytes exceeds the budget of %d bytes, running %s", usage, budget, stage.__name__)
+            stage()
+            usage = memory_usage()
+            if usage <= budget:
+                _floor = None
+                return True
+        _floor = usage
+        l.warning(
+            "Memory usage of %d bytes still exceeds the budget of %d bytes after freeing all caches", usage, budget
+        )
+        return False
+    finally:
+        _lock.release()
+
+
+from . import simplifications
+from .errors import ClaripyValueError
+from .ast import base, bv
+from .ast.base import Base
+from .backend_manager import backends
+from .utils.cachecounters import SIZE_SAMPLE, approximate_bytes
@@ -1,4 +1,6 @@
 import itertools
+from typing import Dict, List
+
 from . import debug as _d
 
 
@@ -42,7 +44,7 @@ def op(
             else:
                 yield arg
 
-    def _op(*args):
+    def _generic_op(*args):
         fixed_args = tuple(_type_fixer(args))
         if _d._DEBUG:
             for i in fixed_args:
@@ -53,8 +55,12 @@ def op(
                 if not success:
                     raise ClaripyOperationError(msg)
 
+        folded = folding.fold(name, fixed_args)
+        if folded is not None:
+            return folded
+
         # pylint:disable=too-many-nested-blocks
-        simp = _handle_annotations(simplifications.simpleton.simplify(name, fixed_args), args)
+        simp = _handle_annotations(simplifications.simpleton.simplify_opcode(code, fixed_args), args)
         if simp is not None:
             return simp
 
@@ -71,10 +77,92 @@ def op(
 
         return return_type(name, fixed_args, **kwargs)
 
+    code = opcode(name)
+    types_match = _make_types_matcher(arg_types)
+    # the positions of the AST arguments (None for all of them), computed on the first call, since the AST classes
+    # cannot be told apart from the other argument types while claripy is still being imported
+    ast_positions = ()
+    specialized = False
+
+    def _op(*args):
+        nonlocal ast_positions, specialized
+        if not types_match(args):
+            return _generic_op(*args)
+
+        # fast path: every argument already has exactly the expected type, so there is nothing to coerce
+        if not specialized:
+            ast_positions = _ast_positions(arg_types)
+            specialized = True
+
+        if _d._DEBUG and extra_check is not None:
+            success, msg = extra_check(*args)
+            if not success:
+                raise ClaripyOperationError(msg)
+
+        folded = folding.fold(name, args)
+        if folded is not None:
+            return folded
+
+        simp = simplifications.simpleton.simplify_opcode(code, args)
+        if simp is not None:
+            simp = _handle_annotations(simp, args)
+            if simp is not None:
+                return simp
+
+        kwargs = {}
+        if calc_length is not None:
+            kwargs["length"] = calc_length(*args)
+
+        uninitialized = None
+        for a in args if ast_positions is None else (args[i] for i in ast_positions):
+            if a._uninitialized is True:
+                uninitialized = True
+                break
+        kwargs["uninitialized"] = uninitialized
+        if name in preprocessors:
+            _, kwargs = preprocessors[name](*args, **kwargs)
+
+        return return_type(name, args, **kwargs)
+
     _op.calc_length = calc_length
+    _op.generic = _generic_op
     return _op
 
 
+def _make_types_matcher(arg_types):
+    """
+    Builds a function that checks whether a tuple of arguments has exactly the types in `arg_types` (or, if
+    `arg_types` is a single type, whether all arguments have exactly that type).
+    """
+    if type(arg_types) is type:  # pylint:disable=unidiomatic-typecheck
+
+        def _match_all(args):
+            for a in args:
+                if type(a) is not arg_types:  # pylint:disable=unidiomatic-typecheck
+                    return False
+            return True
+
+        return _match_all
+
+    arg_types = tuple(arg_types)
+    if len(arg_types) == 1:
+        (t0,) = arg_types
+        return lambda args: len(args) == 1 and type(args[0]) is t0  # pylint:disable=unidiomatic-typecheck
+    if len(arg_types) == 2:
+        t0, t1 = arg_types
+        return lambda args: len(args) == 2 and type(args[0]) is t0 and type(args[1]) is t1
+    if len(arg_types) == 3:
+        t0, t1, t2 = arg_types
+        return lambda args: len(args) == 3 and type(args[0]) is t0 and type(args[1]) is t1 and type(args[2]) is t2
+    return lambda args: len(args) == len(arg_types) and all(type(a) is t for a, t in zip(args, arg_types))
+
+
+def _ast_positions(arg_types):
+    if type(arg_types) is type:  # pylint:disable=unidiomatic-typecheck
+        return None if issubclass(arg_types, ast.Base) else ()
+    return tuple(i for i, t in enumerate(arg_types) if issubclass(t, ast.Base))
+
+
 def _handle_annotations(simp, args):
     if simp is None:
         return None
@@ -592,7 +680,119 @@ commutative_operations = {
     "Xor",
 }
 
+#
+# Opcodes
+#
+
+# Every operation name is assigned a small integer opcode, which each AST carries next to its `op` string. Layers that
+# dispatch on the operation of a node (the simplifiers and the backends) keep tables that are indexed by opcode.
+# Opcodes are assigned on first use, so they are only meaningful within a single process.
+
+opcode_names: List[str] = []
+opcodes: Dict[str, int] = {}
+opcode_flags = bytearray()
+
+OPF_LEAF = 1
+OPF_LEAF_CONCRETE = 2
+OPF_LEAF_SYMBOLIC = 4
+OPF_INTRODUCES_VARIABLES = 8
+OPF_COMMUTATIVE = 16
+
+
+def opcode(name: str) -> int:
+    """
+    Returns the opcode of an operation, assigning a new one if the operation has none yet.
+
+    :param name:    The name of the operation.
+    :return:        The opcode.
+    """
+    code = opcodes.get(name, None)
+    if code is None:
+        code = opcodes[name] = len(opcode_names)
+        opcode_names.append(name)
+        opcode_flags.append(
+            (OPF_LEAF if name in leaf_operations else 0)
+            | (OPF_LEAF_CONCRETE if name in leaf_operations_concrete else 0)
+            | (OPF_LEAF_SYMBOLIC if name in leaf_operations_symbolic else 0)
+            | (OPF_INTRODUCES_VARIABLES if name in leaf_operations_symbolic_with_union else 0)
+            | (OPF_COMMUTATIVE if name in commutative_operations else 0)
+        )
+    return code
+
+
+class OpcodeDict(dict):
+    """
+    A dict that maps operation names to values, and keeps a list of the same values indexed by opcode for dispatching
+    on the opcode of a node.
+    """
+
+    __slots__ = ("by_opcode",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.by_opcode: List = []
+        self.update(*args, **kwargs)
+
+    def lookup(self, code: int, default=None):
+        """
+        Returns the value for the operation with opcode `code`.
+        """
+        try:
+            value = self.by_opcode[code]
+        except IndexError:
+            return default
+        return default if value is None else value
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        code = opcode(name)
+        table = self.by_opcode
+        if code >= len(table):
+            table.extend([None] * (code + 1 - len(table)))
+        table[code] = value
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self.by_opcode[opcodes[name]] = None
+
+    def pop(self, name, *default):
+        if name in self:
+            value = super().pop(name)
+            self.by_opcode[opcodes[name]] = None
+            return value
+        return super().pop(name, *default)
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):  # pylint:disable=arguments-differ
+        for name, value in dict(*args, **kwargs).items():
+            self[name] = value
+
+    def clear(self):
+        super().clear()
+        self.by_opcode.clear()
+
+    def copy(self):
+        return OpcodeDict(self)
+
+
+# register the built-in operations first, so that their opcodes do not depend on the order of use
+for _name in sorted(
+    backend_operations_all
+    | backend_fp_operations
+    | backend_strings_operations
+    | expression_operations
+    | leaf_operations_symbolic_with_union
+    | {"Xor", "widen", "intersection"}
+):
+    opcode(_name)
+del _name
+
 from .errors import ClaripyOperationError, ClaripyTypeError
 from . import simplifications
+from . import folding
 from . import ast
 from . import fp
@@ -1,14 +1,181 @@
 # pylint:disable=isinstance-second-argument-not-valid-type
 import collections
+import functools
 import itertools
 import operator
-from typing import Optional
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
 
 from functools import reduce
 
+from .utils import CacheCounters
+
+# the default number of simplification results that are memoized
+DEFAULT_MEMO_SIZE = 8192
+
+_MISSING = object()
+
+#
+# Profiling and disabling of the simplifiers
+#
+
+
+class RuleStats:
+    """
+    The profile of a simplifier: how often it was invoked, how often it rewrote its operation, and the time that it
+    took in total (including the time spent in the simplifiers and operations that it invoked in turn).
+    """
+
+    __slots__ = ("invocations", "rewrites", "time")
 
-class SimplificationManager:
     def __init__(self):
+        self.invocations = 0
+        self.rewrites = 0
+        self.time = 0.0
+
+
+# the names of all simplifiers, in the order of their definition
+_rules: List[str] = []
+_rule_stats: Dict[str, RuleStats] = {}
+_disabled_rules = set()
+_profiling = False
+# whether simplifiers have to check for profiling or being disabled at all
+_instrumented = False
+
+
+def _rule(func):
+    """
+    Registers a simplifier, which can then be profiled (see :func:`set_simplifier_profiling`) and disabled (see
+    :func:`disable_simplifier`). Neither costs more than a check of a flag when it is not used.
+    """
+    name = func.__name__
+    stats = RuleStats()
+    _rules.append(name)
+    _rule_stats[name] = stats
+
+    @functools.wraps(func)
+    def _simplifier(*args, **kwargs):
+        if not _instrumented:
+            return func(*args, **kwargs)
+        if name in _disabled_rules:
+            return None
+        if not _profiling:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            r = func(*args, **kwargs)
+        finally:
+            stats.time += time.perf_counter() - start
+            stats.invocations += 1
+        if r is not None:
+            stats.rewrites += 1
+        return r
+
+    return _simplifier
+
+
+def _update_instrumented():
+    global _instrumented  # pylint:disable=global-statement
+    _instrumented = _profiling or bool(_disabled_rules)
+
+
+def simplifier_rules() -> List[str]:
+    """
+    Returns the names of all simplifiers, which are the names of the static methods of
+    :class:`SimplificationManager` that implement them (such as "extract_simplifier").
+    """
+    return list(_rules)
+
+
+def set_simplifier_profiling(enabled: bool) -> None:
+    """
+    Enables or disables profiling of the simplifiers. While enabled, every simplifier counts its invocations and
+    successful rewrites, and measures the time it takes (see :func:`simplifier_stats`). Disabled by default.
+
+    Results of the simplifiers that are memoized (see :func:`set_simplification_cache_size`) are reused without
+    invoking the simplifier, so they are not counted.
+    """
+    global _profiling  # pylint:disable=global-statement
+    _profiling = enabled
+    _update_instrumented()
+
+
+def simplifier_stats() -> Dict[str, Dict[str, Union[int, float]]]:
+    """
+    Reports the profiles of the simplifiers since profiling was enabled (or since :func:`reset_simplifier_stats`).
+    The time of a simplifier includes the time of all simplifiers that it invokes, directly or by building new
+    operations, so the times of different simplifiers overlap.
+
+    :returns:   A dict of simplifier names to dicts with "invocations", "rewrites", "time" (the total in seconds), and
+                "disabled".
+    """
+    return {
+        name: {
+            "invocations": stats.invocations,
+            "rewrites": stats.rewrites,
+            "time": stats.time,
+            "disabled": name in _disabled_rules,
+        }
+        for name, stats in _rule_stats.items()
+    }
+
+
+def reset_simplifier_stats() -> None:
+    """
+    Resets the profiles of all simplifiers.
+    """
+    for stats in _rule_stats.values():
+        stats.__init__()
+
+
+def disable_simplifier(name: str) -> None:
+    """
+    Disables a simplifier: until it is enabled again, it leaves every operation alone. Disabling a simplifier that is
+    invoked by another simplifier (such as "rotate_shift_mask_simplifier" by "bitwise_or_simplifier") only disables
+    that part of the other simplifier.
+
+    Memoized results of the simplifiers are dropped, since they might have been produced by the simplifier. ASTs that
+    were already simplified are not affected.
+
+    :param name:    The name of the simplifier, see :func:`simplifier_rules`.
+    """
+    if name not in _rule_stats:
+        raise ClaripyValueError(f"Unknown simplifier {name!r}")
+    _disabled_rules.add(name)
+    _update_instrumented()
+    simpleton.clear_memo()
+
+
+def enable_simplifier(name: str) -> None:
+    """
+    Enables a simplifier that was disabled with :func:`disable_simplifier`.
+
+    :param name:    The name of the simplifier, see :func:`simplifier_rules`.
+    """
+    if name not in _rule_stats:
+        raise ClaripyValueError(f"Unknown simplifier {name!r}")
+    _disabled_rules.discard(name)
+    _update_instrumented()
+    # operations that were left alone while the simplifier was disabled are memoized as such
+    simpleton.clear_memo()
+
+
+class SimplificationManager:
+    """
+    Applies the simplifiers (rewrite rules) of an operation to its arguments.
+
+    The results of the simplifiers, including the fact that an operation could not be simplified, are memoized in a
+    bounded LRU cache that is keyed by the opcode and the hashes of the arguments. Since ASTs are hash-consed and
+    their hashes cover their annotations, the same key always stands for the same arguments. The memo holds the plain
+    result of the simplifier, by a weak reference (so the memo does not keep ASTs alive): annotations of the arguments
+    are relocated onto it by the caller, every time.
+    """
+
+    def __init__(self, memo_size: int = DEFAULT_MEMO_SIZE):
         self._simplifiers = {
             "Reverse": self.bv_reverse_simplifier,
             "And": self.boolean_and_simplifier,
@@ -23,6 +190,13 @@ class SimplificationManager:
             "__eq__": self.eq_simplifier,
             "__ne__": self.ne_simplifier,
             "__ge__": self.ge_simplifier,
+            "__lt__": functools.partial(self.known_bits_comparison_simplifier, "__lt__"),
+            "__le__": functools.partial(self.known_bits_comparison_simplifier, "__le__"),
+            "__gt__": functools.partial(self.known_bits_comparison_simplifier, "__gt__"),
+            "SLT": functools.partial(self.known_bits_comparison_simplifier, "SLT"),
+            "SLE": functools.partial(self.known_bits_comparison_simplifier, "SLE"),
+            "SGT": functools.partial(self.known_bits_comparison_simplifier, "SGT"),
+            "SGE": functools.partial(self.known_bits_comparison_simplifier, "SGE"),
             "__or__": self.bitwise_or_simplifier,
             "__and__": self.bitwise_and_simplifier,
             "__xor__": self.bitwise_xor_simplifier,
@@ -36,11 +210,97 @@ class SimplificationManager:
             "StrReverse": self.str_reverse_simplifier,
             "__invert__": self.invert_simplifier,
         }
+        # dispatched on the opcode of the operation by simplify_opcode()
+        self._simplifiers = OpcodeDict(self._simplifiers)
+
+        self._memo = OrderedDict()
+        self._memo_size = memo_size
+        # guards the memo and its LRU order, which are shared by all threads. Reentrant, since a finalizer that runs
+        # during a garbage collection triggered while the lock is held might simplify ASTs as well
+        self._memo_lock = threading.RLock()
+        self.memo_counters = CacheCounters()
 
     def simplify(self, op, args):
-        if op not in self._simplifiers:
+        simplifier = self._simplifiers.get(op, None)
+        if simplifier is None:
             return None
-        return self._simplifiers[op](*args)
+        return self._memoized(opcode(op), simplifier, tuple(args))
+
+    def simplify_opcode(self, code, args):
+        """
+        Like :meth:`simplify`, but dispatches on the opcode of the operation.
+        """
+        simplifier = self._simplifiers.lookup(code)
+        if simplifier is None:
+            return None
+        return self._memoized(code, simplifier, args)
+
+    def _memoized(self, code, simplifier, args):
+        if not self._memo_size:
+            return simplifier(*args)
+
+        # the arguments in each position of an operation are either always ASTs or never, so the hashes of ASTs and
+        # other arguments (such as the bounds of an Extract) cannot be confused
+        key = (code, *[getattr(a, "_hash", a) for a in args])
+        memo = self._memo
+        # the lock is not held while simplifying, since the simplifiers build (and simplify) ASTs themselves
+        lock = self._memo_lock
+        try:
+            with lock:
+                entry = memo.get(key, _MISSING)
+                if entry is not _MISSING:
+                    # either None (the operation cannot be simplified), or a reference to the simplified AST, if it
+                    # is alive
+                    r = None if entry is None else entry()
+                    if entry is None or r is not None:
+                        self.memo_counters.hits += 1
+                        memo.move_to_end(key)
+                        return r
+        except TypeError:
+            # an unhashable argument
+            return simplifier(*args)
+
+        r = simplifier(*args)
+        with lock:
+            self.memo_counters.misses += 1
+            memo[key] = None if r is None else weakref.ref(r)
+            if len(memo) > self._memo_size:
+                memo.popitem(last=False)
+                self.memo_counters.evictions += 1
+        return r
+
+    def set_memo_size(self, size: int) -> None:
+        """
+        Sets the maximum number of memoized simplification results, evicting the least recently used ones if there
+        are more. A size of 0 disables the memo.
+        """
+        with self._memo_lock:
+            self._memo_size = size
+            self.evict_memo(len(self._memo) - size)
+
+    def evict_memo(self, count: int) -> None:
+        """
+        Evicts up to `count` of the least recently used simplification results from the memo.
+        """
+        memo = self._memo
+        with self._memo_lock:
+            for _ in range(min(count, len(memo))):
+                memo.popitem(last=False)
+                self.memo_counters.evictions += 1
+
+    def sample_memo(self, count: int) -> list:
+        """
+        Returns up to `count` of the least recently used simplification results, as (key, result) pairs.
+        """
+        with self._memo_lock:
+            return list(itertools.islice(self._memo.items(), count))
+
+    def clear_memo(self) -> None:
+        """
+        Drops all memoized simplification results.
+        """
+        with self._memo_lock:
+            self._memo.clear()
 
     @staticmethod
     def _deduplicate_filter(args):
@@ -61,6 +321,7 @@ class SimplificationManager:
     # pylint:disable=inconsistent-return-statements
 
     @staticmethod
+    @_rule
     def if_simplifier(cond, if_true, if_false):
         # NOTE: this is never called; simplifications are implemented inline in the If op. why?
         if cond.is_true():
@@ -70,6 +331,7 @@ class SimplificationManager:
             return if_false
 
     @staticmethod
+    @_rule
     def concat_simplifier(*args):
         if len(args) == 1:
             return args[0]
@@ -154,6 +416,7 @@ class SimplificationManager:
         return
 
     @staticmethod
+    @_rule
     def rshift_simplifier(val, shift):
         if (shift == 0).is_true():
             return val
@@ -163,6 +426,7 @@ class SimplificationManager:
             return ast.all_operations.BVV(0, val.size())
 
     @staticmethod
+    @_rule
     def lshr_simplifier(val, shift):
         if (shift == 0).is_true():
             return val
@@ -172,6 +436,7 @@ class SimplificationManager:
             return ast.all_operations.BVV(0, val.size())
 
     @staticmethod
+    @_rule
     def lshift_simplifier(val, shift):
         if (shift == 0).is_true():
             return val
@@ -180,10 +445,15 @@ class SimplificationManager:
             return real_val << (inner_shift + shift)
 
     @staticmethod
+    @_rule
     def eq_simplifier(a, b):
         if a is b:
             return ast.true
 
+        simp = SimplificationManager.known_bits_comparison_simplifier("__eq__", a, b)
+        if simp is not None:
+            return simp
+
         if isinstance(a, ast.Bool) and b is ast.true:
             return a
         if isinstance(b, ast.Bool) and a is ast.true:
@@ -265,10 +535,15 @@ class SimplificationManager:
                     return ast.all_operations.false
 
     @staticmethod
+    @_rule
     def ne_simplifier(a, b):
         if a is b:
             return ast.false
 
+        simp = SimplificationManager.known_bits_comparison_simplifier("__ne__", a, b)
+        if simp is not None:
+            return simp
+
         if a.op == "Reverse" and b.op == "Reverse":
             return a.args[0] != b.args[0]
 
@@ -332,13 +607,19 @@ class SimplificationManager:
                     return ast.all_operations.true
 
     @staticmethod
+    @_rule
     def ge_simplifier(a, b):
+        simp = SimplificationManager.known_bits_comparison_simplifier("__ge__", a, b)
+        if simp is not None:
+            return simp
+
         # ZeroExt/Concat and comparing against a constant
         simp = SimplificationManager.zeroext_comparing_against_simplifier(operator.__ge__, a, b)
         if simp is not None:
             return simp
 
     @staticmethod
+    @_rule
     def bv_reverse_simplifier(body):
         if body.op == "Reverse":
             # Reverse(Reverse(x)) ==> x
@@ -380,6 +661,7 @@ class SimplificationManager:
                 return body.make_like(body.op, (new_hi, new_lo, x), simplify=True)
 
     @staticmethod
+    @_rule
     def boolean_and_simplifier(*args):
         if len(args) == 1:
             return args[0]
@@ -473,6 +755,7 @@ class SimplificationManager:
         return flattened
 
     @staticmethod
+    @_rule
     def boolean_or_simplifier(*args):
         if len(args) == 1:
             return args[0]
@@ -528,6 +811,7 @@ class SimplificationManager:
         )
 
     @staticmethod
+    @_rule
     def bitwise_add_simplifier(*args):
         if len(args) == 2 and args[1].op == "BVV" and args[0].op == "__sub__" and args[0].args[1].op == "BVV":
             # flatten add over sub
@@ -542,10 +826,12 @@ class SimplificationManager:
         return None
 
     @staticmethod
+    @_rule
     def bitwise_mul_simplifier(*args):
         return SimplificationManager._flatten_simplifier("__mul__", None, *args)
 
     @staticmethod
+    @_rule
     def bitwise_sub_simplifier(a, b):
         if b.op == "BVV":
             # many optimizations if b is concrete - effectively flattening
@@ -571,6 +857,7 @@ class SimplificationManager:
     # and recognize b-bit z=signedmin(q,r) from this idiom:
     # s=r-q;t=q^r;u=s^r;v=u&t;w=v^s;x=rshift(w,b-1);y=x&t;z=q^y
     @staticmethod
+    @_rule
     def bitwise_xor_simplifier_minmax(a, b):
         q, y = a, b
         if y.op != "__and__":
@@ -638,6 +925,7 @@ class SimplificationManager:
             return ast.all_operations.If(cond, q, r)
 
     @staticmethod
+    @_rule
     def bitwise_xor_simplifier(a, b, *args):
         if not args:
             if a is ast.all_operations.BVV(0, a.size()):
@@ -677,6 +965,7 @@ class SimplificationManager:
         )
 
     @staticmethod
+    @_rule
     def bitwise_or_simplifier(a, b, *args):
         if not args:
             if a is ast.all_operations.BVV(0, a.size()):
@@ -697,6 +986,7 @@ class SimplificationManager:
         )
 
     @staticmethod
+    @_rule
     def bitwise_and_simplifier(a, b, *args):
         if not args:
             # try to perform a rotate-shift-mask simplification
@@ -721,6 +1011,12 @@ class SimplificationManager:
                 return ast.all_operations.BVV(0, a.size())
             if b.op == "BVV" and b.args[0] == 0:
                 return ast.all_operations.BVV(0, a.size())
+            # x & mask  ==>  x, if the bits that the mask clears are known to be zero in x
+            for x, y in ((a, b), (b, a)):
+                if y.op == "BVV" and y.args[0] is not None:
+                    known, value = x.known_bits()
+                    if (known & ~value) | y.args[0] == 2 ** y.size() - 1:
+                        return x
             if a.op == "Concat" and len(a.args) == 2:
                 # Concat(a.args[0], a.args[1]) & b  ==>  ZeroExt(size, a.args[1])
                 # maybe we can drop the second argument
@@ -729,7 +1025,7 @@ class SimplificationManager:
                     return ast.all_operations.ZeroExt(a.args[0].size(), a.args[1])
 
             # if(cond0, 1, 0) & if(cond1, 1, 0)  ->  if(cond0 & cond1, 1, 0)
-            if a.op == "If" and b.op == "If":
+            if a.op == "If" and b.op == "If" and a.size() == 1:
                 if (
                     (a.args[1] == ast.all_operations.BVV(1, 1)).is_true()
                     and (a.args[2] == ast.all_operations.BVV(0, 1)).is_true()
@@ -749,6 +1045,7 @@ class SimplificationManager:
         )
 
     @staticmethod
+    @_rule
     def boolean_not_simplifier(body):
         if body.op == "__eq__":
             return body.args[0] != body.args[1]
@@ -786,6 +1083,7 @@ class SimplificationManager:
             return ast.all_operations.ULT(body.args[0], body.args[1])
 
     @staticmethod
+    @_rule
     def zeroext_simplifier(n, e):
         if n == 0:
             return e
@@ -795,6 +1093,7 @@ class SimplificationManager:
             return e.make_like(e.op, (n + e.args[0], e.args[1]), length=n + e.size(), simplify=True)
 
     @staticmethod
+    @_rule
     def signext_simplifier(n, e):
         if n == 0:
             return e
@@ -802,6 +1101,7 @@ class SimplificationManager:
         # TODO: if top bit is 0, do a zero-extend instead
 
     @staticmethod
+    @_rule
     def extract_simplifier(high, low, val):
         # if we're extracting the whole value, return the value
         if high - low + 1 == val.size():
@@ -810,6 +1110,12 @@ class SimplificationManager:
         if (val.op == "SignExt" or val.op == "ZeroExt") and low == 0 and high + 1 == val.args[1].size():
             return val.args[1]
 
+        # if all the extracted bits are known, return them as a constant
+        size = high - low + 1
+        known, value = val.known_bits()
+        if known >> low & (2**size - 1) == 2**size - 1:
+            return ast.all_operations.BVV(value >> low & (2**size - 1), size)
+
         if val.op == "ZeroExt":
             extending_bits = val.args[0]
             if extending_bits == 0:
@@ -915,11 +1221,13 @@ class SimplificationManager:
 
     # oh gods
     @staticmethod
+    @_rule
     def fptobv_simplifier(the_fp):
         if the_fp.op == "fpToFP" and len(the_fp.args) == 2:
             return the_fp.args[0]
 
     @staticmethod
+    @_rule
     def fptofp_simplifier(*args):
         if len(args) == 2 and args[0].op == "fpToIEEEBV":
             to_bv, sort = args
@@ -929,6 +1237,7 @@ class SimplificationManager:
                 return to_bv.args[0]
 
     @staticmethod
+    @_rule
     def rotate_shift_mask_simplifier(a, b):
         """
         Handles the following case:
@@ -985,16 +1294,37 @@ class SimplificationManager:
         return expr
 
     @staticmethod
+    @_rule
     def str_reverse_simplifier(arg):
         return arg
 
     @staticmethod
+    @_rule
     def invert_simplifier(expr):
         # ~ if(cond then 1 else 0)  ->  if(cond, ~1, ~0)  ->    if(!cond, 1,0)
         if expr.op == "If" and expr.args[1].op == "BVV" and expr.args[1].args[0] == 1 and expr.args[2].args[0] == 0:
             return ast.bool.If(ast.all_operations.Not(expr.args[0]), expr.args[1], expr.args[2])
 
     @staticmethod
+    @_rule
+    def known_bits_comparison_simplifier(op, a, b):
+        """
+        This simplifier folds comparisons whose result follows from the bits of both sides that are known (see
+        :mod:`claripy.known_bits`), such as
+
+            (A & 0xf0) == 1, and
+            ZeroExt(24, A) < 0x100
+
+        Comparisons that hold for any value of one side (such as A >= 0) are left alone, since the balancer relies on
+        them to bound the values of A.
+        """
+        r = known_bits.known_comparison(op, a, b, trivial=False)
+        if r is None:
+            return None
+        return ast.all_operations.true if r else ast.all_operations.false
+
+    @staticmethod
+    @_rule
     def and_mask_comparing_against_constant_simplifier(op, a, b):
         """
         This simplifier handles the following case:
@@ -1053,6 +1383,7 @@ class SimplificationManager:
         return None
 
     @staticmethod
+    @_rule
     def zeroext_extract_comparing_against_constant_simplifier(op, a, b):
         """
         This simplifier handles the following cases:
@@ -1099,6 +1430,7 @@ class SimplificationManager:
         return None
 
     @staticmethod
+    @_rule
     def zeroext_comparing_against_simplifier(op, a, b):
         """
         This simplifier handles the following cases:
@@ -1158,9 +1490,19 @@ flattenable = {
 }
 
 from .backend_manager import backends
+from .errors import ClaripyValueError
+from .operations import OpcodeDict, opcode
 from . import ast
 from . import fp
-
+from . import known_bits
 
 # the actual instance
 simpleton = SimplificationManager()
+
+
+def set_simplification_cache_size(size: int) -> None:
+    """
+    Sets the number of simplification results that are memoized (see :class:`SimplificationManager`). A size of 0
+    disables the memo.
+    """
+    simpleton.set_memo_size(size)
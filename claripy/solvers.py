@@ -16,8 +16,8 @@ class Solver(
     frontend_mixins.SimplifyHelperMixin,
     frontends.FullFrontend,
 ):
-    def __init__(self, backend=backends.z3, **kwargs):
-        super().__init__(backend, **kwargs)
+    def __init__(self, backend=None, **kwargs):
+        super().__init__(backends.z3 if backend is None else backend, **kwargs)
 
 
 class SolverCacheless(
@@ -29,8 +29,8 @@ class SolverCacheless(
     frontend_mixins.SimplifySkipperMixin,
     frontends.FullFrontend,
 ):
-    def __init__(self, backend=backends.z3, **kwargs):
-        super().__init__(backend, **kwargs)
+    def __init__(self, backend=None, **kwargs):
+        super().__init__(backends.z3 if backend is None else backend, **kwargs)
 
 
 class SolverReplacement(
@@ -124,8 +124,8 @@ class SolverCompositeChild(
     frontend_mixins.ModelCacheMixin,
     frontends.FullFrontend,
 ):
-    def __init__(self, backend=backends.z3, **kwargs):
-        super().__init__(backend, **kwargs)
+    def __init__(self, backend=None, **kwargs):
+        super().__init__(backends.z3 if backend is None else backend, **kwargs)
 
     def __repr__(self):
         return "<SolverCompositeChild with %d variables>" % len(self.variables)
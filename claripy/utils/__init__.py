@@ -1,2 +1,4 @@
 from .deprecated import deprecated
 from .orderedset import OrderedSet
+from .hashconscache import HashConsCache
+from .cachecounters import CacheCounters, CountedWeakKeyDictionary, CountedWeakValueDictionary
@@ -0,0 +1,77 @@
+import itertools
+import sys
+import weakref
+
+
+class CacheCounters:
+    """
+    Hit, miss and eviction counters of a cache. Like those of `HashConsCache`, the counters are not synchronized, and
+    may miss some updates under concurrent use.
+    """
+
+    __slots__ = ("hits", "misses", "evictions")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def reset_counters(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class CountedWeakKeyDictionary(weakref.WeakKeyDictionary):
+    """
+    A `WeakKeyDictionary` with `CacheCounters`, which are updated by its users.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counters = CacheCounters()
+
+
+class CountedWeakValueDictionary(weakref.WeakValueDictionary):
+    """
+    A `WeakValueDictionary` with `CacheCounters`, which are updated by its users.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counters = CacheCounters()
+
+
+# the memory that a dict slot and a weak reference take, roughly
+_ENTRY_OVERHEAD = 104
+# the number of entries that are looked at to estimate the size of a cache
+SIZE_SAMPLE = 64
+
+
+def entry_size(key, value) -> int:
+    """
+    Estimates the memory that a cache entry takes on the Python heap: the entry itself, its key and its value, and the
+    elements of keys and values that are tuples, as well as the arguments of values that are ASTs. Memory that is held
+    by native libraries (such as the terms of a solver) is not included.
+    """
+    size = _ENTRY_OVERHEAD + sys.getsizeof(key) + sys.getsizeof(value)
+    for obj in (key, value):
+        if type(obj) is tuple:
+            size += sum(sys.getsizeof(o) for o in obj)
+    args = getattr(value, "args", None)
+    if type(args) is tuple:
+        size += sys.getsizeof(args)
+    return size
+
+
+def approximate_bytes(items, count: int) -> int:
+    """
+    Estimates the memory that the `count` entries of a cache take, from a sample of its items.
+
+    :param items:   An iterable of (key, value) pairs of the cache. At most `SIZE_SAMPLE` of them are looked at.
+    :param count:   The number of entries of the cache.
+    """
+    sample = list(itertools.islice(items, SIZE_SAMPLE))
+    if not sample:
+        return 0
+    return round(sum(entry_size(k, v) for k, v in sample) / len(sample) * count)
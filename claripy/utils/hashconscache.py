@@ -0,0 +1,289 @@
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+
+
+class _Shard:
+    """
+    One stripe of a `HashConsCache`: a weak tier, a strong LRU tier, the lock that guards both and the counters.
+    """
+
+    __slots__ = ("lock", "weak", "strong", "strong_size", "hits", "misses", "evictions")
+
+    def __init__(self):
+        # reentrant, since a finalizer that runs during a garbage collection triggered while the lock is held might
+        # build ASTs as well
+        self.lock = threading.RLock()
+        self.weak = weakref.WeakValueDictionary()
+        self.strong = OrderedDict()
+        self.strong_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def touch(self, key, value):
+        # must be called with the lock held
+        strong = self.strong
+        if key in strong:
+            strong.move_to_end(key)
+        else:
+            strong[key] = value
+            if len(strong) > self.strong_size:
+                strong.popitem(last=False)
+                self.evictions += 1
+
+
+class HashConsCache:
+    """
+    The cache that hash-conses ASTs.
+
+    Entries are held in two tiers. Every entry lives in a weak tier (a `WeakValueDictionary`), which only keeps it
+    around for as long as something else refers to it. In front of it, an optional, bounded tier of strong references
+    keeps the most recently used entries alive in LRU order. This way, expressions that are repeatedly thrown away and
+    rebuilt do not have to be re-initialized every time, while the memory that is used to keep them alive stays bounded.
+
+    The strong tier is disabled (i.e., its size is 0) by default.
+
+    The cache is safe to use from multiple threads. It is split into a power-of-two number of shards, selected by the
+    low bits of the hash of the key, and every shard is guarded by its own lock, so that threads that build unrelated
+    ASTs rarely contend. Lookups do not take the lock (reading a dict is atomic), only updates of a shard do. With more
+    than one shard, the strong tier is split evenly between the shards, and the LRU order is maintained per shard. Use
+    `setdefault()` to insert entries, so that two threads that build the same AST at the same time end up with the same
+    object. The hit and miss counters are not synchronized, and may miss some lookups under concurrent use.
+    """
+
+    __slots__ = ("_shards", "_shard_mask", "_strong_size", "_frozen")
+
+    def __init__(self, strong_size: int = 0, shards: int = 1):
+        """
+        :param strong_size: The maximum number of entries in the strong LRU tier.
+        :param shards:      The number of shards. Must be a power of two.
+        """
+        if shards < 1 or shards & (shards - 1):
+            raise ClaripyValueError("The number of shards must be a power of two")
+        self._shards = tuple(_Shard() for _ in range(shards))
+        self._shard_mask = shards - 1
+        self._strong_size = 0
+        self._frozen = ()
+        self.resize(strong_size)
+
+    def _shard(self, key) -> _Shard:
+        return self._shards[hash(key) & self._shard_mask]
+
+    @property
+    def shards(self) -> int:
+        return len(self._shards)
+
+    @property
+    def strong_size(self) -> int:
+        return self._strong_size
+
+    def resize(self, strong_size: int) -> None:
+        """
+        Sets the maximum number of entries in the strong LRU tier, evicting the least recently used entries if there
+        are too many. A size of 0 disables the strong tier.
+        """
+        if strong_size < 0:
+            raise ClaripyValueError("The size of the strong tier cannot be negative")
+        self._strong_size = strong_size
+        shard_size = -(-strong_size // len(self._shards))
+        for shard in self._shards:
+            with shard.lock:
+                shard.strong_size = shard_size
+                strong = shard.strong
+                while len(strong) > shard_size:
+                    strong.popitem(last=False)
+                    shard.evictions += 1
+
+    def get(self, key, default=None):
+        """
+        Looks up an entry, and counts the lookup as a hit or a miss. On a hit, the entry becomes the most recently
+        used entry of the strong tier.
+        """
+        shard = self._shards[hash(key) & self._shard_mask]
+        value = shard.weak.get(key, None)
+        if value is None:
+            shard.misses += 1
+            return default
+
+        shard.hits += 1
+        if shard.strong_size:
+            with shard.lock:
+                shard.touch(key, value)
+        return value
+
+    def peek(self, key, default=None):
+        """
+        Looks up an entry without counting the lookup and without touching the LRU order.
+        """
+        value = self._shards[hash(key) & self._shard_mask].weak.get(key, None)
+        return default if value is None else value
+
+    def setdefault(self, key, value):
+        """
+        Inserts an entry, unless there already is one for the key. Either way, the entry for the key is returned (and
+        becomes the most recently used entry of the strong tier).
+        """
+        shard = self._shards[hash(key) & self._shard_mask]
+        with shard.lock:
+            existing = shard.weak.get(key, None)
+            if existing is None:
+                shard.weak[key] = value
+            else:
+                value = existing
+            if shard.strong_size:
+                shard.touch(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        shard = self._shards[hash(key) & self._shard_mask]
+        with shard.lock:
+            shard.weak[key] = value
+            if shard.strong_size:
+                shard.strong.pop(key, None)
+                shard.touch(key, value)
+
+    def __getitem__(self, key):
+        return self._shards[hash(key) & self._shard_mask].weak[key]
+
+    def __delitem__(self, key):
+        shard = self._shards[hash(key) & self._shard_mask]
+        with shard.lock:
+            shard.strong.pop(key, None)
+            del shard.weak[key]
+
+    def __contains__(self, key):
+        return key in self._shards[hash(key) & self._shard_mask].weak
+
+    def __len__(self):
+        return sum(len(shard.weak) for shard in self._shards)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        """
+        Returns a snapshot of the keys of all entries.
+        """
+        keys = []
+        for shard in self._shards:
+            with shard.lock:
+                keys.extend(shard.weak.keys())
+        return keys
+
+    def values(self):
+        """
+        Returns a snapshot of all entries.
+        """
+        values = []
+        for shard in self._shards:
+            with shard.lock:
+                values.extend(shard.weak.values())
+        return values
+
+    def items(self):
+        """
+        Returns a snapshot of the keys and values of all entries.
+        """
+        items = []
+        for shard in self._shards:
+            with shard.lock:
+                items.extend(shard.weak.items())
+        return items
+
+    def sample(self, n: int):
+        """
+        Returns up to `n` (key, value) pairs, taken evenly from the shards.
+        """
+        per_shard = -(-n // len(self._shards))
+        items = []
+        for shard in self._shards:
+            with shard.lock:
+                items.extend(itertools.islice(shard.weak.items(), per_shard))
+            if len(items) >= n:
+                break
+        return items[:n]
+
+    @property
+    def strong_count(self) -> int:
+        """
+        The number of entries that are currently held by the strong tier.
+        """
+        return sum(len(shard.strong) for shard in self._shards)
+
+    @property
+    def hits(self) -> int:
+        return sum(shard.hits for shard in self._shards)
+
+    @property
+    def misses(self) -> int:
+        return sum(shard.misses for shard in self._shards)
+
+    @property
+    def evictions(self) -> int:
+        return sum(shard.evictions for shard in self._shards)
+
+    def evict(self, count: int) -> int:
+        """
+        Drops up to `count` of the least recently used entries from the strong tier, spread evenly over the shards,
+        without changing its size.
+
+        :returns:   The number of entries that were dropped.
+        """
+        per_shard = -(-count // len(self._shards))
+        evicted = 0
+        for shard in self._shards:
+            with shard.lock:
+                strong = shard.strong
+                for _ in range(min(per_shard, len(strong), count - evicted)):
+                    strong.popitem(last=False)
+                    shard.evictions += 1
+                    evicted += 1
+        return evicted
+
+    def clear_strong(self) -> None:
+        """
+        Drops all strong references. Entries stay in the cache for as long as they are referenced elsewhere.
+        """
+        for shard in self._shards:
+            with shard.lock:
+                shard.strong.clear()
+
+    def clear(self) -> None:
+        self._frozen = ()
+        for shard in self._shards:
+            with shard.lock:
+                shard.strong.clear()
+                shard.weak.clear()
+
+    def freeze(self) -> None:
+        """
+        Pins all current entries: they are kept alive (outside of the strong tier, so they are never evicted) until
+        the cache is cleared. This is meant to be used before forking, so that the entries that the parent process
+        has built stay shared with the children.
+        """
+        # everything that was frozen before is still in the cache
+        self._frozen = tuple(self.values())
+
+    @property
+    def frozen_count(self) -> int:
+        """
+        The number of entries that are pinned by `freeze()`.
+        """
+        return len(self._frozen)
+
+    def _after_fork_in_child(self) -> None:
+        # the locks might have been held by threads that do not exist in the child
+        for shard in self._shards:
+            shard.lock = threading.RLock()
+
+    def reset_counters(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                shard.hits = 0
+                shard.misses = 0
+                shard.evictions = 0
+
+
+from ..errors import ClaripyValueError
@@ -0,0 +1,38 @@
+import claripy
+
+OPERATORS = ("+", "-", "*", "&", "|", "^", "~", "neg", "extract", "sext", "if", "shift", "rotate")
+
+
+def random_expression(rng, variables, depth, operators=OPERATORS):
+    """
+    Builds a random expression over the given 8-bit variables, with up to `depth` nested operations that are chosen
+    from `operators`.
+    """
+    if depth == 0 or rng.random() < 0.2:
+        if rng.random() < 0.6:
+            return rng.choice(variables)
+        return claripy.BVV(rng.choice([0, 1, 0x80, 0xFF, rng.randrange(256)]), 8)
+
+    op = rng.choice(operators)
+    a = random_expression(rng, variables, depth - 1, operators)
+    if op == "~":
+        return ~a
+    if op == "neg":
+        return -a
+    if op == "extract":
+        low = rng.randrange(8)
+        high = rng.randrange(low, 8)
+        return claripy.ZeroExt(7 - high + low, a[high:low])
+    if op == "sext":
+        low = rng.randrange(8)
+        return claripy.SignExt(low, a[7 - low : 0])
+    amount = rng.randrange(10)
+    if op == "shift":
+        return rng.choice([claripy.LShR, lambda a, b: a << b, lambda a, b: a >> b])(a, amount)
+    if op == "rotate":
+        return rng.choice([claripy.RotateLeft, claripy.RotateRight])(a, amount)
+    b = random_expression(rng, variables, depth - 1, operators)
+    if op == "if":
+        cond = rng.choice([a == b, claripy.ULT(a, b), claripy.SLE(a, b)])
+        return claripy.If(cond, random_expression(rng, variables, depth - 1, operators), b)
+    return {"+": a + b, "-": a - b, "*": a * b, "&": a & b, "|": a | b, "^": a ^ b}[op]
@@ -0,0 +1,108 @@
+import gc
+
+import claripy
+from claripy.ast.arena import ASTArena
+
+
+def test_arena_roundtrip():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+    shared = x + y
+    e = claripy.If(shared == 0, shared * 2, claripy.Extract(15, 0, shared).zero_extend(16))
+
+    arena = ASTArena()
+    idx = arena.add(e)
+
+    # every unique node is stored exactly once
+    assert len(arena) == len({id(a) for a in e.children_asts()} | {id(e)})
+    assert arena.add(e) == idx
+    assert arena.add(shared) < idx
+
+    node = arena[idx]
+    assert node.op == "If"
+    assert node.depth == e.depth
+    assert node.length == 32
+    assert node.symbolic
+    assert node.variables == e.variables
+    assert node.args[0].op == "__eq__"
+    assert node.args[0].length is None
+
+    assert arena.to_ast(idx) is e
+    assert node.to_ast() is e
+
+
+def test_arena_rebuild():
+    arena = ASTArena()
+    x = claripy.BVS("arena_x", 8, uninitialized=True)
+    idx = arena.add((x + 1).union(x) & 3)
+    expected = repr(arena.to_ast(idx))
+    variables = arena.variables(idx)
+
+    del x
+    gc.collect()
+
+    rebuilt = arena.to_ast(idx)
+    assert repr(rebuilt) == expected
+    assert rebuilt.variables == variables
+    assert len(variables) == 2
+    assert next(a for a in rebuilt.leaf_asts() if a.op == "BVS").uninitialized is True
+
+
+def test_arena_annotations():
+    class Anno(claripy.Annotation):
+        pass
+
+    class Uneliminatable(claripy.Annotation):
+        @property
+        def eliminatable(self):
+            return False
+
+        @property
+        def relocatable(self):
+            return False
+
+    anno = Anno()
+    x = claripy.BVS("x", 32).annotate(anno)
+    arena = ASTArena()
+    idx = arena.add(x + 1)
+    assert arena[idx].args[0].annotations == (anno,)
+    assert arena.to_ast(idx).args[0].annotations == (anno,)
+
+    # the uneliminatable annotations of the children are kept when the ASTs are rebuilt
+    uneliminatable = Uneliminatable()
+    y = claripy.BVS("y", 32).annotate(uneliminatable)
+    e = y - 1
+    assert e._uneliminatable_annotations == {uneliminatable}
+    idx = arena.add(e)
+    del y, e
+    gc.collect()
+    assert arena.to_ast(idx)._uneliminatable_annotations == {uneliminatable}
+
+
+def test_arena_relocated_annotations():
+    class Reloc(claripy.Annotation):
+        @property
+        def eliminatable(self):
+            return False
+
+        @property
+        def relocatable(self):
+            return True
+
+    anno = Reloc()
+    x = claripy.BVS("x", 32).annotate(anno)
+    shared = (x + 1) * 3
+    e = claripy.If(shared == 0, shared.annotate(Reloc()), x)
+    assert shared.annotations == (anno,)
+
+    arena = ASTArena()
+    idx = arena.add(e)
+    assert arena.to_ast(idx) is e
+    assert arena.to_ast(arena.add(shared)) is shared
+
+
+if __name__ == "__main__":
+    test_arena_roundtrip()
+    test_arena_rebuild()
+    test_arena_annotations()
+    test_arena_relocated_annotations()
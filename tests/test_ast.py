@@ -1,4 +1,9 @@
+import random
+import statistics
+import sys
+
 import claripy
+from claripy.ast.visitor import DAGVisitor, DESCEND
 
 
 def test_lite_repr():
@@ -31,6 +36,176 @@ def test_associativity():
     assert (x * (y / (z % w))).shallow_repr() == "<BV8 x * (y / (z % w))>"
 
 
+def test_variable_set_interning():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+
+    # the union does not grow: the child's set is reused
+    e = (x + 1) * 3
+    assert e.variables is x.variables
+    assert (x + x).variables is x.variables
+
+    # equal variable sets are shared between unrelated nodes
+    a = x + y
+    b = claripy.Concat(y, x)
+    assert a.variables == {x.args[0], y.args[0]}
+    assert a.variables is b.variables
+    assert (a - b[31:0]).variables is a.variables
+
+    # explicitly passed variable sets are interned as well
+    assert claripy.BVV(1, 32).variables is claripy.BoolV(True).variables
+    assert not claripy.BVV(1, 32).variables
+
+
+def test_hash_first_construction():
+    claripy.ast.base.set_hash_first(True)
+    try:
+        x = claripy.BVS("x", 32)
+        y = claripy.BVS("y", 32)
+
+        a = (x + y) * 2
+        b = (x + y) * 2
+        assert a is b
+        assert a.variables == x.variables | y.variables
+        assert a.symbolic
+        assert a.depth == 3
+
+        # unions introduce a new variable each time, so they must not be merged
+        assert x.union(y) is not x.union(y)
+
+        class Anno(claripy.Annotation):
+            @property
+            def eliminatable(self):
+                return False
+
+            @property
+            def relocatable(self):
+                return True
+
+        anno = Anno()
+        c = x.annotate(anno) + 1
+        assert c.annotations == (anno,)
+        assert c is not x + 1
+        assert c._apply_to_annotations(lambda annos: annos) is c
+    finally:
+        claripy.ast.base.set_hash_first(False)
+
+
+def test_opcodes():
+    ops = claripy.operations
+    x = claripy.BVS("x", 32)
+    e = x + 1
+
+    assert e.opcode == ops.opcode("__add__")
+    assert ops.opcode_names[e.opcode] == e.op
+    assert x.is_leaf() and claripy.BVV(1, 32).is_leaf() and not e.is_leaf()
+
+    table = ops.OpcodeDict({"__add__": "add"})
+    table["never_seen_before_op"] = "new"
+    assert table.lookup(e.opcode) == "add"
+    assert table.lookup(ops.opcode("never_seen_before_op")) == "new"
+    assert table.lookup(x.opcode) is None
+    del table["__add__"]
+    assert table.lookup(e.opcode) is None and "__add__" not in table
+
+
+def test_dag_visitor():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+
+    # a DAG with 2**60 paths through it
+    e = x
+    for _ in range(60):
+        e = (e + y) * (e - y)
+
+    visited = []
+    count = DAGVisitor(lambda n, args: visited.append(n) or 1 + sum(a for a in args if type(a) is int)).walk(e)
+    assert len(visited) == len({id(n) for n in visited}) == e.dag_size()
+    assert count > 2**60
+
+    # subtrees without y are cut off, and arguments are visited from left to right
+    order = []
+
+    def pre(n):
+        order.append(n)
+        return n if y.variables.isdisjoint(n.variables) else DESCEND
+
+    DAGVisitor(lambda n, args: n, pre=pre).walk(x + y)
+    assert order == [x + y, x, y]
+
+    # exceptions leave the visitor usable
+    def failing(n, args):
+        if n.op == "BVS" and n is y:
+            raise ValueError()
+        return n
+
+    visitor = DAGVisitor(failing)
+    try:
+        visitor.walk(x * (x + y))
+        assert False
+    except ValueError:
+        pass
+    assert visitor.pending() == [x * (x + y), x + y]
+    assert visitor.walk(x) is x
+
+
+def test_deep_ast_traversals():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+    # two chains that only differ in an annotation at the very bottom
+    e = x ^ y
+    f = (x ^ y).annotate(claripy.SimplificationAvoidanceAnnotation())
+    for i in range(2 * sys.getrecursionlimit()):
+        v = claripy.BVS("v%d" % i, 32)
+        e = claripy.LShR(e, y) ^ v
+        f = claripy.LShR(f, y) ^ v
+
+    assert len(list(e.leaf_asts())) == 2 * sys.getrecursionlimit() + 2
+    assert e is not f and e.structurally_match(f)
+    assert not e.structurally_match(claripy.LShR(f, y))
+    r = e.replace(x, y)
+    assert r is not e and x.variables.isdisjoint(r.variables)
+    assert e.canonicalize()[-1] is e.canonicalize()[-1]
+    assert claripy.backends.z3.convert(e) is not None
+
+
+def test_dag_size():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+    assert x.tree_size == x.dag_size() == x.dag_size_estimate == 1
+
+    # every step shares the previous expression between two operands
+    e = x
+    for i in range(1, 41):
+        e = (e + y) * (e - y)
+        assert e.depth <= e.dag_size_estimate <= e.tree_size
+        assert e.dag_size() == 2 + 3 * i
+        assert e.tree_size == 6 * 2**i - 5
+    assert e.dag_size_estimate == e.dag_size()
+
+    # the estimate is built up at construction time, and is usually within 30% of the exact size
+    errors = []
+    for seed in range(20):
+        rng = random.Random(seed)
+        pool = [claripy.BVS("v", 32) for _ in range(8)]
+        for _ in range(300):
+            pool.append(rng.choice(pool[-16:]) + rng.choice(pool) * 3)
+        estimate = pool[-1].dag_size_estimate
+        exact = pool[-1].dag_size()
+        assert exact > 100
+        errors.append(abs(estimate - exact) / exact)
+    assert statistics.median(errors) < 0.3
+    # annotating a node does not change its size
+    annotated = pool[-1].annotate(claripy.SimplificationAvoidanceAnnotation())
+    assert annotated.tree_size == pool[-1].tree_size
+
+
 if __name__ == "__main__":
     test_lite_repr()
     test_associativity()
+    test_variable_set_interning()
+    test_hash_first_construction()
+    test_opcodes()
+    test_dag_visitor()
+    test_deep_ast_traversals()
+    test_dag_size()
@@ -0,0 +1,53 @@
+import threading
+
+import claripy
+
+
+def test_stats():
+    claripy.reset_stats()
+    x = claripy.BVS("x", 32)
+    s = claripy.Solver()
+    s.add(x > 3)
+    assert len(s.eval(x, 2)) == 2
+    # answered from the cached models
+    assert len(s.eval(x, 1)) == 1
+
+    stats = claripy.stats()
+    for name in ("ast.hash_cache", "ast.leaf_cache", "ast.bvv_cache", "z3.object_cache", "frontends.model_cache"):
+        assert set(stats[name]) == {"entries", "bytes", "hits", "misses", "evictions"}
+    assert stats["ast.hash_cache"]["entries"] > 0 and stats["ast.hash_cache"]["bytes"] > 0
+    assert stats["z3.object_cache"]["misses"] > 0
+    assert stats["frontends.model_cache"]["entries"] >= 2 and stats["frontends.model_cache"]["hits"] >= 1
+
+    # converting the same expression again is a hit
+    hits = stats["z3.object_cache"]["hits"]
+    claripy.backends.z3.convert(x > 3)
+    assert claripy.stats()["z3.object_cache"]["hits"] == hits + 1
+
+    claripy.reset_stats()
+    stats = claripy.stats()
+    assert all(s["hits"] == s["misses"] == s["evictions"] == 0 for s in stats.values())
+    assert stats["ast.hash_cache"]["entries"] > 0
+
+
+def test_stats_per_thread():
+    x = claripy.BVS("x", 32)
+
+    def worker():
+        claripy.backends.z3.convert(x + 1)
+
+    t = threading.Thread(target=worker, name="stats-worker")
+    t.start()
+    t.join()
+    claripy.backends.z3.convert(x + 1)
+
+    stats = claripy.stats(per_thread=True)["z3.object_cache"]
+    threads = stats["threads"]
+    assert "stats-worker" in threads and threading.current_thread().name in threads
+    assert stats["entries"] == sum(s["entries"] for s in threads.values())
+    assert "threads" not in claripy.stats()["z3.object_cache"]
+
+
+if __name__ == "__main__":
+    test_stats()
+    test_stats_per_thread()
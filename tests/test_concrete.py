@@ -1,4 +1,8 @@
+import itertools
+import random
+
 import claripy
+from claripy.folding import set_constant_folding
 
 
 def test_concrete():
@@ -27,6 +31,90 @@ def test_concrete_fp():
     assert claripy.backends.concrete.eval(f, 2) == (1.0,)
 
 
+def _fold_both_ways(func, *args):
+    results = []
+    for enabled in (True, False):
+        set_constant_folding(enabled)
+        try:
+            results.append(func(*args))
+        except claripy.ClaripyError as e:
+            results.append(type(e))
+        finally:
+            set_constant_folding(True)
+    return results
+
+
+def test_constant_folding():
+    rng = random.Random(0)
+    binary_ops = [
+        lambda a, b: a + b,
+        lambda a, b: a - b,
+        lambda a, b: a * b,
+        lambda a, b: a & b,
+        lambda a, b: a | b,
+        lambda a, b: a ^ b,
+        lambda a, b: a // b,
+        lambda a, b: a % b,
+        lambda a, b: a == b,
+        lambda a, b: a != b,
+        claripy.SDiv,
+        claripy.SMod,
+        claripy.RotateLeft,
+        claripy.RotateRight,
+        claripy.ULT,
+        claripy.ULE,
+        claripy.UGT,
+        claripy.UGE,
+        claripy.SLT,
+        claripy.SLE,
+        claripy.SGT,
+        claripy.SGE,
+        claripy.Concat,
+        lambda a, b: claripy.If(a == b, a, b),
+    ]
+    shift_ops = [lambda a, b: a << b, lambda a, b: a >> b, claripy.LShR]
+    unary_ops = [
+        lambda a: ~a,
+        lambda a: -a,
+        claripy.Reverse,
+        lambda a: a[a.size() - 1 : 0],
+        lambda a: a[a.size() // 2 : a.size() // 3],
+        lambda a: claripy.ZeroExt(7, a),
+        lambda a: claripy.SignExt(7, a),
+    ]
+
+    for bits in (1, 8, 13, 64):
+        top = (1 << bits) - 1
+        values = [0, 1, 2, top, top >> 1, (top >> 1) + 1, bits, bits + 1] + [rng.getrandbits(bits) for _ in range(2)]
+        bvvs = [claripy.BVV(v, bits) for v in values]
+        for a, b in itertools.product(bvvs, repeat=2):
+            # the concrete backend builds the whole shifted int, so keep the shift amounts small for it
+            for op in binary_ops + (shift_ops if b.args[0] <= 128 else []):
+                folded, evaluated = _fold_both_ways(op, a, b)
+                assert folded is evaluated, (op, a, b, folded, evaluated)
+        for a in bvvs:
+            for op in unary_ops:
+                folded, evaluated = _fold_both_ways(op, a)
+                assert folded is evaluated, (op, a, folded, evaluated)
+
+    bools = [claripy.true, claripy.false]
+    for a, b in itertools.product(bools, repeat=2):
+        for op in (claripy.And, claripy.Or, lambda a, b: a == b, lambda a, b: a != b, lambda a, b: claripy.Not(a)):
+            folded, evaluated = _fold_both_ways(op, a, b)
+            assert folded is evaluated, (op, a, b, folded, evaluated)
+
+    # large shift amounts do not have to be materialized
+    assert claripy.BVV(1, 64) << claripy.BVV(2**64 - 1, 64) is claripy.BVV(0, 64)
+    assert claripy.BVV(2**63, 64) >> claripy.BVV(2**64 - 1, 64) is claripy.BVV(2**64 - 1, 64)
+
+    # symbolic and annotated arguments are left alone
+    x = claripy.BVS("x", 32)
+    assert (x + 1).op == "__add__"
+    one = claripy.BVV(1, 32).annotate(claripy.SimplificationAvoidanceAnnotation())
+    assert (one + 1).op == "__add__"
+
+
 if __name__ == "__main__":
     test_concrete()
     test_concrete_fp()
+    test_constant_folding()
@@ -0,0 +1,90 @@
+import random
+
+import claripy
+from claripy.egraph import EGraph, egraph_simplify
+from common_random_expressions import random_expression
+
+
+def assert_equivalent(a, b):
+    assert not claripy.Solver().satisfiable([a != b])
+
+
+def test_egraph_rewrites():
+    a, b, c = (claripy.BVS(name, 32) for name in "abc")
+    cond = claripy.BoolS("cond")
+
+    cases = [
+        # cancellation across reassociation
+        ((a + b) - a, b),
+        ((a ^ c) ^ (b ^ a), b ^ c),
+        ((a & ~a) | b, b),
+        # extractions of concatenations and extensions
+        (claripy.Concat(a, b)[47:16][31:16], a[15:0]),
+        (claripy.Concat(a[31:16], a[15:0]), a),
+        (claripy.ZeroExt(32, a)[63:32], claripy.BVV(0, 32)),
+        # conditionals
+        (claripy.If(claripy.Not(cond), a, b), claripy.If(cond, b, a)),
+        (claripy.If(cond, a - a, a + b - b), claripy.If(cond, claripy.BVV(0, 32), a)),
+    ]
+    for expr, expected in cases:
+        r = egraph_simplify(expr)
+        assert_equivalent(expr, r)
+        assert r.tree_size <= expected.tree_size, (expr, r)
+
+    # expressions that cannot be made smaller are returned as they are
+    e = a * b + c
+    assert egraph_simplify(e) is e
+    assert egraph_simplify(a) is a
+
+
+def test_egraph_annotations():
+    class Annotation(claripy.Annotation):
+        @property
+        def eliminatable(self):
+            return False
+
+        @property
+        def relocatable(self):
+            return False
+
+    a, b = claripy.BVS("a", 32), claripy.BVS("b", 32)
+    annotated = (a + b).annotate(Annotation())
+    # annotated subexpressions are left alone
+    e = (annotated - a) + a
+    r = egraph_simplify(e)
+    assert r is annotated
+    assert egraph_simplify(annotated - a) is annotated - a
+
+
+def test_egraph_budget():
+    x = claripy.BVS("x", 64)
+    e = x
+    for i in range(50):
+        e = claripy.Concat(e[31:0], e[63:32]) + i
+
+    g = EGraph(node_limit=200)
+    root = g.add(e)
+    assert not g.saturate()
+    assert len(g) >= 200
+    assert_equivalent(g.extract(root), e)
+
+    r = egraph_simplify(e, node_limit=200, time_limit=0.5)
+    assert r.tree_size <= e.tree_size
+    assert_equivalent(r, e)
+
+
+def test_egraph_random():
+    rng = random.Random(0x5EED)
+    variables = [claripy.BVS(name, 8) for name in "xyz"]
+    for _ in range(100):
+        e = random_expression(rng, variables, 5, ("+", "-", "&", "|", "^", "~", "extract", "if", "shift"))
+        r = egraph_simplify(e)
+        assert r.tree_size <= e.tree_size
+        assert_equivalent(r, e)
+
+
+if __name__ == "__main__":
+    test_egraph_rewrites()
+    test_egraph_annotations()
+    test_egraph_budget()
+    test_egraph_random()
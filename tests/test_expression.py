@@ -1,5 +1,6 @@
 # pylint: disable= [no-self-use, missing-class-docstring]
 
+import sys
 import unittest
 
 import claripy
@@ -229,6 +230,29 @@ class TestExpression(unittest.TestCase):
         iiii = claripy.If(x > 10, (x * 3 + 2) + 0x20, (x * 4 + 2) + 0x10)
         self.assertIs(iii.ite_excavated, iiii)
 
+    def test_ite_deep(self):
+        x = claripy.BVS("x", 32)
+        y = claripy.BVS("y", 32)
+        depth = sys.getrecursionlimit() + 100
+
+        # merged-state style If chains
+        e = x
+        for i in range(depth):
+            e = claripy.If(x == i, e, y + i) + 1
+        excavated = e.ite_excavated
+        self.assertEqual(excavated.op, "If")
+        self.assertIs(e.ite_excavated, excavated)
+        self.assertIs(excavated.args[2], y + (depth - 1) + 1)
+
+        # every level refers to the level below twice
+        d = x
+        for i in range(depth):
+            d = claripy.LShR(d, y) ^ claripy.If(x == i, d, y)
+        burrowed = d.ite_burrowed
+        self.assertIs(d.ite_burrowed, burrowed)
+        self.assertIs(burrowed.ite_burrowed, burrowed)
+        self.assertIs(d.ite_excavated.ite_excavated, d.ite_excavated)
+
     def test_ite_Solver(self):
         self.raw_ite(claripy.Solver)
 
@@ -394,6 +418,54 @@ class TestExpression(unittest.TestCase):
         assert frozenset.union(*[a.variables for a in y2.recursive_leaf_asts]) == two_names
         assert y1.canonicalize()[-1] is y2.canonicalize()[-1]
 
+        # the canonical names are given out in the order of leaf_asts()
+        x = claripy.BVS("x", 32, explicit_name=True)
+        y = claripy.BVS("y", 32, explicit_name=True)
+        b = claripy.BoolS("b", explicit_name=True)
+        e = claripy.If(claripy.And(b, x > y), (x + y) * x, y - 1)
+        assert [str(a) for a in e.leaf_asts()] == ["<BV32 0x1>", "<BV32 y>", "<BV32 x>", "<Bool BoolS(b)>"]
+        var_map, _, canonical = e.canonicalize()
+        assert [var_map[v.cache_key].args[0] for v in (y, x, b)] == ["canonical_0", "canonical_1", "canonical_2"]
+        assert canonical.variables == {"canonical_0", "canonical_1", "canonical_2"}
+
+        # children_asts() returns every occurrence of shared children
+        s = (x + y) * (x + y)
+        assert len(list(s.children_asts())) == 6
+        assert s.dbg_is_looped() is x + y
+
+    def test_canonical_form(self):
+        x = claripy.BVS("x", 32)
+        y = claripy.BVS("y", 32)
+        a = claripy.BVS("a", 32)
+        b = claripy.BVS("b", 32)
+
+        e1 = claripy.If(x > y, (x + y) * x, y - 1)
+        e2 = claripy.If(a > b, (a + b) * a, b - 1)
+        h1, names1 = e1.canonical_form()
+        h2, names2 = e2.canonical_form()
+        assert h1 == h2 and e1.canonical_hash == h1
+        assert names1 == (x.args[0], y.args[0]) and names2 == (a.args[0], b.args[0])
+        assert e1.canonicalize()[-1].canonical_hash == h1
+
+        # the variables have to be shared in the same way, and the rest of the structure has to match
+        assert claripy.If(a > b, (a + b) * b, b - 1).canonical_hash != h1
+        assert claripy.If(a > b, (a + b) * a, a - 1).canonical_hash != h1
+        assert claripy.If(a > b, (a + b) * a, b - 2).canonical_hash != h1
+        assert (claripy.BVS("x", 32) + claripy.BVS("y", 32)).canonical_hash != (x + x).canonical_hash
+        assert claripy.BVS("z", 64).canonical_hash != x.canonical_hash
+
+        # constraint sets
+        s1 = claripy.Solver()
+        s1.add([x > 3, y < x])
+        s2 = claripy.Solver()
+        s2.add([a > 3, b < a])
+        (k1, v1), (k2, v2) = s1.canonical_form(), s2.canonical_form()
+        assert k1 == k2
+        # the mapping that translates a model of one solver into the other
+        assert dict(zip(v1, v2)) == {x.args[0]: a.args[0], y.args[0]: b.args[0]}
+        s2.add(a < 2)
+        assert s2.canonical_form()[0] != k1
+
     def test_depth(self):
         x1 = claripy.BVS("x", 32)
         assert x1.depth == 1
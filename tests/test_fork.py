@@ -0,0 +1,67 @@
+import gc
+import os
+import threading
+import unittest
+
+import claripy
+from claripy.ast.base import Base
+
+
+def _in_child(func):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            code = 0 if func() else 1
+        except BaseException:  # pylint:disable=broad-except
+            code = 2
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "requires fork()")
+def test_prepare_for_fork():
+    x = claripy.BVS("x", 32, explicit_name=True)
+    e = (x + 1) * (x ^ 0x1234)
+    e_id = id(e)
+    claripy.backends.z3.convert(e)
+    del e
+
+    claripy.prepare_for_fork()
+    assert Base._hash_cache.frozen_count > 0
+
+    # a thread that holds a lock of the hash-cons cache while the process forks
+    shard = Base._hash_cache._shards[0]
+    locked = threading.Event()
+    release = threading.Event()
+
+    def hold_lock():
+        with shard.lock:
+            locked.set()
+            release.wait()
+
+    t = threading.Thread(target=hold_lock)
+    t.start()
+    locked.wait()
+    try:
+
+        def child():
+            # the expression was kept alive, and is found again
+            e = (x + 1) * (x ^ 0x1234)
+            assert id(e) == e_id
+            # none of the locks is held in the child
+            for i in range(4 * Base._hash_cache.shards):
+                claripy.BVS("y", 32) + i
+            s = claripy.Solver()
+            s.add(e == 0)
+            return s.satisfiable() and len(claripy.backends.z3._thread_caches_by_thread()) == 1
+
+        assert _in_child(child) == 0
+    finally:
+        release.set()
+        t.join()
+        gc.unfreeze()
+
+
+if __name__ == "__main__":
+    test_prepare_for_fork()
@@ -0,0 +1,113 @@
+import itertools
+import os
+import subprocess
+import sys
+
+import claripy
+from claripy.ast.base import Base, set_hash_scheme
+
+
+def test_fast_hash_collisions():
+    children = [claripy.BVS("c%d" % i, 32) for i in range(32)] + [claripy.BVV(i, 32) for i in range(32)]
+    keywords = {"length": 32, "variables": frozenset(), "symbolic": False}
+
+    hashes = set()
+    count = 0
+
+    def add(op, args, **kwargs):
+        nonlocal count
+        h = Base._fast_hash(op, args, dict(keywords, **kwargs))
+        assert 0 <= h < 2**128
+        hashes.add(h)
+        count += 1
+
+    # binary operations over all ordered pairs of children (non-commutative, so (a, b) and (b, a) differ)
+    for op in ("__add__", "__sub__", "__xor__", "Concat"):
+        for a, b in itertools.product(children, repeat=2):
+            add(op, (a, b))
+
+    # integer arguments, including negative ones, and integers next to ASTs
+    for hi, lo in itertools.product(range(-32, 64), repeat=2):
+        add("Extract", (hi, lo, children[0]))
+    for i in range(256):
+        add("ZeroExt", (i, children[1]))
+        add("ZeroExt", (children[1], i))
+    for i in range(64):
+        add("ZeroExt", (i, children[1]), length=None)
+        add("ZeroExt", (i, children[1]), symbolic=True)
+
+    # other argument types
+    for args in itertools.product(
+        (None, True, False, 0, 1, "", "a", 0.0, -0.0, 1.0, (), (0,), ((),), (None,)), repeat=2
+    ):
+        add("fake", args)
+
+    assert len(hashes) == count
+
+
+def test_fast_hash_fallback():
+    # arguments that the fast scheme cannot represent fall back to the md5 scheme
+    keywords = {"length": 32, "variables": frozenset(), "symbolic": False}
+    for args in ((2**64, 1), (claripy.fp.FSORT_DOUBLE,)):
+        assert Base._fast_hash("fake", args, keywords) == Base._md5_hash("fake", args, keywords)
+
+
+def test_fast_hash_scheme():
+    set_hash_scheme("fast")
+    try:
+        x = claripy.BVS("x", 32)
+        y = claripy.BVS("y", 32)
+        assert (x + y) is (x + y)
+        assert (x - y) is not (y - x)
+        assert (x + y)._hash == Base._fast_hash(
+            "__add__", (x, y), {"length": 32, "variables": (x + y).variables, "symbolic": True, "annotations": ()}
+        )
+        assert claripy.FPV(1.0, claripy.FSORT_DOUBLE).to_fp(claripy.FSORT_FLOAT) is claripy.FPV(
+            1.0, claripy.FSORT_DOUBLE
+        ).to_fp(claripy.FSORT_FLOAT)
+    finally:
+        set_hash_scheme("md5")
+
+
+STABLE_HASH_SCRIPT = """
+import claripy
+from claripy.ast.base import set_hash_scheme, set_stable_hashes
+
+class Anno(claripy.Annotation):
+    def __init__(self, tag):
+        self.tag = tag
+    def __eq__(self, other):
+        return type(other) is Anno and other.tag == self.tag
+    def __hash__(self):
+        return hash(self.tag)
+
+set_hash_scheme(%r)
+set_stable_hashes(True)
+x = claripy.BVS("x", 32, explicit_name=True)
+y = claripy.BVS("y", 32, explicit_name=True)
+f = claripy.FPS("f", claripy.FSORT_DOUBLE, explicit_name=True)
+exprs = [
+    x + y,
+    claripy.If(x == y, x.annotate(Anno("a")), claripy.Extract(31, 0, claripy.ZeroExt(32, y))),
+    claripy.Or(x < y, claripy.BoolS("b", explicit_name=True)),
+    claripy.fpAdd(claripy.fp.RM.default(), f, f).to_fp(claripy.FSORT_FLOAT),
+    claripy.BVV(2**100, 128) * claripy.ZeroExt(96, x),
+]
+print([e._hash for e in exprs])
+"""
+
+
+def test_stable_hashes():
+    for scheme in ("md5", "fast"):
+        outputs = set()
+        for seed in ("1", "2", "3"):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            outputs.add(subprocess.check_output([sys.executable, "-c", STABLE_HASH_SCRIPT % scheme], env=env))
+        assert len(outputs) == 1, scheme
+
+
+if __name__ == "__main__":
+    test_fast_hash_collisions()
+    test_fast_hash_fallback()
+    test_fast_hash_scheme()
+    test_stable_hashes()
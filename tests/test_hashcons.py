@@ -0,0 +1,114 @@
+import gc
+import threading
+
+import claripy
+from claripy.ast.base import Base, set_hash_cons_cache_size
+from claripy.simplifications import DEFAULT_MEMO_SIZE
+from claripy.utils import HashConsCache
+
+
+class Value:
+    pass
+
+
+def test_hash_cons_cache_lru():
+    cache = HashConsCache(strong_size=2)
+    values = [Value() for _ in range(3)]
+    for i, v in enumerate(values):
+        cache[i] = v
+    assert cache.strong_count == 2
+    assert cache.evictions == 1
+
+    # looking up 1 makes 2 the least recently used entry
+    assert cache.get(1) is values[1]
+    assert cache.get(3) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    del values, v
+    gc.collect()
+    assert 0 not in cache
+    assert 1 in cache and 2 in cache
+
+    cache.resize(1)
+    assert cache.evictions == 2
+    gc.collect()
+    assert list(cache.keys()) == [1]
+
+    cache.clear_strong()
+    gc.collect()
+    assert len(cache) == 0
+
+    cache.reset_counters()
+    assert (cache.hits, cache.misses, cache.evictions) == (0, 0, 0)
+
+
+def test_hash_cons_strong_tier():
+    x = claripy.BVS("x", 32)
+    set_hash_cons_cache_size(16)
+    # the rebuilt AST would be found in the memo of the simplifiers before the hash-cons cache is consulted
+    claripy.set_simplification_cache_size(0)
+    try:
+        h = (x + 0x1234)._hash
+        gc.collect()
+        assert h in Base._hash_cache
+
+        hits = Base._hash_cache.hits
+        assert (x + 0x1234)._hash == h
+        assert Base._hash_cache.hits == hits + 1
+
+        # the strong tier is split between the shards, so it takes more than 16 other ASTs to evict it from its shard
+        for i in range(16 * Base._hash_cache.shards):
+            _ = x + i
+        gc.collect()
+        assert h not in Base._hash_cache
+    finally:
+        set_hash_cons_cache_size(0)
+        claripy.set_simplification_cache_size(DEFAULT_MEMO_SIZE)
+
+
+def test_hash_cons_cache_shards():
+    cache = HashConsCache(strong_size=8, shards=4)
+    values = [Value() for _ in range(64)]
+    for i, v in enumerate(values):
+        assert cache.setdefault(i, v) is v
+    assert cache.setdefault(3, Value()) is values[3]
+    assert len(cache) == 64
+    assert sorted(cache.keys()) == list(range(64))
+    assert cache.strong_count == 8
+
+    # every shard keeps its two most recently used entries alive
+    del values, v
+    gc.collect()
+    assert sorted(cache.keys()) == [3, 56, 57, 58, 60, 61, 62, 63]
+
+    try:
+        HashConsCache(shards=3)
+        assert False
+    except claripy.ClaripyValueError:
+        pass
+
+
+def test_hash_cons_threads():
+    barrier = threading.Barrier(4)
+    results = [None] * 4
+
+    def build(i):
+        x = claripy.BVS("x", 32, explicit_name=True)
+        barrier.wait()
+        results[i] = [(x + n) * n for n in range(500)] + [claripy.BVV(n, 32) for n in range(500)]
+
+    threads = [threading.Thread(target=build, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for r in results[1:]:
+        assert all(a is b for a, b in zip(results[0], r))
+
+
+if __name__ == "__main__":
+    test_hash_cons_cache_lru()
+    test_hash_cons_strong_tier()
+    test_hash_cons_cache_shards()
+    test_hash_cons_threads()
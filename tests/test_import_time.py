@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+LAZY_SCRIPT = """
+import sys
+import claripy
+assert "z3" not in sys.modules, "importing claripy imported z3"
+x = claripy.BVS("x", 32)
+assert claripy.backends.concrete.convert(claripy.BVV(1, 32) + 2).value == 3
+assert "z3" not in sys.modules, "concrete evaluation imported z3"
+s = claripy.Solver()
+s.add(x == 7)
+assert s.eval(x, 2) == (7,)
+assert "z3" in sys.modules
+assert claripy._backend_z3 is claripy.backends.z3
+"""
+
+
+def test_lazy_backends():
+    subprocess.check_call([sys.executable, "-c", LAZY_SCRIPT])
+
+
+def test_import_modules():
+    # importing claripy does not import any solver (see benchmarks/bench_import_time.py for the timing)
+    out = subprocess.run(
+        [sys.executable, "-c", "import sys, claripy; print(' '.join(sys.modules))"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert not any(name == "z3" or name.startswith(("z3.", "pysmt")) for name in out.split())
+
+
+if __name__ == "__main__":
+    test_lazy_backends()
+    test_import_modules()
@@ -0,0 +1,65 @@
+import random
+
+import claripy
+from claripy.known_bits import known_comparison
+from common_random_expressions import random_expression
+
+
+def test_known_bits():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+
+    assert x.known_bits() == (0, 0)
+    assert claripy.BVV(0x1234, 16).known_bits() == (0xFFFF, 0x1234)
+    assert (claripy.ZeroExt(24, x[7:0]) << 4).known_bits() == (0xFFFFF00F, 0)
+    assert (x | 0x80000001).known_bits() == (0x80000001, 0x80000001)
+    assert ((x << 4) + (y << 4)).known_bits() == (0xF, 0)
+    assert ((x & 0xF0) + 0x101).known_bits() == (0xFFFFFF0F, 0x101)
+    assert claripy.SignExt(8, claripy.Concat(claripy.BVV(1, 1), x[6:0])).known_bits() == (0xFF80, 0xFF80)
+    assert claripy.If(claripy.BoolS("c"), x | 3, y | 1).known_bits() == (1, 1)
+    assert ((x & 1) == 2).known_bits() == (1, 0)
+
+    # comparisons and extractions that only depend on known bits are folded
+    assert ((x & 0xF0) == 1) is claripy.false
+    assert ((x | 1) != 0) is claripy.true
+    assert (claripy.ZeroExt(24, x[7:0]) < 0x100) is claripy.true
+    assert claripy.SLT(claripy.LShR(x, 1), 0) is claripy.false
+    assert (x << 8)[7:0] is claripy.BVV(0, 8)
+    assert claripy.ZeroExt(24, x[7:0]) & 0xFF is claripy.ZeroExt(24, x[7:0])
+    # comparisons that hold for any value are left alone
+    assert (x >= 0).op == "__ge__"
+    assert known_comparison("__ge__", x, claripy.BVV(0, 32)) is True
+    assert known_comparison("__ge__", x, claripy.BVV(0, 32), trivial=False) is None
+
+
+def test_known_bits_quick_checks():
+    x = claripy.BVS("x", 32)
+    # the checks are done on the expressions as they are, without simplifying them
+    e = claripy.ast.Bool("__eq__", (x << 1, claripy.BVV(3, 32)))
+    assert claripy.is_false(e)
+    assert not claripy.is_true(e)
+    assert claripy.is_true(claripy.Not(e))
+
+    s = claripy.Solver()
+    assert s.is_false(e)
+    assert s.is_true(claripy.ast.Bool("__ne__", (x | 1, claripy.BVV(0, 32))))
+    assert not s.is_true(x == 3)
+
+
+def test_known_bits_random():
+    # the known bits are the same for all assignments of the variables
+    rng = random.Random(0x7A7)
+    variables = [claripy.BVS(name, 8) for name in "xyz"]
+    s = claripy.Solver()
+    for _ in range(200):
+        e = random_expression(rng, variables, 4)
+        mask, value = e.known_bits()
+        assert value & ~mask == 0
+        if mask:
+            assert not s.satisfiable([e & mask != value])
+
+
+if __name__ == "__main__":
+    test_known_bits()
+    test_known_bits_quick_checks()
+    test_known_bits_random()
@@ -0,0 +1,58 @@
+from unittest import mock
+
+import claripy
+from claripy.ast.base import Base
+
+
+def test_memory_budget():
+    assert claripy.memory_budget() is None
+    assert claripy.enforce_memory_budget()
+
+    claripy.set_hash_cons_cache_size(2048)
+    try:
+        x = claripy.BVS("x", 32)
+        for i in range(1024):
+            claripy.backends.z3.convert(x * (i + 3))
+        strong = Base._hash_cache.strong_count
+        objects = claripy.stats()["z3.object_cache"]["entries"]
+        assert strong >= 1024
+
+        # the sizes of the entries are only sampled again once a cache has doubled or halved in size
+        usage = claripy.memory_usage() - claripy.backends.z3.native_memory()
+        with mock.patch("claripy.memory_budget.approximate_bytes", side_effect=AssertionError):
+            assert claripy.memory_usage() - claripy.backends.z3.native_memory() == usage
+
+        # a budget that is not exceeded does not drop anything
+        claripy.set_memory_budget(claripy.memory_usage() * 2, check_interval=1)
+        claripy.backends.z3.convert(x + 1)
+        assert Base._hash_cache.strong_count >= strong
+
+        # the least valuable caches go first
+        claripy.set_memory_budget(claripy.memory_usage() - 1)
+        assert claripy.enforce_memory_budget()
+        assert Base._hash_cache.strong_count <= strong // 2 + Base._hash_cache.shards
+        assert claripy.stats()["z3.object_cache"]["entries"] >= objects
+
+        # a budget that cannot be met drops everything
+        claripy.set_memory_budget(0)
+        assert not claripy.enforce_memory_budget()
+        assert Base._hash_cache.strong_count == 0
+        assert claripy.stats()["z3.object_cache"]["entries"] == 0
+    finally:
+        claripy.set_memory_budget(None)
+        claripy.set_hash_cons_cache_size(0)
+
+
+def test_memory_budget_model_caches():
+    x = claripy.BVS("x", 32)
+    s = claripy.Solver()
+    s.add(x < 4)
+    assert sorted(s.eval(x, 10)) == [0, 1, 2, 3]
+    s._clear_model_cache()
+    assert not s._models
+    assert sorted(s.eval(x, 10)) == [0, 1, 2, 3]
+
+
+if __name__ == "__main__":
+    test_memory_budget()
+    test_memory_budget_model_caches()
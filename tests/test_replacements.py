@@ -79,7 +79,37 @@ def test_branching_replacement_solver():
     # assert not s1b.satisfiable()
 
 
+def test_replace_many():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+    shared = (x + y) * (x - y)
+    asts = [shared + 1, shared ^ y, claripy.ULT(shared, x), 5, y]
+
+    seen = []
+
+    def leaf_operation(a):
+        seen.append(a)
+        return claripy.BVV(3, 32) if a is x else a
+
+    results = claripy.replace_many(asts, {}, leaf_operation=leaf_operation)
+    # every leaf (x, y and 1) is visited once
+    assert len(seen) == 3
+    expected = [a.replace_dict({}, leaf_operation=leaf_operation) for a in asts[:3]] + [5, y]
+    assert all(a is b for a, b in zip(results, expected))
+    assert results[0] is ((3 + y) * (3 - y)) + 1
+
+    # model-driven evaluation goes through replace_many() as well
+    s = claripy.Solver()
+    s.add(x == 10)
+    s.add(y == 4)
+    s.add(s.eval(x, 1)[0] == x)
+    model = next(iter(s._models))
+    assert model.eval_list([shared, shared + 1, y]) == (84, 85, 4)
+    assert model.eval_constraints(s.constraints)
+
+
 if __name__ == "__main__":
     test_branching_replacement_solver()
     test_replacement_solver()
     test_contradiction()
+    test_replace_many()
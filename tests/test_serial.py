@@ -1,11 +1,34 @@
 import claripy
+import gc
 import pickle
+import tempfile
+
+from claripy.ast import serialization
 
 import logging
 
 l = logging.getLogger("claripy.test.serial")
 
 
+class RelocatableAnnotation(claripy.Annotation):
+    def __init__(self, n):
+        self.n = n
+
+    @property
+    def eliminatable(self):
+        return False
+
+    @property
+    def relocatable(self):
+        return True
+
+    def __eq__(self, other):
+        return type(other) is RelocatableAnnotation and other.n == self.n
+
+    def __hash__(self):
+        return hash((RelocatableAnnotation, self.n))
+
+
 def test_pickle_ast():
     bz = claripy.backends.z3
 
@@ -131,7 +154,158 @@ def test_identity():
     assert str(s.variables) == str(ss.variables)
 
 
+def _dag_exprs():
+    x = claripy.BVS("x", 32)
+    y = claripy.BVS("y", 32)
+    f = claripy.FPS("f", claripy.FSORT_DOUBLE)
+    shared = (x + y) * 3
+    return [
+        shared,
+        claripy.If(x == y, shared, claripy.Extract(31, 0, claripy.ZeroExt(32, shared - 1))),
+        claripy.And(shared > 7, claripy.BoolS("b")),
+        claripy.fpAdd(claripy.fp.RM.default(), f, claripy.FPV(-0.5, claripy.FSORT_DOUBLE)),
+        x.union(y),
+        claripy.BVV(2**100, 128) + claripy.ZeroExt(96, x),
+        claripy.BVS("u", 8, uninitialized=True) + 1,
+    ]
+
+
+def test_dag_serialization():
+    exprs = _dag_exprs()
+    data = serialization.dumps(exprs)
+
+    # every node is written once
+    reader = serialization.ASTReader(data)
+    loaded = reader.read_all()
+    assert all(a is b for a, b in zip(exprs, loaded))
+    assert len(reader._nodes) == len({n._hash for e in exprs for n in e.children_asts()} | {e._hash for e in exprs})
+    assert loaded[4].variables == exprs[4].variables
+    assert loaded[6].uninitialized
+
+    # rebuild from scratch
+    reprs = [repr(e) for e in exprs]
+    hashes = [e._hash for e in exprs]
+    del exprs, loaded
+    gc.collect()
+    for trust in (False, True):
+        loaded = serialization.loads(data, trust_hashes=trust)
+        assert [repr(e) for e in loaded] == reprs
+        assert [e._hash for e in loaded] == hashes
+        assert loaded[1].args[1] is loaded[0]
+        del loaded
+        gc.collect()
+
+
+def test_dag_serialization_hash_first():
+    claripy.ast.base.set_hash_first(True)
+    try:
+        test_dag_serialization()
+    finally:
+        claripy.ast.base.set_hash_first(False)
+
+
+class UneliminatableAnnotation(claripy.Annotation):
+    def __init__(self, n):
+        self.n = n
+
+    @property
+    def eliminatable(self):
+        return False
+
+    @property
+    def relocatable(self):
+        return False
+
+    def __eq__(self, other):
+        return type(other) is UneliminatableAnnotation and other.n == self.n
+
+    def __hash__(self):
+        return hash((UneliminatableAnnotation, self.n))
+
+
+def test_dag_serialization_annotations():
+    x = claripy.BVS("x", 32).annotate(RelocatableAnnotation(1))
+    shared = (x + 1) * 3
+    exprs = [shared, claripy.If(shared == 0, shared.annotate(RelocatableAnnotation(2)), x)]
+    data = serialization.dumps(exprs)
+
+    # the annotations relocated from the children are not relocated again
+    reprs = [repr(e) for e in exprs]
+    annotations = [e.annotations for e in exprs]
+    hashes = [e._hash for e in exprs]
+    del x, shared, exprs
+    gc.collect()
+    for trust in (False, True):
+        loaded = serialization.loads(data, trust_hashes=trust)
+        assert [repr(e) for e in loaded] == reprs
+        assert [e.annotations for e in loaded] == annotations
+        assert [e._hash for e in loaded] == hashes
+        assert loaded[1].args[0].args[0] is loaded[0]
+        del loaded
+        gc.collect()
+
+
+def test_dag_serialization_uneliminatable_annotations():
+    x = claripy.BVS("x", 32).annotate(UneliminatableAnnotation(1))
+    y = claripy.BVS("y", 32).annotate(RelocatableAnnotation(2))
+    exprs = [x + 1, (x * y).annotate(UneliminatableAnnotation(3))]
+    data = serialization.dumps(exprs)
+    pickled = pickle.dumps(exprs)
+
+    # the uneliminatable annotations of the children are kept, like in a pickle round trip
+    hashes = [e._hash for e in exprs]
+    expected = [e._uneliminatable_annotations for e in exprs]
+    assert expected[0] == {UneliminatableAnnotation(1)}
+    del x, y, exprs
+    gc.collect()
+    assert pickle.loads(pickled)[0]._uneliminatable_annotations == expected[0]
+    gc.collect()
+    for trust in (False, True):
+        loaded = serialization.loads(data, trust_hashes=trust)
+        assert [e._uneliminatable_annotations for e in loaded] == expected
+        assert [e._hash for e in loaded] == hashes
+        del loaded
+        gc.collect()
+
+
+def test_dag_serialization_file():
+    exprs = _dag_exprs()
+    with tempfile.TemporaryFile() as f:
+        with serialization.ASTWriter(f, buffer_size=16) as writer:
+            for e in exprs:
+                writer.write(e)
+            # writing an AST again only adds a reference to it
+            count = writer.node_count
+            writer.write(exprs[1])
+            assert writer.node_count == count
+
+        for use_mmap in (False, True):
+            f.seek(0)
+            loaded = serialization.load(f, trust_hashes=True, use_mmap=use_mmap)
+            assert len(loaded) == len(exprs) + 1
+            assert all(a is b for a, b in zip(exprs + [exprs[1]], loaded))
+
+
+def test_dag_serialization_untrusted_config():
+    exprs = _dag_exprs()
+    data = serialization.dumps(exprs)
+    claripy.ast.base.set_hash_scheme("fast")
+    try:
+        reader = serialization.ASTReader(data, trust_hashes=True)
+        assert not reader.trusted
+        loaded = reader.read_all()
+        assert [repr(e) for e in loaded] == [repr(e) for e in exprs]
+    finally:
+        claripy.ast.base.set_hash_scheme("md5")
+
+
 if __name__ == "__main__":
     test_pickle_ast()
     test_pickle_frontend()
     test_identity()
+    test_dag_serialization()
+    test_dag_serialization_hash_first()
+    test_dag_serialization_annotations()
+    test_dag_serialization_uneliminatable_annotations()
+    test_dag_serialization_file()
+    test_dag_serialization_untrusted_config()
@@ -1,4 +1,7 @@
+import threading
+
 import claripy
+from claripy.simplifications import DEFAULT_MEMO_SIZE, simpleton
 
 
 def test_bool_simplification():
@@ -143,16 +146,23 @@ def test_mask_eq_constant():
     assert expr.args[0].args[2] is a
     assert expr.args[1].op == "BVV" and expr.args[1].args == (0, 1)
 
-    # the highest bit of the mask (0x1fff) is not aligned to 8
-    # we want the mask to be BVV(16, 0x1fff) instead of BVV(13, 0x1fff)
-    a = claripy.BVS("sim_data", 8, explicit_name=True)
+    # the mask only clears bits that are known to be zero
     expr = (claripy.ZeroExt(48, claripy.Extract(15, 0, claripy.Concat(claripy.BVV(0, 63), a[0:0]))) & 0x1FFF) == 0x0
 
+    assert expr.op == "__eq__"
+    assert expr.args[0].op == "Extract"
+    assert expr.args[0].args[2] is a
+
+    # the highest bit of the mask (0x1f0f) is not aligned to 8
+    # we want the mask to be BVV(16, 0x1f0f) instead of BVV(13, 0x1f0f)
+    a = claripy.BVS("sim_data", 8, explicit_name=True)
+    expr = (claripy.ZeroExt(48, claripy.Extract(15, 0, claripy.Concat(claripy.BVV(0, 56), a))) & 0x1F0F) == 0x0
+
     assert expr.op == "__eq__"
     assert expr.args[0].op == "__and__"
     _, arg1 = expr.args[0].args
     assert arg1.size() == 16
-    assert arg1.args[0] == 0x1FFF
+    assert arg1.args[0] == 0x1F0F
 
 
 def test_and_mask_comparing_against_constant_simplifier():
@@ -265,6 +275,112 @@ def test_extract():
     assert expr2 is result2
 
 
+class RelocatableAnnotation(claripy.Annotation):
+    @property
+    def eliminatable(self):
+        return False
+
+    @property
+    def relocatable(self):
+        return True
+
+
+def test_simplification_memo():
+    counters = simpleton.memo_counters
+    a, b = claripy.BVS("a", 32), claripy.BVS("b", 32)
+
+    # successful rewrites, and operations that cannot be simplified, are memoized
+    for make, result in ((lambda: claripy.Concat(a, b)[31:0], b), (lambda: a - b, None)):
+        simpleton.clear_memo()
+        hits, misses = counters.hits, counters.misses
+        e = make()
+        assert counters.misses > misses
+        assert result is None or e is result
+        misses = counters.misses
+        assert make() is e
+        assert counters.hits > hits
+        assert counters.misses == misses
+
+    # the annotations of the arguments are relocated onto memoized results as well
+    anno = RelocatableAnnotation()
+    c = claripy.Concat(a, b)
+    for _ in range(2):
+        assert c[31:0] is b
+        assert c.annotate(anno)[31:0].annotations == (anno,)
+
+    claripy.set_simplification_cache_size(2)
+    try:
+        evictions = counters.evictions
+        for i in range(8):
+            _ = claripy.Concat(a, b)[i + 3 : i]
+        assert len(simpleton._memo) <= 2
+        assert counters.evictions > evictions
+    finally:
+        claripy.set_simplification_cache_size(DEFAULT_MEMO_SIZE)
+
+
+def test_simplification_memo_threads():
+    a, b = claripy.BVS("a", 32), claripy.BVS("b", 32)
+    c = claripy.Concat(a, b)
+    results = [None] * 4
+    barrier = threading.Barrier(len(results))
+
+    def simplify(i):
+        barrier.wait()
+        results[i] = [c[n + 7 : n] for n in range(48)] + [a - b, c[31:0]]
+
+    # a small memo, so that the threads evict each other's results all the time
+    claripy.set_simplification_cache_size(8)
+    try:
+        threads = [threading.Thread(target=simplify, args=(i,)) for i in range(len(results))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(simpleton._memo) <= 8
+    finally:
+        claripy.set_simplification_cache_size(DEFAULT_MEMO_SIZE)
+
+    for r in results[1:]:
+        assert all(x is y for x, y in zip(results[0], r))
+    assert results[0][-1] is b
+
+
+def test_simplifier_profiling():
+    a, b = claripy.BVS("a", 32), claripy.BVS("b", 32)
+    assert "extract_simplifier" in claripy.simplifier_rules()
+
+    simpleton.clear_memo()
+    claripy.set_simplifier_profiling(True)
+    claripy.reset_simplifier_stats()
+    try:
+        assert claripy.Concat(a, b)[31:0] is b
+        assert a[15:0].op == "Extract"
+        stats = claripy.simplifier_stats()
+        assert stats["extract_simplifier"]["invocations"] == 2
+        assert stats["extract_simplifier"]["rewrites"] == 1
+        assert stats["extract_simplifier"]["time"] > 0
+        assert stats["str_reverse_simplifier"]["invocations"] == 0
+
+        # disabled simplifiers leave operations alone, even those that were simplified (and memoized) before
+        claripy.disable_simplifier("extract_simplifier")
+        assert claripy.simplifier_stats()["extract_simplifier"]["disabled"]
+        e = claripy.Concat(a, b)[31:0]
+        assert e.op == "Extract"
+        assert claripy.simplifier_stats()["extract_simplifier"]["invocations"] == 2
+        claripy.enable_simplifier("extract_simplifier")
+        assert claripy.Concat(a, b)[31:0] is b
+
+        try:
+            claripy.disable_simplifier("no_such_simplifier")
+            assert False
+        except claripy.ClaripyValueError:
+            pass
+    finally:
+        claripy.set_simplifier_profiling(False)
+        claripy.reset_simplifier_stats()
+
+
 def perf():
     import timeit  # pylint:disable=import-outside-toplevel
 
@@ -299,3 +415,6 @@ if __name__ == "__main__":
     test_invert_if()
     test_sub_constant()
     test_extract()
+    test_simplification_memo()
+    test_simplification_memo_threads()
+    test_simplifier_profiling()
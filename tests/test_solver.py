@@ -1,6 +1,8 @@
+import pickle
 from common_backend_smt_solver import if_installed
 from unittest import TestCase, main
 import claripy
+from claripy.frontends.constrained_frontend import ConstrainedFrontend
 
 import logging
 
@@ -535,6 +537,67 @@ class StandardTests(TestCase):
         s.simplify()
         assert len(s.constraints) == 2
 
+    def test_simplification_size_limit(self):
+        s = claripy.Solver()
+        x = claripy.BVS("x", 32)
+        y = claripy.BVS("y", 32)
+        big = x
+        for _ in range(50):
+            big = (big + y) * (big - y)
+
+        s.simplify_size_limit = 20
+        s.add(x > 10)
+        s.add(x > 11)
+        s.add(big == 0)
+        s.add(big != 1)
+        s.simplify()
+        # only the small constraints are simplified
+        assert len(s.constraints) == 3
+        assert any(c is (big == 0) for c in s.constraints)
+        assert any(c is (big != 1) for c in s.constraints)
+
+    def test_incremental_simplification(self):
+        x = claripy.BVS("x", 32)
+        y = claripy.BVS("y", 32)
+
+        s = claripy.Solver()
+        s.add(x > 10)
+        s.add(x > 11)
+        s.simplify()
+        assert len(s.constraints) == 1
+        old = s.constraints[0]
+
+        # only the constraints that were added since are simplified, the others are left as they are
+        s.add(y > 10)
+        s.add(y > 11)
+        s.add(claripy.ULT(x, 5))
+        s.simplify()
+        assert s.constraints[0] is old
+        assert len(s.constraints) == 3
+        assert not s.satisfiable()
+
+        # branches and copies do not simplify their shared constraints again
+        s = claripy.Solver()
+        s.add(x > 10)
+        s.simplify()
+        b = s.branch()
+        b.add(y > 10)
+        b.add(y > 11)
+        b.simplify()
+        assert b.constraints[0] is s.constraints[0]
+        assert len(b.constraints) == 2
+        assert pickle.loads(pickle.dumps(b)).constraints == b.constraints
+
+        # states that were pickled without the count of simplified constraints simplify everything again
+        state = ConstrainedFrontend.__getstate__(b)
+        old = b.blank_copy()
+        ConstrainedFrontend.__setstate__(old, state[:3] + state[4:])
+        assert old.constraints == b.constraints
+        assert old._simplified_count == 0
+        old.add(x > 11)
+        old.simplify()
+        assert len(old.constraints) == 2
+
     def test_zero_division_in_cache_mixin(self):
         # Bug in the caching backend. See issue #49 on github.
         num = claripy.BVS("num", 256)